@@ -0,0 +1,217 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+from Others_function import expand_hp_sequence
+from Trajectory import iter_frames, read_header
+
+
+# Frames are rendered as PNG files by pool workers (each worker keeps one figure and moves its artists from frame
+# to frame), then assembled into a GIF with Pillow or an MP4 with ffmpeg.
+FRAME_NAME = "frame_{:06d}.png"
+
+
+
+def select_frames(path, temperature=None, best_only=False):
+    """
+    Streams the frames of a trajectory file with their step number.
+    Args:
+        path (str): Path of the trajectory file (see Trajectory.py).
+        temperature (float, optional): Only keeps the frames sampled at this temperature. Defaults to all frames.
+        best_only (bool, optional): Only keeps the frames improving on the best energy so far, i.e. the history
+            of the best-so-far conformation. Defaults to False.
+    Yields:
+        tuple: (step, conformation, energy, temperature)
+    """
+    best = float("inf")
+    for step, (c, energy, T) in enumerate(iter_frames(path)):
+        if temperature is not None and abs(T - temperature) > 1e-3:
+            continue
+        if best_only:
+            if energy >= best:
+                continue
+            best = energy
+        yield step, c, energy, T
+
+
+
+def decimate(frames, every=None, energy_delta=None, max_frames=None):
+    """
+    Reduces a stream of frames to a short clip. A frame is kept when at least every steps or an energy change
+    of at least energy_delta separate it from the last kept frame (either condition if both are given, all frames
+    if none). The first and last frames are always kept, and the result is evenly thinned out to max_frames.
+    The thinning is done while streaming (the sampling stride doubles whenever 2 * max_frames frames are held),
+    so that memory stays bounded whatever the length of the trajectory.
+    Args:
+        frames (iterable): (step, conformation, energy, temperature) tuples, e.g. from select_frames.
+        every (int, optional): Minimum number of steps between two kept frames. Defaults to None.
+        energy_delta (float, optional): Minimum energy change between two kept frames. Defaults to None.
+        max_frames (int, optional): Maximum number of frames. Defaults to None.
+    Returns:
+        list: Kept frames.
+    """
+    kept = []
+    anchor = None   # Last frame passing the every / energy_delta filter
+    last = None     # Last frame of the stream, always kept
+    stride = 1
+    count = 0       # Frames passing the filter
+    for frame in frames:
+        step, _, energy, _ = frame
+        last = frame
+        if anchor is not None and (every is not None or energy_delta is not None):
+            far = every is not None and step - anchor[0] >= every
+            changed = energy_delta is not None and abs(energy - anchor[2]) >= energy_delta
+            if not (far or changed):
+                continue
+        anchor = frame
+        if count % stride == 0:
+            kept.append(frame)
+            if max_frames is not None and len(kept) >= 2 * max(max_frames, 1):
+                kept = kept[::2]
+                stride *= 2
+        count += 1
+    if last is not None and kept[-1] is not last:
+        kept.append(last)
+    if max_frames is not None and len(kept) > max_frames:
+        kept = [kept[round(k * (len(kept) - 1) / (max_frames - 1))] for k in range(max_frames)] if max_frames > 1 else kept[-1:]
+    return kept
+
+
+
+def frame_limits(frames):
+    """Returns common axis limits (xmin, xmax, ymin, ymax) for all the frames, so that the clip does not jump."""
+    xs = [x for _, c, _, _ in frames for x, y in c]
+    ys = [y for _, c, _, _ in frames for x, y in c]
+    return min(xs) - 1, max(xs) + 1, min(ys) - 1, max(ys) + 1
+
+
+
+def _render_chunk(job):
+    """
+    Renders consecutive frames to PNG files (in a pool worker). The figure is drawn once with Grid's styling and
+    kept as a background; for each frame the residues, bonds, labels and title are moved and blitted over it.
+    """
+    hp, frames, first, directory, limits, size, dpi, label_cutoff = job
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from PIL import Image
+    from Grid import draw_molecule
+
+    fig = Figure(figsize=(size, size), dpi=dpi, facecolor='white')
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    residues, bonds, labels = draw_molecule(ax, frames[0][1], hp, point_size=max(10, 200 * 20 // max(len(hp), 20)),
+                                            label_cutoff=label_cutoff)
+    ax.set_xlim(limits[0], limits[1])
+    ax.set_ylim(limits[2], limits[3])
+    artists = [bonds, residues, *labels, ax.title]
+    for artist in artists:
+        artist.set_animated(True)
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+
+    paths = []
+    for k, (step, c, energy, T) in enumerate(frames):
+        residues.set_offsets(c)
+        bonds.set_segments(list(zip(c[:-1], c[1:])))
+        for label, position in zip(labels, c):
+            label.set_position(position)
+        ax.set_title(f"Step {step}, E = {energy:g}, T = {T:g}")
+        canvas.restore_region(background)
+        for artist in artists:
+            ax.draw_artist(artist)
+        path = os.path.join(directory, FRAME_NAME.format(first + k))
+        Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba()).convert("RGB").save(path, compress_level=1)
+        paths.append(path)
+    return paths
+
+
+
+def render_frames(hp, frames, directory, processes=None, size=6, dpi=100, label_cutoff=100):
+    """
+    Renders frames to numbered PNG files, split in chunks over worker processes.
+    Args:
+        hp (str): HP sequence.
+        frames (list): (step, conformation, energy, temperature) tuples.
+        directory (str): Output directory of the PNG files.
+        processes (int, optional): Number of worker processes. Defaults to the number of cores.
+        size (float, optional): Width and height of the frames, in inches. Defaults to 6.
+        dpi (int, optional): Resolution of the frames. Defaults to 100.
+        label_cutoff (int, optional): Residue numbers are drawn only if the chain is not longer. Defaults to 100.
+    Returns:
+        list of str: Paths of the frames, in order.
+    """
+    processes = processes or os.cpu_count()
+    limits = frame_limits(frames)
+    chunk = max(1, -(-len(frames) // (4 * processes)))  # A few chunks per worker to balance the load
+    jobs = [(hp, frames[start:start + chunk], start, directory, limits, size, dpi, label_cutoff)
+            for start in range(0, len(frames), chunk)]
+    with multiprocessing.Pool(min(processes, len(jobs))) as pool:
+        return [path for paths in pool.map(_render_chunk, jobs) for path in paths]
+
+
+
+def export_animation(path, hp, output, fps=10, temperature=None, best_only=False, every=None, energy_delta=None,
+                     max_frames=300, processes=None, size=6, dpi=100, label_cutoff=100):
+    """
+    Turns a trajectory file into a GIF or MP4 animation (format from the extension of output; MP4 needs ffmpeg).
+    Args:
+        path (str): Path of the trajectory file.
+        hp (str): HP sequence of the run.
+        output (str): Animation file (.gif or .mp4).
+        fps (float, optional): Frames per second. Defaults to 10.
+        temperature, best_only: Frame selection, see select_frames.
+        every, energy_delta, max_frames: Decimation, see decimate. max_frames defaults to 300.
+        processes, size, dpi, label_cutoff: Rendering, see render_frames.
+    Returns:
+        int: Number of frames of the animation.
+    """
+    n, _ = read_header(path)
+    if n != len(hp):
+        raise ValueError(f"{path} holds chains of length {n}, not {len(hp)}")
+    extension = os.path.splitext(output)[1].lower()
+    if extension not in (".gif", ".mp4"):
+        raise ValueError("output must be a .gif or .mp4 file")
+    if extension == ".mp4" and shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is needed to write MP4 files")
+
+    frames = decimate(select_frames(path, temperature, best_only), every, energy_delta, max_frames)
+    if not frames:
+        raise ValueError(f"no frame of {path} matches the selection")
+    with tempfile.TemporaryDirectory() as directory:
+        paths = render_frames(hp, frames, directory, processes, size, dpi, label_cutoff)
+        if extension == ".gif":
+            from PIL import Image
+
+            images = [Image.open(frame) for frame in paths]
+            images[0].save(output, save_all=True, append_images=images[1:], duration=round(1000 / fps), loop=0)
+        else:
+            subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps),
+                            "-i", os.path.join(directory, "frame_%06d.png"), "-pix_fmt", "yuv420p",
+                            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", output], check=True)
+    return len(frames)
+
+
+
+# ----- Trajectory animation -----
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Turns a trajectory file into a GIF or MP4 animation.")
+    parser.add_argument("trajectory", help="Trajectory file (see Trajectory.py)")
+    parser.add_argument("output", help="Animation file (.gif, or .mp4 with ffmpeg)")
+    parser.add_argument("--hp", required=True, help="HP sequence of the run (compact notation accepted)")
+    parser.add_argument("--fps", type=float, default=10, help="Frames per second")
+    parser.add_argument("--temperature", type=float, help="Only the frames sampled at this temperature")
+    parser.add_argument("--best", action="store_true", help="Only the history of the best-so-far conformation")
+    parser.add_argument("--every", type=int, help="Minimum number of steps between two frames")
+    parser.add_argument("--energy-delta", type=float, help="Minimum energy change between two frames")
+    parser.add_argument("--max-frames", type=int, default=300, help="Maximum number of frames")
+    parser.add_argument("--processes", type=int, help="Rendering processes (default: number of cores)")
+    parser.add_argument("--dpi", type=int, default=100, help="Resolution of the frames")
+    args = parser.parse_args()
+
+    count = export_animation(args.trajectory, expand_hp_sequence(args.hp), args.output, args.fps, args.temperature,
+                             args.best, args.every, args.energy_delta, args.max_frames, args.processes, dpi=args.dpi)
+    print(f"{count} frames written to {args.output}")
@@ -0,0 +1,103 @@
+import heapq
+
+
+def canonical_key(c):
+    """
+    Computes a key of a conformation invariant by translation, rotation and reflection of the lattice.
+    The conformation is encoded by its relative turns (L, R or S for straight), and the reflected
+    encoding (L and R swapped) is compared to keep the smallest one.
+    Args:
+        c (list of tuples): List of (x, y) coordinates of residues.
+    Returns:
+        str: Canonical key (two conformations are symmetric if and only if they have the same key).
+    """
+    turns = []
+    for i in range(1, len(c) - 1):
+        dx1, dy1 = c[i][0] - c[i-1][0], c[i][1] - c[i-1][1]
+        dx2, dy2 = c[i+1][0] - c[i][0], c[i+1][1] - c[i][1]
+        cross = dx1 * dy2 - dy1 * dx2
+        turns.append('L' if cross > 0 else 'R' if cross < 0 else 'S')
+    key = ''.join(turns)
+    reflected = key.translate(str.maketrans('LR', 'RL'))
+    return min(key, reflected)
+
+
+
+class ConformationArchive:
+    """
+    Bounded archive of the k lowest-energy distinct conformations found by a search.
+    Conformations are deduplicated by their canonical key, so symmetric copies are stored once.
+    Archives of different worker processes can be combined with merge().
+    The search functions fill the archive passed as archive= in place (their return value stays the best
+    conformation and its energy), so the caller reads the K best from the archive after the run.
+    """
+
+    def __init__(self, k=10):
+        """
+        Args:
+            k (int, optional): Maximum number of conformations kept. Defaults to 10.
+        """
+        self.k = k
+        self._heap = []      # Max-heap on energy: (-energy, counter, key, conformation)
+        self._keys = set()   # Canonical keys in the archive
+        self._counter = 0    # Insertion counter, to order conformations of equal energy
+
+    def __len__(self):
+        return len(self._heap)
+
+    def accepts(self, energy):
+        """
+        Cheap check, before computing a key, of whether a conformation of this energy could enter the archive.
+        Args:
+            energy (float): Energy of the conformation.
+        Returns:
+            bool: True if the archive is not full or energy is lower than the worst energy kept.
+        """
+        return len(self._heap) < self.k or energy < -self._heap[0][0]
+
+    def add(self, c, energy, key=None):
+        """
+        Adds a conformation if it is among the k best and not already in the archive (up to symmetry).
+        Args:
+            c (list of tuples): Conformation.
+            energy (float): Energy of c.
+            key (str, optional): Canonical key of c, computed if not given.
+        Returns:
+            bool: True if the conformation was added.
+        """
+        if not self.accepts(energy):
+            return False
+        if key is None:
+            key = canonical_key(c)
+        if key in self._keys:
+            return False
+
+        self._counter += 1
+        heapq.heappush(self._heap, (-energy, self._counter, key, list(c)))
+        self._keys.add(key)
+
+        # Drop the worst conformation if the archive is over its size
+        if len(self._heap) > self.k:
+            removed = heapq.heappop(self._heap)
+            self._keys.discard(removed[2])
+        return True
+
+    def merge(self, other):
+        """
+        Adds the conformations of another archive (e.g. from a worker process) to this one.
+        Args:
+            other (ConformationArchive): Archive to merge.
+        Returns:
+            ConformationArchive: self
+        """
+        for neg_energy, _, key, c in other._heap:
+            self.add(c, -neg_energy, key)
+        return self
+
+    def conformations(self):
+        """
+        Returns the archived conformations from the lowest to the highest energy.
+        Returns:
+            list: List of (conformation, energy) tuples.
+        """
+        return [(c, -neg_energy) for neg_energy, _, _, c in sorted(self._heap, key=lambda item: (-item[0], item[1]))]
@@ -0,0 +1,208 @@
+import argparse
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+from Others_function import *
+from Monte_Carlo import MCsearch, REMCSimulation
+from Results_db import ResultsDB
+from Tuning import load_tuned, load_tuned_defaults
+
+
+ENGINES = ["REMCSimulation", "MCsearch"]  # Serial engines (pool workers cannot start processes)
+
+
+
+def read_sequences(stream):
+    """
+    Reads HP sequences from a text stream, one per line, as "sequence" or "name sequence"
+    (plain or compact notation). Empty lines and lines starting with # are skipped, and so are invalid
+    sequences, with a warning on stderr (so that one bad line does not stop a whole library).
+    Args:
+        stream (file): Text stream (e.g. an open file or sys.stdin).
+    Yields:
+        tuple: (name, expanded HP sequence)
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split()
+        name, compact = (fields[0], ''.join(fields[1:])) if len(fields) > 1 else (f"seq{line_number}", fields[0])
+        try:
+            hp = expand_hp_sequence(compact)
+        except ValueError as error:
+            print(f"warning: line {line_number} skipped: {error}", file=sys.stderr)
+            continue
+        if not hp:
+            print(f"warning: line {line_number} skipped: empty sequence", file=sys.stderr)
+            continue
+        yield name, hp
+
+
+
+def estimate_cost(hp):
+    """
+    Estimates the relative cost of folding a sequence: a MC step costs O(n) for the move and
+    O(h²) for the energy, with n the length and h the number of H residues.
+    Args:
+        hp (str): HP sequence.
+    Returns:
+        int: Cost estimate (only meaningful to compare sequences).
+    """
+    h = hp.count('H')
+    return len(hp) + h * h
+
+
+
+def fold_job(job):
+    """
+    Folds one sequence of a batch (run in a pool worker, with the engine prints silenced).
+    Args:
+        job (tuple): (name, hp, engine, budget, seed, db_path, params), params being the extra engine arguments.
+    Returns:
+        dict: Result with the name, sequence, energy, lower bound, conformation and wall time.
+    """
+    name, hp, engine, budget, seed, db_path, params = job
+    random.seed(seed)
+    db = ResultsDB(db_path) if db_path is not None else None
+    start = time.time()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if engine == "MCsearch":
+            conformation, energy = MCsearch(hp, phi=params.get("phi", 10**9), nu=params.get("nu", 0.5),
+                                            T=params.get("T", 160), timeout=budget, db=db)
+        else:
+            conformation, energy = REMCSimulation(hp, timeout=budget, max_iterations=10**9, db=db, **params)
+    if db is not None:
+        db.close()
+    return {"name": name, "hp": hp, "length": len(hp), "engine": engine, "energy": energy,
+            "bound": energy_lower_bound(hp), "wall": time.time() - start, "seed": seed,
+            "conformation": [list(p) for p in conformation]}
+
+
+
+def job_budget(hp, budget, budget_per_residue=None):
+    """Returns the time budget of a sequence: budget, or budget_per_residue * length if smaller."""
+    if budget_per_residue is None:
+        return budget
+    return min(budget, budget_per_residue * len(hp))
+
+
+
+def schedule(sequences, engine, budget, budget_per_residue=None, seed=0, db_path=None, params=None, window=1000,
+             tuned_path=None):
+    """
+    Turns a stream of sequences into pool jobs. Sequences are read window by window and each window
+    is ordered by decreasing estimated cost, so that long jobs start first and short ones fill the gaps.
+    Args:
+        sequences (iterable): (name, hp) pairs.
+        engine (str): One of ENGINES.
+        budget (float): Time budget of each job, in seconds.
+        budget_per_residue (float, optional): If given, the budget of a job is capped at this time per residue. Defaults to None.
+        seed (int, optional): Base seed, the seed of the k-th sequence is seed + k. Defaults to 0.
+        db_path (str, optional): Results database used by the jobs. Defaults to None.
+        params (dict, optional): Extra engine arguments. Defaults to None.
+        window (int, optional): Number of sequences ordered together. Defaults to 1000.
+        tuned_path (str, optional): File of tuned parameters (see Tuning.py) giving the defaults of each sequence,
+            overridden by params. Defaults to None.
+    Yields:
+        tuple: Jobs for fold_job.
+    """
+    tuned = load_tuned(tuned_path) if tuned_path is not None else {}
+    numbered = enumerate(sequences)
+    while True:
+        chunk = list(itertools.islice(numbered, window))
+        if not chunk:
+            return
+        chunk.sort(key=lambda item: estimate_cost(item[1][1]), reverse=True)
+        for k, (name, hp) in chunk:
+            job_params = load_tuned_defaults(hp, tuned=tuned)
+            if engine == "MCsearch":
+                job_params = {key: value for key, value in job_params.items() if key in ("phi", "nu")}
+            job_params.update(params or {})
+            yield (name, hp, engine, job_budget(hp, budget, budget_per_residue), seed + k, db_path, job_params)
+
+
+
+def run_batch(sequences, output, engine="REMCSimulation", budget=60, budget_per_residue=None, processes=None, seed=0,
+              db_path=None, params=None, window=1000, tuned_path=None):
+    """
+    Folds a stream of sequences over a process pool and writes one JSON line per result as soon as it completes.
+    At most window jobs (and at least one per worker) are in flight, so that the input is only read as fast as
+    the pool folds it. A failed job does not stop the batch: it is written as {"name", "hp", "error"}.
+    Args:
+        sequences (iterable): (name, hp) pairs (see read_sequences).
+        output (file): Text stream receiving the results.
+        engine, budget, budget_per_residue, seed, db_path, params, window, tuned_path: See schedule.
+        processes (int, optional): Number of pool workers. Defaults to the number of cores.
+    Returns:
+        tuple: (number of folded sequences, number of failed jobs)
+    """
+    processes = processes or os.cpu_count()
+    limit = max(window, processes)
+    done = queue.Queue()  # Results (or error records) of the jobs, in completion order
+    count = 0
+    failed = 0
+    in_flight = 0
+
+    def write_next():
+        nonlocal failed
+        result = done.get()
+        if "error" in result:
+            failed += 1
+        output.write(json.dumps(result, separators=(",", ":")) + "\n")
+        output.flush()
+
+    def error_record(job):
+        name, hp = job[:2]
+        return lambda error: done.put({"name": name, "hp": hp, "error": f"{type(error).__name__}: {error}"})
+
+    jobs = schedule(sequences, engine, budget, budget_per_residue, seed, db_path, params, window, tuned_path)
+    with multiprocessing.Pool(processes) as pool:
+        for job in jobs:
+            if in_flight >= limit:
+                write_next()
+                in_flight -= 1
+                count += 1
+            pool.apply_async(fold_job, (job,), callback=done.put, error_callback=error_record(job))
+            in_flight += 1
+        for _ in range(in_flight):
+            write_next()
+            count += 1
+    return count - failed, failed
+
+
+
+# ----- Batch folding -----
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Folds a library of HP sequences over a process pool.")
+    parser.add_argument("input", nargs="?", default="-", help="File with one sequence per line ('name sequence' or 'sequence'), - for stdin")
+    parser.add_argument("--engine", default="REMCSimulation", choices=ENGINES, help="Search function")
+    parser.add_argument("--budget", type=float, default=60, help="Time budget of each sequence (s)")
+    parser.add_argument("--budget-per-residue", type=float, help="Caps the budget of a sequence at this time per residue (s)")
+    parser.add_argument("--processes", type=int, help="Pool workers (default: number of cores)")
+    parser.add_argument("--window", type=int, default=1000, help="Sequences ordered by cost together")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed")
+    parser.add_argument("--db", help="Results database (warm start and recording)")
+    parser.add_argument("--tuned", help="File of tuned parameters (see Tuning.py) used as defaults")
+    parser.add_argument("--phi", type=int, help="Iterations in Monte Carlo search (default: tuned, or the engine default)")
+    parser.add_argument("--chi", type=int, help="Number of replicas of REMCSimulation (default: tuned or 5)")
+    parser.add_argument("--output", default="-", help="JSON lines output file, - for stdout")
+    args = parser.parse_args()
+
+    params = {"phi": args.phi} if args.engine == "MCsearch" else {"phi": args.phi, "chi": args.chi}
+    params = {key: value for key, value in params.items() if value is not None}
+    with contextlib.ExitStack() as stack:
+        source = sys.stdin if args.input == "-" else stack.enter_context(open(args.input))
+        output = sys.stdout if args.output == "-" else stack.enter_context(open(args.output, "w"))
+        start = time.time()
+        count, failed = run_batch(read_sequences(source), output, args.engine, args.budget, args.budget_per_residue,
+                                  args.processes, args.seed, args.db, params, args.window, args.tuned)
+        print(f"{count} sequences folded in {time.time() - start:.1f} s"
+              + (f", {failed} failed (error records in the output)" if failed else ""), file=sys.stderr)
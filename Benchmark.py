@@ -0,0 +1,240 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from Neighbourhoods import *
+from Others_function import *
+from Monte_Carlo import MCsearch_REMC
+from EnergyModel import EnergyModel
+
+
+LENGTHS = [20, 50, 100, 200, 500]   # Chain lengths benchmarked by default
+H_FRACTIONS = [0.3, 0.5, 0.7]       # Fractions of H residues benchmarked by default
+COMPUTE_MODULES = ["Monte_Carlo"]   # Modules imported by the worker processes
+HEAVY_MODULES = ["matplotlib", "tkinter", "numpy", "PIL"]  # Modules the compute path must not import
+IMPORT_BUDGET = 0.25                # Import time budget of the compute path, in seconds
+
+
+
+def random_hp_sequence(n, h_fraction, rng):
+    """
+    Generates a random HP sequence.
+    Args:
+        n (int): Length of the sequence.
+        h_fraction (float): Probability of each residue to be H.
+        rng (random.Random): Random generator (for reproducible sequences).
+    Returns:
+        str: HP sequence.
+    """
+    return ''.join('H' if rng.random() < h_fraction else 'P' for _ in range(n))
+
+
+
+def measure(func, make_args, seed, min_time=0.2, memory=True):
+    """
+    Measures the time per call and the peak memory of a function.
+    The random module is seeded before each pass so that the calls (and their random moves) are reproducible.
+    Args:
+        func (callable): Function to benchmark.
+        make_args (callable): Function taking the call index and returning the arguments tuple of this call.
+        seed (int): Seed of the random module.
+        min_time (float, optional): Minimum duration of the timed pass, in seconds. Defaults to 0.2.
+        memory (bool, optional): If True, runs a second pass under tracemalloc to measure the peak memory. Defaults to True.
+    Returns:
+        dict: {"calls", "ns_per_call", "calls_per_sec", "peak_kib"}
+    """
+    # Calibration: number of calls filling min_time
+    random.seed(seed)
+    start = time.perf_counter_ns()
+    func(*make_args(0))
+    single = max(time.perf_counter_ns() - start, 1)
+    calls = max(1, min(int(min_time * 1e9 / single), 1000000))
+
+    # Timed pass
+    args = [make_args(i) for i in range(calls)]
+    random.seed(seed)
+    start = time.perf_counter_ns()
+    for a in args:
+        func(*a)
+    elapsed = time.perf_counter_ns() - start
+
+    # Memory pass (tracemalloc slows down the calls, so it is not timed)
+    peak_kib = None
+    if memory:
+        random.seed(seed)
+        tracemalloc.start()
+        for a in args[:min(calls, 1000)]:
+            func(*a)
+        peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+    return {"calls": calls, "ns_per_call": elapsed / calls, "calls_per_sec": calls * 1e9 / elapsed, "peak_kib": peak_kib}
+
+
+
+def benchmark_sequence(hp, seed, min_time=0.2, sweep_phi=500):
+    """
+    Benchmarks the energy model (full energy and energy change of a move), validity check, moves, random conformation generation and a MCsearch_REMC sweep for one sequence.
+    Args:
+        hp (str): HP sequence.
+        seed (int): Seed of the random module.
+        min_time (float, optional): Minimum duration of each timed pass, in seconds. Defaults to 0.2.
+        sweep_phi (int, optional): Number of moves of the benchmarked sweep. Defaults to 500.
+    Returns:
+        dict: Results by benchmark name.
+    """
+    n = len(hp)
+    random.seed(seed)
+    conformations = [generate_random_conformation(hp) for _ in range(8)]
+    rng = random.Random(seed)
+    residues = [rng.randint(0, n - 1) for _ in range(4096)]
+    inner = [rng.randint(1, n - 3) for _ in range(4096)]
+
+    def conformation(i):
+        return conformations[i % len(conformations)]
+
+    # Energy changes: one successful move per conformation, with the occupancy map the engines keep
+    model = EnergyModel(hp)
+    moves = []
+    for c in conformations:
+        possible, new_c = False, c
+        while not possible:
+            possible, new_c = M(c, rng.randint(0, n - 1), 0.5)
+        moves.append((c, new_c, moved_residues(c, new_c), model.occupancy(c)))
+
+    benchmarks = {
+        "EnergyModel.energy": (model.energy, lambda i: (conformation(i),)),
+        "EnergyModel.delta": (model.delta, lambda i: moves[i % len(moves)]),
+        "is_valid_conformation": (is_valid_conformation, lambda i: (conformation(i),)),
+        "end_move": (end_move, lambda i: (conformation(i), 0 if i % 2 == 0 else n - 1)),
+        "corner_move": (corner_move, lambda i: (conformation(i), inner[i % 4096])),
+        "crankshaft_move": (crankshaft_move, lambda i: (conformation(i), inner[i % 4096])),
+        "pull_move": (pull_move, lambda i: (conformation(i), residues[i % 4096])),
+        "M": (M, lambda i: (conformation(i), residues[i % 4096], 0.5)),
+        "generate_random_conformation": (generate_random_conformation, lambda i: (hp,)),
+    }
+
+    results = {}
+    for name, (func, make_args) in benchmarks.items():
+        results[name] = measure(func, make_args, seed, min_time)
+
+    # Full sweep: reported as moves per second
+    sweep = measure(MCsearch_REMC, lambda i: (hp, conformation(i), sweep_phi, 0.5, 160), seed, min_time)
+    sweep["moves_per_sec"] = sweep["calls_per_sec"] * sweep_phi
+    results["MCsearch_REMC_sweep"] = sweep
+    return results
+
+
+
+def run_benchmarks(lengths=LENGTHS, h_fractions=H_FRACTIONS, seed=0, min_time=0.2):
+    """
+    Runs the micro-benchmarks for all chain lengths and H fractions.
+    Args:
+        lengths (list of int, optional): Chain lengths. Defaults to LENGTHS.
+        h_fractions (list of float, optional): Fractions of H residues. Defaults to H_FRACTIONS.
+        seed (int, optional): Seed of the sequences and of the random moves. Defaults to 0.
+        min_time (float, optional): Minimum duration of each timed pass, in seconds. Defaults to 0.2.
+    Returns:
+        dict: Environment description and the list of results.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    report = {"commit": commit, "python": platform.python_version(), "machine": platform.machine(),
+              "seed": seed, "results": []}
+
+    for n in lengths:
+        for h_fraction in h_fractions:
+            hp = random_hp_sequence(n, h_fraction, random.Random(f"{seed}-{n}-{h_fraction}"))
+            for name, result in benchmark_sequence(hp, seed, min_time).items():
+                report["results"].append({"length": n, "h_fraction": h_fraction, "benchmark": name, **result})
+                print(f"n={n:4d} H={h_fraction:.1f} {name:30s} {result['ns_per_call']:14.0f} ns/call "
+                      f"{result['calls_per_sec']:12.0f} calls/s  peak {result['peak_kib']:10.1f} KiB")
+    return report
+
+
+
+def check_import_time(modules=COMPUTE_MODULES, budget=IMPORT_BUDGET, repeats=5):
+    """
+    Checks that the compute modules import quickly and without the plotting / GUI libraries,
+    as in a fresh worker process. Each import is timed in a new interpreter, and the fastest of
+    the repeats is kept; the slowest imports are listed from python -X importtime.
+    Args:
+        modules (list of str, optional): Modules to import. Defaults to COMPUTE_MODULES.
+        budget (float, optional): Maximum import time, in seconds. Defaults to IMPORT_BUDGET.
+        repeats (int, optional): Number of fresh interpreters. Defaults to 5.
+    Returns:
+        dict: {"time", "heavy" (heavy modules imported), "slowest" (module, cumulative s) pairs, "ok"}
+    """
+    code = ("import time; start = time.perf_counter(); " + "; ".join(f"import {m}" for m in modules) +
+            "; elapsed = time.perf_counter() - start; import sys, json; print(json.dumps([elapsed, sorted(sys.modules)]))")
+    best, loaded, slowest = float('inf'), [], []
+    for _ in range(repeats):
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+        elapsed, loaded = json.loads(process.stdout)
+        if elapsed < best:
+            best = elapsed
+            timings = []
+            for line in process.stderr.splitlines():
+                fields = line.split("|")
+                if len(fields) == 3 and fields[1].strip().isdigit():
+                    timings.append((fields[2].strip(), int(fields[1]) / 1e6))
+            slowest = sorted(timings, key=lambda t: t[1], reverse=True)[:10]
+
+    heavy = sorted({m.split(".")[0] for m in loaded if m.split(".")[0] in HEAVY_MODULES})
+    return {"time": best, "heavy": heavy, "slowest": slowest, "ok": best <= budget and not heavy}
+
+
+
+def compare(old_report, new_report):
+    """
+    Prints the speed ratio of each benchmark between two reports (> 1 means the new one is faster).
+    Args:
+        old_report (dict): Report of the reference commit.
+        new_report (dict): Report of the new commit.
+    """
+    old = {(r["length"], r["h_fraction"], r["benchmark"]): r for r in old_report["results"]}
+    print(f"{old_report.get('commit', '?')} -> {new_report.get('commit', '?')}")
+    for r in new_report["results"]:
+        key = (r["length"], r["h_fraction"], r["benchmark"])
+        if key in old:
+            ratio = old[key]["ns_per_call"] / r["ns_per_call"]
+            print(f"n={key[0]:4d} H={key[1]:.1f} {key[2]:30s} x{ratio:6.2f}")
+
+
+
+# ----- Benchmarks -----
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the energy, moves and MC sweeps.")
+    parser.add_argument("--lengths", type=int, nargs="+", default=LENGTHS, help="Chain lengths")
+    parser.add_argument("--h-fractions", type=float, nargs="+", default=H_FRACTIONS, help="Fractions of H residues")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the sequences and moves")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum duration of each timed pass (s)")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON results of a previous commit to compare with")
+    parser.add_argument("--check-imports", action="store_true", help="Only check the import time of the compute modules")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET, help="Import time budget (s)")
+    args = parser.parse_args()
+
+    if args.check_imports:
+        check = check_import_time(budget=args.import_budget)
+        for module, cumulative in check["slowest"]:
+            print(f"{module:40s} {1000 * cumulative:8.1f} ms")
+        print(f"compute path import time {1000 * check['time']:.1f} ms (budget {1000 * args.import_budget:.0f} ms)")
+        if check["heavy"]:
+            print(f"compute path imports {', '.join(check['heavy'])}")
+        sys.exit(0 if check["ok"] else 1)
+
+    report = run_benchmarks(args.lengths, args.h_fractions, args.seed, args.min_time)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
@@ -0,0 +1,178 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import time
+from Others_function import *
+from Monte_Carlo import MCsearch, REMCSimulation, REMC_paral, REMC_multi
+
+
+# Standard 2D HP benchmark sequences (name, sequence in plain or compact notation, best known energy)
+HP_BENCHMARKS = [
+    ("S1-1", "HPHPPHHPHPPHPHHPPHPH", -9),
+    ("S1-2", "HHPPHPPHPPHPPHPPHPPHPPHH", -9),
+    ("S1-3", "PPHPPHHPPPPHHPPPPHHPPPPHH", -8),
+    ("S1-4", "P3H2P2H2P5H7P2H2P4H2P2HP2", -14),
+    ("S1-5", "P2H(P2H2)2P5H10P6(H2P2)2HP2H5", -23),
+    ("S1-6", "H2(PH)3PH4PH(P3H)2P4H(P3H)2PH4(PH)4H", -21),
+    ("S1-7", "P2H3PH8P3H10PHP3H12P4H6PH2PHP", -36),
+    ("S1-8", "H12(PH)2(P2H2)2P2HP2H2PPH2P2HP2(H2P2)2(HP)2H12", -42),
+    ("S1-9", "H4P4H12P6(H12P3)3HP2(H2P2)2HPH", -53),
+    ("S1-10", "P3H2P2H4P2H3(PH2)2PH4P8H6P2H6P9HPH2PH11P2H3PH2PHP2HPH3P6H3", -48),
+    ("S1-11", "P6HPH2P5H3PH5PH2P4H2P2H2PH5PH10PH2PH7P11H7P2HPH3P6HPH2", -50),
+]
+
+ENGINES = ["MCsearch", "REMCSimulation", "REMC_paral", "REMC_multi"]
+SERIAL_ENGINES = ["MCsearch", "REMCSimulation"]  # Engines that can run inside a pool worker
+
+
+
+def benchmark_sequences(names=None):
+    """
+    Returns the benchmark sequences, expanded with expand_hp_sequence.
+    Args:
+        names (list of str, optional): Names of the sequences to keep (e.g. ["S1-1", "S1-4"]). Defaults to all.
+    Returns:
+        list: List of (name, hp, E_star) tuples.
+    """
+    return [(name, expand_hp_sequence(compact), E_star) for name, compact, E_star in HP_BENCHMARKS
+            if names is None or name in names]
+
+
+
+def cpu_time():
+    """Returns the CPU time used by this process and its finished child processes."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+
+def run_once(job):
+    """
+    Runs one engine once on one sequence with a given seed and time budget.
+    Args:
+        job (tuple): (engine, name, hp, E_star, seed, budget, params), params being the extra engine arguments.
+    Returns:
+        dict: Run description with the energy reached, success (energy <= E_star), wall time and CPU time.
+    """
+    engine, name, hp, E_star, seed, budget, params = job
+    random.seed(seed)
+    wall_start, cpu_start = time.time(), cpu_time()
+
+    if engine == "MCsearch":
+        _, energy = MCsearch(hp, phi=params.get("phi", 10**9), nu=params.get("nu", 0.5), T=params.get("T", 160),
+                             E_star=E_star, timeout=budget)
+    elif engine == "REMCSimulation":
+        _, energy = REMCSimulation(hp, E_star, timeout=budget, max_iterations=10**9, **params)
+    elif engine == "REMC_paral":
+        _, energy = REMC_paral(hp, E_star, timeout=budget, max_iterations=10**9, **params)
+    else:
+        _, energy = REMC_multi(hp, E_star, timeout=budget, max_iteration=10**9, **params)
+
+    return {"engine": engine, "sequence": name, "seed": seed, "energy": energy, "success": energy <= E_star,
+            "wall": time.time() - wall_start, "cpu": cpu_time() - cpu_start}
+
+
+
+def summarize(runs):
+    """
+    Aggregates runs by (sequence, engine): success rate, time-to-target distribution and CPU-seconds per success.
+    Args:
+        runs (list of dict): Results of run_once.
+    Returns:
+        list: One summary dict per (sequence, engine).
+    """
+    groups = {}
+    for run in runs:
+        groups.setdefault((run["sequence"], run["engine"]), []).append(run)
+
+    summary = []
+    for (name, engine), group in groups.items():
+        times = sorted(run["wall"] for run in group if run["success"])
+        successes = len(times)
+        summary.append({
+            "sequence": name, "engine": engine, "runs": len(group), "successes": successes,
+            "success_rate": successes / len(group),
+            "tts_median": statistics.median(times) if times else None,
+            "tts_p10": times[int(0.1 * (successes - 1))] if times else None,
+            "tts_p90": times[int(0.9 * (successes - 1))] if times else None,
+            "cpu_per_success": sum(run["cpu"] for run in group) / successes if successes else None,
+            "best_energy": min(run["energy"] for run in group),
+        })
+    return summary
+
+
+
+def run_benchmark(names=None, engines=ENGINES, runs=10, budget=60, processes=None, seed=0, params=None):
+    """
+    Runs every engine many times with independent seeds on the benchmark sequences.
+    Serial engines run in parallel in a process pool. REMC_paral and REMC_multi already use all the cores
+    (and pool workers cannot start processes), so their runs are executed one after the other.
+    Args:
+        names (list of str, optional): Benchmark sequences to run. Defaults to all.
+        engines (list of str, optional): Engines to run. Defaults to ENGINES.
+        runs (int, optional): Number of runs per engine and sequence. Defaults to 10.
+        budget (float, optional): Time budget of each run, in seconds. Defaults to 60.
+        processes (int, optional): Number of pool workers for the serial engines. Defaults to the number of cores.
+        seed (int, optional): Base seed, the seed of run r is seed + r. Defaults to 0.
+        params (dict, optional): Extra arguments by engine name (e.g. {"REMCSimulation": {"phi": 500}}). Defaults to None.
+    Returns:
+        dict: {"runs": list of run results, "summary": list of summaries}
+    """
+    params = params or {}
+    jobs = [(engine, name, hp, E_star, seed + r, budget, params.get(engine, {}))
+            for name, hp, E_star in benchmark_sequences(names) for engine in engines for r in range(runs)]
+    serial_jobs = [job for job in jobs if job[0] in SERIAL_ENGINES]
+    parallel_jobs = [job for job in jobs if job[0] not in SERIAL_ENGINES]
+
+    results = []
+    with multiprocessing.Pool(processes) as pool:
+        for result in pool.imap_unordered(run_once, serial_jobs):
+            results.append(result)
+            print(f"{result['sequence']:6s} {result['engine']:15s} seed {result['seed']:4d} "
+                  f"E={result['energy']:4} {'OK' if result['success'] else '--'} {result['wall']:8.2f} s")
+    for job in parallel_jobs:
+        result = run_once(job)
+        results.append(result)
+        print(f"{result['sequence']:6s} {result['engine']:15s} seed {result['seed']:4d} "
+              f"E={result['energy']:4} {'OK' if result['success'] else '--'} {result['wall']:8.2f} s")
+
+    return {"runs": results, "summary": summarize(results)}
+
+
+
+def print_summary(summary):
+    """
+    Prints the summary table of run_benchmark.
+    Args:
+        summary (list of dict): Summaries returned by summarize.
+    """
+    def fmt(value):
+        return f"{value:9.2f}" if value is not None else "        -"
+
+    print(f"{'seq':6s} {'engine':15s} {'success':>8s} {'TTS p10':>9s} {'TTS med':>9s} {'TTS p90':>9s} {'CPU/succ':>9s} {'best E':>7s}")
+    for s in summary:
+        print(f"{s['sequence']:6s} {s['engine']:15s} {s['successes']:3d}/{s['runs']:<4d} {fmt(s['tts_p10'])} "
+              f"{fmt(s['tts_median'])} {fmt(s['tts_p90'])} {fmt(s['cpu_per_success'])} {s['best_energy']:7}")
+
+
+
+# ----- Time-to-solution benchmark -----
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Time-to-solution benchmark over the standard 2D HP sequences.")
+    parser.add_argument("--sequences", nargs="+", help="Names of the sequences (default: all)")
+    parser.add_argument("--engines", nargs="+", default=ENGINES, choices=ENGINES, help="Engines to run")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per engine and sequence")
+    parser.add_argument("--budget", type=float, default=60, help="Time budget of each run (s)")
+    parser.add_argument("--processes", type=int, help="Pool workers for the serial engines")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed")
+    parser.add_argument("--output", default="benchmark_hp.json", help="JSON file to write the results to")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sequences, args.engines, args.runs, args.budget, args.processes, args.seed)
+    print_summary(report["summary"])
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
@@ -0,0 +1,63 @@
+import os
+import pickle
+import tempfile
+import zlib
+
+
+MAGIC = b"HPCK"   # File signature
+VERSION = 1       # Format version, increased when the saved state changes
+
+
+
+def save_checkpoint(path, state):
+    """
+    Writes the state of a run to a checkpoint file (signature, version byte, then the zlib-compressed pickle).
+    The file is written to a temporary file of the same directory and then renamed, so that a run killed
+    while writing never leaves a truncated checkpoint.
+    Args:
+        path (str): Path of the checkpoint.
+        state (dict): State of the run.
+    """
+    data = MAGIC + bytes([VERSION]) + zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+
+def load_checkpoint(path, hp=None):
+    """
+    Reads a checkpoint file.
+    Args:
+        path (str): Path of the checkpoint.
+        hp (str, optional): HP sequence of the run to resume, checked against the checkpoint. Defaults to None.
+    Returns:
+        dict: State of the run, or None if the file does not exist.
+    Raises:
+        ValueError: If the file is not a valid checkpoint, or belongs to another sequence.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) <= len(MAGIC) or data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint file")
+    if data[len(MAGIC)] != VERSION:
+        raise ValueError(f"Unsupported checkpoint version {data[len(MAGIC)]} in {path}")
+    try:
+        state = pickle.loads(zlib.decompress(data[len(MAGIC) + 1:]))
+    except (zlib.error, pickle.UnpicklingError, EOFError) as error:
+        raise ValueError(f"{path} is a corrupt checkpoint file ({error})") from None
+    if not isinstance(state, dict):
+        raise ValueError(f"{path} is a corrupt checkpoint file")
+    if hp is not None and state["hp"] != hp:
+        raise ValueError(f"Checkpoint {path} belongs to another sequence")
+    return state
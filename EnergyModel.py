@@ -0,0 +1,237 @@
+from Others_function import energy_lower_bound
+from Lattice import SQUARE
+
+
+# Contact energies of the built-in models, by pair of residue types (symmetric)
+MODELS = {
+    "HP": {("H", "H"): -1, ("H", "P"): 0, ("P", "P"): 0},
+    # HP+ model of Li, Helling, Tang and Wingreen (Science, 1996): H-P contacts are also favourable
+    "HP+": {("H", "H"): -2.3, ("H", "P"): -1.0, ("P", "P"): 0.0},
+}
+
+
+def load_contact_matrix(path):
+    """
+    Reads a contact energy matrix (e.g. Miyazawa-Jernigan) from a text file: a first line with the residue letters,
+    then one line per letter with the letter followed by its energies with the letters of the first line (a full
+    matrix, or only the lower triangle). Lines starting with # are ignored.
+    Args:
+        path (str): Path of the matrix file.
+    Returns:
+        dict: Contact energies {(letter1, letter2): energy}, symmetric.
+    """
+    with open(path) as f:
+        rows = [line.split() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    letters = rows[0]
+    matrix = {}
+    for row in rows[1:]:
+        letter, values = row[0], row[1:]
+        if letter not in letters or len(values) > len(letters):
+            raise ValueError(f"invalid row for {letter} in {path}")
+        for other, value in zip(letters, values):
+            matrix[(letter, other)] = matrix[(other, letter)] = float(value)
+    return matrix
+
+
+
+class EnergyModel:
+    """
+    Energy function of one sequence on a lattice, compiled once and shared by the engines.
+    Residue types, the contact energy table and the list of residues that can interact are precomputed,
+    so that the energy of a conformation costs O(n) and the energy change of a move O(moved residues)
+    using an occupancy map of the interacting residues keyed by packed sites (see occupancy, delta and update).
+    The same interface serves the HP model, the HP+ model and any contact matrix over a residue alphabet
+    (e.g. the 20x20 Miyazawa-Jernigan matrix, see load_contact_matrix).
+    """
+
+    def __init__(self, sequence, model="HP", matrix=None, lattice=SQUARE):
+        """
+        Args:
+            sequence (str): Sequence (e.g. "HPPHHPH", or a protein sequence with a contact matrix).
+            model (str, optional): "HP", "HP+" or "matrix". Defaults to "HP".
+            matrix (dict, optional): Contact energies {(letter1, letter2): energy} of the "matrix" model
+                (missing pairs count 0). Defaults to None.
+            lattice (Lattice, optional): Lattice of the conformations. Defaults to SQUARE.
+        """
+        if model == "matrix":
+            if matrix is None:
+                raise ValueError("the matrix model needs a contact matrix")
+        elif model in MODELS:
+            matrix = MODELS[model]
+        else:
+            raise ValueError(f"unknown energy model {model} (choose from {', '.join(list(MODELS) + ['matrix'])})")
+        self.sequence = sequence
+        self.model = model
+        self.matrix = matrix
+        self.lattice = lattice
+
+        # Residue types and contact table (integers are kept as such, so that HP energies stay exact)
+        alphabet = sorted({letter for pair in matrix for letter in pair})
+        unknown = set(sequence) - set(alphabet)
+        if unknown:
+            raise ValueError(f"residues {''.join(sorted(unknown))} are not in the {model} model")
+        index = {letter: k for k, letter in enumerate(alphabet)}
+        self.types = [index[residue] for residue in sequence]
+        self.table = [[0] * len(alphabet) for _ in alphabet]
+        for (a, b), energy in matrix.items():
+            energy = int(energy) if energy == int(energy) else energy
+            self.table[index[a]][index[b]] = self.table[index[b]][index[a]] = energy
+
+        # Residues with a non-zero contact energy with some residue of the sequence, and their parity class
+        present = set(self.types)
+        self.interacting = [i for i, t in enumerate(self.types) if any(self.table[t][u] != 0 for u in present)]
+        self.is_interacting = [False] * len(sequence)
+        for i in self.interacting:
+            self.is_interacting[i] = True
+        self.parity = [[i for i in self.interacting if i % 2 == p] for p in (0, 1)]
+        # On a bipartite lattice only residues of opposite parity touch, so each contact is seen once from its even
+        # residue; otherwise every residue is scanned and a contact is only counted from its lower index
+        self.sources = self.parity[0] if lattice.bipartite else self.interacting
+        self.skip = 1 if lattice.bipartite else len(sequence)
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def prefix(self, length):
+        """Returns the model of the first length residues of the sequence."""
+        return EnergyModel(self.sequence[:length], self.model, self.matrix, self.lattice)
+
+    def occupancy(self, c):
+        """
+        Builds the occupancy map of a conformation, kept up to date by update().
+        Args:
+            c (list of tuples): Conformation.
+        Returns:
+            dict: {packed position: residue index} of the interacting residues.
+        """
+        pack = self.lattice.pack
+        return {pack(c[i]): i for i in self.interacting}
+
+    def energy(self, c, occupancy=None):
+        """
+        Calculates the energy of a conformation (sum of the contact energies of non-consecutive residues).
+        Args:
+            c (list of tuples): Conformation.
+            occupancy (dict, optional): Occupancy map of c. Defaults to a new one.
+        Returns:
+            int or float: Energy (lower is better).
+        """
+        if occupancy is None:
+            occupancy = self.occupancy(c)
+        types, table, skip = self.types, self.table, self.skip
+        pack, steps = self.lattice.pack, self.lattice.steps
+        energy = 0
+        for i in self.sources:
+            key = pack(c[i])
+            row = table[types[i]]
+            for step in steps:
+                j = occupancy.get(key + step)
+                if j is not None and (j - i > 1 or i - j > skip):
+                    energy += row[types[j]]
+        return energy
+
+    def delta(self, c_old, c_new, moved, occupancy):
+        """
+        Calculates the energy change of a move from the contacts of the moved residues only.
+        Args:
+            c_old (list of tuples): Conformation before the move.
+            c_new (list of tuples): Conformation after the move.
+            moved (list of int): Residues whose position changed (see moved_residues).
+            occupancy (dict): Occupancy map of c_old.
+        Returns:
+            int or float: E(c_new) - E(c_old).
+        """
+        is_interacting = self.is_interacting
+        moved = [i for i in moved if is_interacting[i]]
+        if not moved:
+            return 0
+        types, table = self.types, self.table
+        pack, steps = self.lattice.pack, self.lattice.steps
+        moved_set = set(moved)
+        new_keys = [pack(c_new[i]) for i in moved]
+        new_positions = dict(zip(new_keys, moved))
+        change = 0
+        for i, new_key in zip(moved, new_keys):
+            row = table[types[i]]
+            # Contacts lost (a contact between two moved residues is counted once, from the smaller index)
+            key = pack(c_old[i])
+            for step in steps:
+                j = occupancy.get(key + step)
+                if j is not None and abs(j - i) > 1 and (j not in moved_set or j > i):
+                    change -= row[types[j]]
+            # Contacts made
+            for step in steps:
+                position = new_key + step
+                j = new_positions.get(position)
+                if j is None:
+                    j = occupancy.get(position)
+                    if j in moved_set:
+                        continue  # This residue has moved away
+                if j is not None and abs(j - i) > 1 and (j not in moved_set or j > i):
+                    change += row[types[j]]
+        return change
+
+    def update(self, occupancy, c_old, c_new, moved):
+        """Updates the occupancy map of c_old in place after an accepted move to c_new."""
+        pack = self.lattice.pack
+        moved = [i for i in moved if self.is_interacting[i]]
+        for i in moved:
+            key = pack(c_old[i])
+            if occupancy.get(key) == i:
+                del occupancy[key]
+        for i in moved:
+            occupancy[pack(c_new[i])] = i
+
+    def lower_bound(self):
+        """
+        Calculates a provable lower bound on the energy. For the HP model on the square lattice this is
+        energy_lower_bound. Otherwise each residue has coordination - 2 free neighbours (one more at the chain ends);
+        on a bipartite lattice they all touch residues of opposite parity, so each parity class bounds the energy by
+        the sum of the most favourable contacts of its residues, and on other lattices the sum over all the residues
+        counts each contact twice.
+        Returns:
+            int or float: Lower bound (every conformation has an energy >= this value).
+        """
+        if self.model == "HP" and self.lattice is SQUARE:
+            return energy_lower_bound(self.sequence)
+        n = len(self.sequence)
+        if n < 4:
+            return 0
+        classes = self.parity if self.lattice.bipartite else [self.interacting, self.interacting]
+        bounds = []
+        for p in (0, 1):
+            partners = {self.types[j] for j in classes[1 - p]}
+            bound = 0
+            for i in classes[p]:
+                best = min([self.table[self.types[i]][u] for u in partners] + [0])
+                bound += best * self.lattice.contact_neighbours(i, n)
+            bounds.append(bound)
+        if self.lattice.bipartite:
+            return max(bounds)
+        return -(-bounds[0] // 2) if isinstance(bounds[0], int) else bounds[0] / 2
+
+
+
+#----- Test -----
+if __name__ == "__main__":
+    from Others_function import *
+    import random
+    import time
+
+    hp = "HPHPPHHPHPPHPHHPPHPH"
+    model = EnergyModel(hp)
+    c = generate_random_conformation(hp)
+    print(f"Energy: {model.energy(c)} (E: {E(c, hp)}), lower bound: {model.lower_bound()}")
+    print(f"HP+ energy: {EnergyModel(hp, 'HP+').energy(c)}, lower bound: {EnergyModel(hp, 'HP+').lower_bound()}")
+
+    hp = "HPHPPHHPHPPHPHHPPHPH" * 5
+    c = generate_random_conformation(hp)
+    model = EnergyModel(hp)
+    start = time.time()
+    for _ in range(10000):
+        E(c, hp)
+    print(f"E: {(time.time() - start) * 100:.1f} µs per call")
+    start = time.time()
+    for _ in range(10000):
+        model.energy(c)
+    print(f"EnergyModel.energy: {(time.time() - start) * 100:.1f} µs per call")
@@ -1,18 +1,34 @@
+import argparse
+import json
+import multiprocessing
+import os
+import re
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 
-def plot_molecule(c, hp_sequence, point_size=200, grid_color='gray', bg_color='white'):
+
+LABEL_CUTOFF = 100  # Residue numbers are only drawn for chains up to this length
+
+
+
+def draw_molecule(ax, c, hp_sequence, point_size=200, grid_color='gray', label_cutoff=LABEL_CUTOFF, title="HP Molecule",
+                  ticks=False):
     """
-    Plots an HP molecule configuration on a 2D grid.
+    Draws an HP molecule configuration on an axis with a constant number of artists: all the residues
+    in one scatter, all the bonds in one LineCollection and, for short chains, the residue numbers.
     Args:
+        ax (matplotlib.axes.Axes): Axis to draw on.
         c (list of tuples): Coordinates (x, y) of the molecule conformation.
         hp_sequence (str): HP sequence representing the molecule.
         point_size (int, optional): Size of the points (default 200).
         grid_color (str, optional): Color of the grid (default 'gray').
-        bg_color (str, optional): Background color (default 'white').
+        label_cutoff (int, optional): Residue numbers are drawn only if the chain is not longer (default LABEL_CUTOFF).
+        title (str, optional): Title of the axis (default "HP Molecule").
+        ticks (bool, optional): Puts a tick on every lattice line (default False).
+    Returns:
+        tuple: (residues, bonds, labels) artists, so that callers can move them to another conformation.
     """
-
-    # Create the figure and axis with specified background color
-    fig, ax = plt.subplots(figsize=(8, 8), facecolor=bg_color)
     ax.set_aspect('equal')
 
     # Set up the grid with dashed lines
@@ -23,39 +39,112 @@ def plot_molecule(c, hp_sequence, point_size=200, grid_color='gray', bg_color='w
     max_x, max_y = max(x for x, y in c) + 1, max(y for x, y in c) + 1
     ax.set_xlim(min_x, max_x)
     ax.set_ylim(min_y, max_y)
+    if ticks:
+        ax.set_xticks(range(min_x, max_x + 1))
+        ax.set_yticks(range(min_y, max_y + 1))
 
-    # Plot each residue
-    for i, (x, y) in enumerate(c):
-        residue_type = hp_sequence[i]
-
-        # Set color based on residue type (red for H, blue for P)
-        color = 'red' if residue_type == 'H' else 'blue'
-        ax.scatter(x, y, color=color, s=point_size)
-
-        # Add residue number label
-        ax.text(x, y, str(i), ha='center', va='center', color='white', fontsize=10)
+    # Bonds between consecutive residues, then the residues (red for H, blue for P) on top
+    bonds = ax.add_collection(LineCollection([(c[i], c[i + 1]) for i in range(len(c) - 1)], colors='black',
+                                             linewidths=1.5, zorder=1))
+    residues = ax.scatter([x for x, y in c], [y for x, y in c],
+                          c=['red' if residue == 'H' else 'blue' for residue in hp_sequence], s=point_size, zorder=2)
 
-    # Create bonds between consecutive residues
-    for i in range(len(c) - 1):
-        x1, y1 = c[i]
-        x2, y2 = c[i+1]
-        ax.plot([x1, x2], [y1, y2], 'k-', linewidth=1.5)
+    # Residue number labels (unreadable and slow for long chains)
+    labels = []
+    if len(c) <= label_cutoff:
+        labels = [ax.text(x, y, str(i), ha='center', va='center', color='white', fontsize=10, zorder=3)
+                  for i, (x, y) in enumerate(c)]
 
     # Add legend to identify residue types and bonds
     ax.legend(handles=[
-        plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10, label='H (Hydrophobic)'),
-        plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='blue', markersize=10, label='P (Polar)'),
-        plt.Line2D([0], [0], color='black', linewidth=1.5, label='Bond')
+        Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10, label='H (Hydrophobic)'),
+        Line2D([0], [0], marker='o', color='w', markerfacecolor='blue', markersize=10, label='P (Polar)'),
+        Line2D([0], [0], color='black', linewidth=1.5, label='Bond')
     ], loc='upper right')
+    if title is not None:
+        ax.set_title(title)
+    return residues, bonds, labels
+
+
 
-    # Add title to the plot
-    plt.title("HP Molecule")
+def plot_molecule(c, hp_sequence, point_size=200, grid_color='gray', bg_color='white', output=None,
+                  label_cutoff=LABEL_CUTOFF):
+    """
+    Plots an HP molecule configuration on a 2D grid.
+    Args:
+        c (list of tuples): Coordinates (x, y) of the molecule conformation.
+        hp_sequence (str): HP sequence representing the molecule.
+        point_size (int, optional): Size of the points (default 200).
+        grid_color (str, optional): Color of the grid (default 'gray').
+        bg_color (str, optional): Background color (default 'white').
+        output (str, optional): If given, the figure is rendered off-screen and saved to this file (format from
+            the extension) instead of shown.
+        label_cutoff (int, optional): Residue numbers are drawn only if the chain is not longer (default LABEL_CUTOFF).
+    """
+    if output is not None:
+        render_molecule(c, hp_sequence, output, point_size, grid_color, bg_color, label_cutoff)
+        return
+
+    fig, ax = plt.subplots(figsize=(8, 8), facecolor=bg_color)
+    draw_molecule(ax, c, hp_sequence, point_size, grid_color, label_cutoff)
     plt.show()
 
 
 
+def render_molecule(c, hp_sequence, output, point_size=200, grid_color='gray', bg_color='white',
+                    label_cutoff=LABEL_CUTOFF, dpi=100):
+    """
+    Renders an HP molecule configuration off-screen (Agg, without pyplot or a display) and saves it.
+    Args:
+        c (list of tuples): Coordinates (x, y) of the molecule conformation.
+        hp_sequence (str): HP sequence representing the molecule.
+        output (str): Image file (png, svg, pdf..., format from the extension).
+        point_size (int, optional): Size of the points (default 200).
+        grid_color (str, optional): Color of the grid (default 'gray').
+        bg_color (str, optional): Background color (default 'white').
+        label_cutoff (int, optional): Residue numbers are drawn only if the chain is not longer (default LABEL_CUTOFF).
+        dpi (int, optional): Resolution of raster formats (default 100).
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(8, 8), facecolor=bg_color)
+    FigureCanvasAgg(fig)
+    draw_molecule(fig.add_subplot(), c, hp_sequence, point_size, grid_color, label_cutoff)
+    fig.savefig(output, bbox_inches='tight', dpi=dpi, facecolor=bg_color)
+
+
+
+def _export_job(job):
+    """Renders one image of export_molecules (in a pool worker)."""
+    c, hp_sequence, output, options = job
+    render_molecule(c, hp_sequence, output, **options)
+    return output
+
+
+
+def export_molecules(molecules, directory, fmt="png", processes=None, **options):
+    """
+    Renders a set of conformations to image files in parallel worker processes.
+    Args:
+        molecules (iterable): (name, conformation, hp_sequence) tuples.
+        directory (str): Output directory (created if needed).
+        fmt (str, optional): Image format, e.g. "png" or "svg" (default "png").
+        processes (int, optional): Number of worker processes (default: number of cores).
+        **options: Extra arguments of render_molecule (point_size, label_cutoff, dpi...).
+    Returns:
+        list of str: Paths of the written images, in completion order.
+    """
+    os.makedirs(directory, exist_ok=True)
+    jobs = ((c, hp_sequence, os.path.join(directory, f"{re.sub(r'[^\w.-]', '_', str(name))}.{fmt}"), options)
+            for name, c, hp_sequence in molecules)
+    with multiprocessing.Pool(processes) as pool:
+        return list(pool.imap_unordered(_export_job, jobs))
+
+
+
 def plot_molecules_side_by_side(c1, c2, hp_sequence, point_size=200, grid_color='gray', bg_color='white',
-                               title1="Initial configuration", title2="New configuration"):
+                               title1="Initial configuration", title2="New configuration", output=None):
     """
     Plots two HP molecule configurations side by side for comparison.
     Args:
@@ -67,6 +156,7 @@ def plot_molecules_side_by_side(c1, c2, hp_sequence, point_size=200, grid_color=
         bg_color (str, optional): Background color (default 'white').
         title1 (str, optional): Title of the first plot (default "Initial configuration").
         title2 (str, optional): Title of the second plot (default "New configuration").
+        output (str, optional): If given, the figure is saved to this file instead of shown.
     """
 
     # Verify that configurations and HP sequence have the same length
@@ -77,51 +167,54 @@ def plot_molecules_side_by_side(c1, c2, hp_sequence, point_size=200, grid_color=
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8), facecolor=bg_color)
     fig.suptitle(f"Configuration comparison: {hp_sequence}", fontsize=14, y=1.02)
 
-    # Function to plot a single molecule on a given axis
-    def plot_single_molecule(ax, c, title):
-        ax.set_aspect('equal')
-        ax.grid(True, which='both', linestyle='--', linewidth=0.5, color=grid_color)
+    # Plot both configurations
+    draw_molecule(ax1, c1, hp_sequence, point_size, grid_color, title=title1, ticks=True)
+    draw_molecule(ax2, c2, hp_sequence, point_size, grid_color, title=title2, ticks=True)
+    plt.tight_layout()
+    if output is not None:
+        fig.savefig(output, bbox_inches='tight')
+        plt.close(fig)
+    else:
+        plt.show()
 
-        # Adjust grid limits
-        min_x, min_y = min(x for x, y in c) - 1, min(y for x, y in c) - 1
-        max_x, max_y = max(x for x, y in c) + 1, max(y for x, y in c) + 1
-        ax.set_xlim(min_x, max_x)
-        ax.set_ylim(min_y, max_y)
-        ax.set_xticks(range(min_x, max_x + 1))
-        ax.set_yticks(range(min_y, max_y + 1))
-        ax.set_title(title)
 
-        # Plot residues
-        for i, (x, y) in enumerate(c):
-            residue_type = hp_sequence[i]
-            color = 'red' if residue_type == 'H' else 'blue'
-            ax.scatter(x, y, color=color, s=point_size)
-            ax.text(x, y, str(i), ha='center', va='center', color='white', fontsize=10)
-
-        # Create bonds between consecutive residues
-        for i in range(len(c) - 1):
-            x1, y1 = c[i]
-            x2, y2 = c[i+1]
-            ax.plot([x1, x2], [y1, y2], 'k-', linewidth=1.5)
-
-        # Add legend
-        handles = [
-            plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10, label='H (Hydrophobic)'),
-            plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='blue', markersize=10, label='P (Polar)'),
-            plt.Line2D([0], [0], color='black', linewidth=1.5, label='Bond')
-        ]
-        ax.legend(handles=handles, loc='upper right')
 
-    # Plot both configurations
-    plot_single_molecule(ax1, c1, title1)
-    plot_single_molecule(ax2, c2, title2)
-    plt.tight_layout()
-    plt.show()
+def read_results(path):
+    """
+    Reads folding results written as JSON lines (by Batch.py or main.py --format json), skipping the records of
+    failed jobs.
+    Args:
+        path (str): Path of the results file.
+    Yields:
+        tuple: (name, conformation, hp_sequence)
+    """
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                result = json.loads(line)
+                if "error" in result:
+                    continue
+                yield result.get("name", f"result{line_number}"), [tuple(p) for p in result["conformation"]], result["hp"]
+
 
 
 #----- Test -----
 if __name__ == "__main__":
-    c = [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0), (4, 1), (3, 1), (2, 1), (1, 1), (0, 1),
-         (0, 2), (1, 2), (2, 2), (3, 2), (4, 2), (4, 3), (3, 3), (2, 3), (1, 3), (0, 3)]
-    hp_sequence = "HPPHHPHPPHHPHPPHHPHP"
-    plot_molecule(c, hp_sequence, point_size=200, grid_color='gray', bg_color='white')
+
+    parser = argparse.ArgumentParser(description="Plots HP conformations, or exports a results file as images.")
+    parser.add_argument("results", nargs="?", help="JSON lines results (Batch.py, main.py --format json) to export")
+    parser.add_argument("--out-dir", default="images", help="Output directory of the images")
+    parser.add_argument("--format", default="png", help="Image format (png, svg, pdf...)")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: number of cores)")
+    parser.add_argument("--label-cutoff", type=int, default=LABEL_CUTOFF, help="Longest chain with residue numbers")
+    args = parser.parse_args()
+
+    if args.results is not None:
+        paths = export_molecules(read_results(args.results), args.out_dir, args.format, args.processes,
+                                 label_cutoff=args.label_cutoff)
+        print(f"{len(paths)} images written to {args.out_dir}")
+    else:
+        c = [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0), (4, 1), (3, 1), (2, 1), (1, 1), (0, 1),
+             (0, 2), (1, 2), (2, 2), (3, 2), (4, 2), (4, 3), (3, 3), (2, 3), (1, 3), (0, 3)]
+        hp_sequence = "HPPHHPHPPHHPHPPHHPHP"
+        plot_molecule(c, hp_sequence, point_size=200, grid_color='gray', bg_color='white')
@@ -1,73 +1,218 @@
 from Monte_Carlo import *
 from Neighbourhoods import *
 from Others_function import *
+from Telemetry import TelemetryClient
+import multiprocessing
+import queue
+import time
 import tkinter as tk
 from tkinter import ttk
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 
-def plot_molecule_interface(c, hp_sequence, point_size=200, grid_color='gray', bg_color='white'):
+class LivePlot:
     """
-    Plots an HP molecule configuration on a 2D grid for interface display.
-
-    Args:
-        c (list of tuples): List of (x, y) coordinates representing the molecule conformation.
-        hp_sequence (str): HP sequence representing the molecule (e.g., "HPPHHPH").
-        point_size (int, optional): Size of the points representing residues. Defaults to 200.
-        grid_color (str, optional): Color of the grid lines. Defaults to 'gray'.
-        bg_color (str, optional): Background color of the plot. Defaults to 'white'.
-
-    Returns:
-        matplotlib.figure.Figure: The figure object containing the plot.
+    Figure of the interface, updated in place while a search runs: the displayed conformation (left) and the
+    replica energies versus time (right). The artists are created once and marked as animated; an update only
+    moves them and blits them over a cached background, and the whole figure is redrawn only when the axis
+    limits have to grow. Renders are capped at max_fps, so a fast stream of records never floods the Tk loop.
     """
 
-    # Create figure and axis with specified background color
-    fig, ax = plt.subplots(figsize=(6, 6), facecolor=bg_color)
-    ax.set_aspect('equal')
-
-    # Set up grid with dashed lines
-    ax.grid(True, which='both', linestyle='--', linewidth=0.5, color=grid_color)
-
-    # Automatically adjust grid limits based on molecule coordinates
-    min_x, min_y = min(x for x, y in c) - 1, min(y for x, y in c) - 1
-    max_x, max_y = max(x for x, y in c) + 1, max(y for x, y in c) + 1
-    ax.set_xlim(min_x, max_x)
-    ax.set_ylim(min_y, max_y)
-
-    # Plot each residue with appropriate color (red for H, blue for P)
-    for i, (x, y) in enumerate(c):
-        color = 'red' if hp_sequence[i] == 'H' else 'blue'
-        ax.scatter(x, y, color=color, s=point_size)
-        ax.text(x, y, str(i), ha='center', va='center', color='white', fontsize=10)
-
-    # Create bonds between consecutive residues
-    for i in range(len(c) - 1):
-        x1, y1 = c[i]
-        x2, y2 = c[i+1]
-        ax.plot([x1, x2], [y1, y2], 'k-', linewidth=1.5)
+    def __init__(self, master, max_fps=10, label_cutoff=50, max_points=2000):
+        """
+        Args:
+            master (tk widget): Parent of the canvas.
+            max_fps (float, optional): Maximum number of renders per second. Defaults to 10.
+            label_cutoff (int, optional): Residue indices are only drawn for chains up to this length. Defaults to 50.
+            max_points (int, optional): Points kept per energy curve (older points are thinned out). Defaults to 2000.
+        """
+        self.max_fps = max_fps
+        self.label_cutoff = label_cutoff
+        self.max_points = max_points
+        self.fig, (self.ax, self.ax_energy) = plt.subplots(1, 2, figsize=(11, 5.5), facecolor='white')
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+        self.ax.set_aspect('equal')
+        self.ax.grid(True, which='both', linestyle='--', linewidth=0.5, color='gray')
+        self.ax.set_title("HP Molecule")
+        self.ax.legend(handles=[
+            plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10, label='H (Hydrophobic)'),
+            plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='blue', markersize=10, label='P (Polar)'),
+            plt.Line2D([0], [0], color='black', linewidth=1.5, label='Bond')
+        ], loc='upper right')
+        self.bonds, = self.ax.plot([], [], 'k-', linewidth=1.5, zorder=1, animated=True)
+        self.residues = self.ax.scatter([], [], s=200, zorder=2, animated=True)
+        self.labels = []
+
+        self.ax_energy.set_title("Replica energies")
+        self.ax_energy.set_xlabel("Time (s)")
+        self.ax_energy.set_ylabel("Energy")
+        self.ax_energy.set_xlim(0, 10)
+        self.ax_energy.set_ylim(-10, 1)
+        self.curves = []
+        self.times = []
+        self.energies = []
+
+        self.background = None
+        self.last_render = 0.0
+        self.dirty = False
+        self.canvas.draw()
 
-    # Add legend to identify residue types and bonds
-    ax.legend(handles=[
-        plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10, label='H (Hydrophobic)'),
-        plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='blue', markersize=10, label='P (Polar)'),
-        plt.Line2D([0], [0], color='black', linewidth=1.5, label='Bond')
-    ], loc='upper right')
+    def _artists(self):
+        return [self.bonds, self.residues] + self.labels + self.curves
+
+    def _on_draw(self, event):
+        """Caches the static background after a full draw and draws the animated artists over it."""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self._artists():
+            artist.axes.draw_artist(artist)
+
+    def reset(self, hp, replicas=0):
+        """
+        Prepares the figure for a new run.
+        Args:
+            hp (str): HP sequence.
+            replicas (int, optional): Number of energy curves. Defaults to 0.
+        """
+        self.hp = hp
+        self.residues.set_offsets([(0, 0)] * len(hp))
+        self.residues.set_facecolor(['red' if residue == 'H' else 'blue' for residue in hp])
+        self.residues.set_visible(False)
+        self.bonds.set_data([], [])
+        for artist in self.labels + self.curves:
+            artist.remove()
+        self.labels = [self.ax.text(0, 0, str(i), ha='center', va='center', color='white', fontsize=10, zorder=3,
+                                    animated=True, visible=False)
+                       for i in range(len(hp) if len(hp) <= self.label_cutoff else 0)]
+        self.curves = [self.ax_energy.plot([], [], linewidth=1, animated=True, label=f"Replica {k + 1}")[0]
+                       for k in range(replicas)]
+        self.times = []
+        self.energies = [[] for _ in range(replicas)]
+        self.ax.set_xlim(-len(hp) // 4 - 1, len(hp) // 4 + 1)
+        self.ax.set_ylim(-len(hp) // 4 - 1, len(hp) // 4 + 1)
+        self.ax_energy.set_xlim(0, 10)
+        self.ax_energy.set_ylim(-10, 1)
+        if self.ax_energy.get_legend() is not None:
+            self.ax_energy.get_legend().remove()
+        if 0 < replicas <= 12:
+            self.ax_energy.legend(loc='upper right', fontsize=8)
+        self.background = None
+        self.dirty = True
+
+    def set_conformation(self, c):
+        """Moves the residues, bonds and labels to a conformation."""
+        xs, ys = [x for x, y in c], [y for x, y in c]
+        self.residues.set_offsets(c)
+        self.residues.set_visible(True)
+        self.bonds.set_data(xs, ys)
+        for label, position in zip(self.labels, c):
+            label.set_position(position)
+            label.set_visible(True)
+        xmin, xmax = self.ax.get_xlim()
+        ymin, ymax = self.ax.get_ylim()
+        if min(xs) < xmin + 0.5 or max(xs) > xmax - 0.5 or min(ys) < ymin + 0.5 or max(ys) > ymax - 0.5:
+            # Grows the limits with a margin, so that they rarely change while the chain moves
+            margin = max(2, len(c) // 8)
+            self.ax.set_xlim(min(xs) - margin, max(xs) + margin)
+            self.ax.set_ylim(min(ys) - margin, max(ys) + margin)
+            self.background = None
+        self.dirty = True
+
+    def add_energies(self, t, energies):
+        """Appends the replica energies sampled at time t."""
+        if len(energies) != len(self.curves):
+            return
+        self.times.append(t)
+        for values, energy in zip(self.energies, energies):
+            values.append(energy)
+        if len(self.times) > self.max_points:
+            self.times = self.times[::2]
+            self.energies = [values[::2] for values in self.energies]
+        for curve, values in zip(self.curves, self.energies):
+            curve.set_data(self.times, values)
+        tmax = self.ax_energy.get_xlim()[1]
+        emin = self.ax_energy.get_ylim()[0]
+        if t > tmax or min(energies) < emin:
+            self.ax_energy.set_xlim(0, max(tmax, 2 * t))
+            self.ax_energy.set_ylim(min(emin, 1.25 * min(energies) - 1), 1)
+            self.background = None
+        self.dirty = True
+
+    def render(self, force=False):
+        """
+        Draws the pending changes, unless the last render is more recent than 1 / max_fps (the changes are then
+        kept for the next call) and force is False.
+        """
+        if not self.dirty or (not force and time.time() - self.last_render < 1 / self.max_fps):
+            return
+        if self.background is None:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            for artist in self._artists():
+                artist.axes.draw_artist(artist)
+            self.canvas.blit(self.fig.bbox)
+        self.last_render = time.time()
+        self.dirty = False
+
+
+def solve(method, hp, E_star, params, progress, stop_event, use_db):
+    """
+    Runs a search function in a background process of the interface. The progress (telemetry records) and
+    the final result are sent through a queue, and the search stops cooperatively when stop_event is set.
 
-    plt.title("HP Molecule")
-    return fig
+    Args:
+        method (str): Method name of the interface ("Monte Carlo Search", "REMC Multi Processes" or "REMC Parallelized").
+        hp (str): HP sequence.
+        E_star (int): Target energy (None for the stored energy or the lower bound).
+        params (dict): Parameters of the search function.
+        progress (multiprocessing.Queue): Receives the telemetry records, then a "result" or "error" record.
+        stop_event (multiprocessing.Event): Cancels the search when set.
+        use_db (bool): Starts from the results database and records the result.
+    """
+    telemetry = TelemetryClient(progress, min_interval=0.1, conformations=True)
+    db = ResultsDB("results.sqlite") if use_db else None
+    try:
+        if method == "Monte Carlo Search":
+            best_conformation, best_energy = MCsearch(hp, E_star=E_star, db=db, telemetry=telemetry,
+                                                      stop_event=stop_event, **params)
+        elif method == "REMC Multi Processes":
+            best_conformation, best_energy = REMC_multi(hp, E_star, db=db, telemetry=telemetry, stop_event=stop_event,
+                                                        **params)
+        else:  # Remc Parallelized
+            best_conformation, best_energy = REMC_paral(hp, E_star, db=db, telemetry=telemetry, stop_event=stop_event,
+                                                        **params)
+        progress.put({"type": "result", "best_energy": best_energy, "best_conformation": best_conformation,
+                      "cancelled": stop_event.is_set()})
+    except Exception as error:
+        progress.put({"type": "error", "message": f"{type(error).__name__}: {error}"})
+    finally:
+        if db is not None:
+            db.close()
 
 
 class HPModelApp:
     def __init__(self, root):
         self.root = root
         self.root.title("HP Model Simulation")
-        self.root.protocol("WM_DELETE_WINDOW", self.root.quit)
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
+
+        # Background job (solver process, progress queue and cancellation event)
+        self.job = None
+        self.progress = None
+        self.stop_event = None
+        self.job_hp = None
+        self.best_conformation = None
 
         # Variables to store selected method and parameters
         self.method_var = tk.StringVar(value="Monte Carlo Search")
         self.hp_sequence = tk.StringVar(value="HPHPPHHPHPPHPHHPPHPH")
-        self.E_star = tk.IntVar(value=-9)
+        self.E_star = tk.StringVar(value="-9")  # Empty: automatic lower bound
+        self.use_db = tk.BooleanVar(value=False)  # Start from the stored results and record the new ones
+        self.show_var = tk.StringVar(value="Best")  # Conformation displayed during a run: best or a replica
 
         # Parameters for Monte Carlo Search
         self.mc_phi = tk.IntVar(value=10000)
@@ -114,8 +259,13 @@ class HPModelApp:
         ttk.Label(left_frame, text="HP Sequence:").grid(row=1, column=0, sticky="w")
         ttk.Entry(left_frame, textvariable=self.hp_sequence).grid(row=1, column=1, sticky="ew")
 
-        ttk.Label(left_frame, text="Target Energy (E*):").grid(row=2, column=0, sticky="w")
+        ttk.Label(left_frame, text="Target Energy (E*, empty = bound):").grid(row=2, column=0, sticky="w")
         ttk.Entry(left_frame, textvariable=self.E_star).grid(row=2, column=1, sticky="ew")
+        ttk.Checkbutton(left_frame, text="Use results database (results.sqlite)", variable=self.use_db).grid(row=6, column=0, columnspan=2, sticky="w")
+        ttk.Label(left_frame, text="Show:").grid(row=7, column=0, sticky="w")
+        self.show_combobox = ttk.Combobox(left_frame, textvariable=self.show_var, values=["Best"], state="readonly")
+        self.show_combobox.grid(row=7, column=1, sticky="ew")
+        self.show_combobox.bind("<<ComboboxSelected>>", self.on_show_change)
 
         # Monte Carlo Search Parameters Frame
         self.mc_frame = ttk.LabelFrame(left_frame, text="Monte Carlo Search Parameters", padding=5)
@@ -161,24 +311,27 @@ class HPModelApp:
         ttk.Label(self.remc_paral_frame, text="Max REMC Iterations:").grid(row=5, column=0, sticky="w")
         ttk.Entry(self.remc_paral_frame, textvariable=self.remc_paral_max_iterations).grid(row=5, column=1, sticky="ew")
 
-        # Run Button
-        ttk.Button(left_frame, text="Run Simulation", command=self.run_simulation).grid(row=8, column=0, columnspan=2, pady=10)
+        # Run and Cancel Buttons
+        self.run_button = ttk.Button(left_frame, text="Run Simulation", command=self.run_simulation)
+        self.run_button.grid(row=8, column=0, pady=10)
+        self.cancel_button = ttk.Button(left_frame, text="Cancel", command=self.cancel_simulation, state="disabled")
+        self.cancel_button.grid(row=8, column=1, pady=10)
 
         # Quit Button
-        ttk.Button(left_frame, text="Quit", command=self.root.quit).grid(row=9, column=0, columnspan=2, pady=10)
+        ttk.Button(left_frame, text="Quit", command=self.quit).grid(row=9, column=0, columnspan=2, pady=10)
 
         # Right Frame for Results
         self.right_frame = ttk.LabelFrame(self.root, text="Results", padding=10)
         self.right_frame.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
         self.result_label = ttk.Label(self.right_frame, text="Minimum Energy: ")
         self.result_label.pack()
+        self.status_label = ttk.Label(self.right_frame, text="Ready")
+        self.status_label.pack()
 
-        # Frame for the plot
+        # Frame for the plot (conformation and replica energies, updated live)
         self.plot_frame = ttk.Frame(self.right_frame)
         self.plot_frame.pack(fill=tk.BOTH, expand=True)
-        self.fig, self.ax = plt.subplots(figsize=(6, 6), facecolor='white')
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
-        self.canvas.get_tk_widget().pack()
+        self.live_plot = LivePlot(self.plot_frame)
 
         # Frame for coordinates
         self.coords_frame = ttk.Frame(self.right_frame)
@@ -206,46 +359,127 @@ class HPModelApp:
             self.remc_paral_frame.grid()
 
     def run_simulation(self):
-        hp = self.hp_sequence.get()
-        E_star = self.E_star.get()
-
-        if self.method_var.get() == "Monte Carlo Search":
-            phi = self.mc_phi.get()
-            nu = self.mc_nu.get()
-            T = self.mc_T.get()
-            best_conformation, best_energy = MCsearch(hp, phi=phi, nu=nu, T=T, E_star=E_star)
-        elif self.method_var.get() == "REMC Multi Processes":
-            phi = self.remc_phi.get()
-            nu = self.remc_nu.get()
-            T_init = self.remc_T_init.get()
-            T_final = self.remc_T_final.get()
-            chi = self.remc_chi.get()
-            max_iteration = self.remc_max_iteration.get()
-            nb_processus = self.remc_nb_processus.get()
-            best_conformation, best_energy = REMC_multi(
-                hp, E_star, phi=phi, nu=nu, T_init=T_init, T_final=T_final, chi=chi, max_iteration=max_iteration, nb_processus=nb_processus
-            )
+        if self.job is not None:
+            return
+        method = self.method_var.get()
+        try:
+            hp = expand_hp_sequence(self.hp_sequence.get())
+        except ValueError as error:
+            self.status_label.config(text=f"Invalid HP sequence: {error}")
+            return
+        E_star = int(self.E_star.get()) if self.E_star.get().strip() else None
+
+        if method == "Monte Carlo Search":
+            params = {"phi": self.mc_phi.get(), "nu": self.mc_nu.get(), "T": self.mc_T.get()}
+        elif method == "REMC Multi Processes":
+            params = {"phi": self.remc_phi.get(), "nu": self.remc_nu.get(), "T_init": self.remc_T_init.get(),
+                      "T_final": self.remc_T_final.get(), "chi": self.remc_chi.get(),
+                      "max_iteration": self.remc_max_iteration.get(), "nb_processus": self.remc_nb_processus.get()}
         else:  # Remc Parallelized
-            phi = self.remc_paral_phi.get()
-            nu = self.remc_paral_nu.get()
-            T_init = self.remc_paral_T_init.get()
-            T_final = self.remc_paral_T_final.get()
-            chi = self.remc_paral_chi.get()
-            max_iterations = self.remc_paral_max_iterations.get()
-            best_conformation, best_energy = REMC_paral(
-                hp, E_star, phi=phi, nu=nu, T_init=T_init, T_final=T_final, chi=chi, max_iterations=max_iterations
-            )
-
-        # Update results
-        self.result_label.config(text=f"Minimum Energy: {best_energy}")
-        self.plot_conformation(best_conformation, hp)
-        self.display_coordinates(best_conformation)
-
-    def plot_conformation(self, conformation, hp_sequence):
-        self.ax.clear()
-        self.fig = plot_molecule_interface(conformation, hp_sequence)
-        self.canvas.figure = self.fig
-        self.canvas.draw()
+            params = {"phi": self.remc_paral_phi.get(), "nu": self.remc_paral_nu.get(),
+                      "T_init": self.remc_paral_T_init.get(), "T_final": self.remc_paral_T_final.get(),
+                      "chi": self.remc_paral_chi.get(), "max_iterations": self.remc_paral_max_iterations.get()}
+
+        # Replicas that can be displayed (those of the first worker for REMC Multi Processes)
+        replicas = params.get("chi", 0)
+        self.show_combobox.config(values=["Best"] + [f"Replica {k + 1}" for k in range(replicas)])
+        self.show_var.set("Best")
+        self.best_conformation = None
+        self.live_plot.reset(hp, replicas)
+        self.live_plot.render(force=True)
+
+        # The solver runs in a (non-daemonic) process, so that REMC_multi and REMC_paral can start their own workers
+        self.progress = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.job_hp = hp
+        self.job = multiprocessing.Process(target=solve, args=(method, hp, E_star, params, self.progress, self.stop_event,
+                                                               self.use_db.get()))
+        self.job.start()
+        self.run_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        self.status_label.config(text=f"Running {method}...")
+        self.root.after(100, self.poll_progress)
+
+    def cancel_simulation(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+            self.status_label.config(text="Cancelling...")
+
+    def poll_progress(self):
+        """Applies the records sent by the solver process, then polls again until the job is over."""
+        if self.job is None:
+            return
+        while True:
+            try:
+                record = self.progress.get_nowait()
+            except queue.Empty:
+                break
+            if record["type"] == "iteration":
+                worker = f"worker {record['worker']}, " if "worker" in record else ""
+                self.status_label.config(text=f"Iteration {record['iteration']} ({worker}{record['time']:.1f} s), "
+                                              f"best energy {record['best_energy']}")
+                if record.get("worker", 0) == 0:
+                    self.live_plot.add_energies(record["time"], record["energies"])
+                    replica = self.shown_replica()
+                    if replica is not None and replica < len(record.get("conformations", [])):
+                        self.live_plot.set_conformation(record["conformations"][replica])
+            elif record["type"] == "best":
+                self.best_conformation = record["best_conformation"]
+                self.result_label.config(text=f"Minimum Energy: {record['best_energy']}")
+                if self.shown_replica() is None:
+                    self.live_plot.set_conformation(self.best_conformation)
+            elif record["type"] == "result":
+                self.show_var.set("Best")
+                self.show_result(record["best_conformation"], record["best_energy"])
+                self.finish_job("Cancelled" if record["cancelled"] else "Done")
+                return
+            elif record["type"] == "error":
+                self.finish_job(f"Error: {record['message']}")
+                return
+        self.live_plot.render()
+        if not self.job.is_alive() and self.progress.empty():
+            self.finish_job("The solver process stopped unexpectedly")
+            return
+        self.root.after(50, self.poll_progress)
+
+    def shown_replica(self):
+        """Index of the replica selected in the Show box, None for the best conformation."""
+        show = self.show_var.get()
+        return None if show == "Best" else int(show.split()[1]) - 1
+
+    def on_show_change(self, event=None):
+        # The selected replica is displayed at the next iteration record; the best conformation right away
+        if self.shown_replica() is None and self.best_conformation is not None:
+            self.live_plot.set_conformation(self.best_conformation)
+            self.live_plot.render(force=True)
+
+    def finish_job(self, status):
+        self.job.join()
+        self.job = None
+        self.progress = None
+        self.stop_event = None
+        self.run_button.config(state="normal")
+        self.cancel_button.config(state="disabled")
+        self.status_label.config(text=status)
+
+    def quit(self):
+        """Stops the running job (cooperatively, then by force) and closes the interface."""
+        if self.job is not None:
+            self.stop_event.set()
+            self.job.join(timeout=5)
+            if self.job.is_alive():
+                self.job.terminate()
+        self.root.quit()
+
+    def show_result(self, conformation, energy):
+        self.best_conformation = conformation
+        self.result_label.config(text=f"Minimum Energy: {energy}")
+        self.plot_conformation(conformation)
+        self.display_coordinates(conformation)
+
+    def plot_conformation(self, conformation):
+        self.live_plot.set_conformation(conformation)
+        self.live_plot.render(force=True)
 
     def display_coordinates(self, conformation):
         self.coords_text.config(state='normal')
@@ -0,0 +1,143 @@
+from math import sqrt
+
+
+# Sites are packed into one integer, x + y * STRIDE + z * STRIDE², so that the neighbours of a site are obtained by
+# adding precomputed integer steps. Coordinates must stay within ±STRIDE / 2, far more than any chain length.
+STRIDE = 1 << 20
+
+
+
+def _pack2(p):
+    return p[0] + p[1] * STRIDE
+
+
+def _pack3(p):
+    return p[0] + (p[1] + p[2] * STRIDE) * STRIDE
+
+
+def _unit2(p, q):
+    return abs(p[0] - q[0]) + abs(p[1] - q[1]) == 1
+
+
+def _unit3(p, q):
+    return abs(p[0] - q[0]) + abs(p[1] - q[1]) + abs(p[2] - q[2]) == 1
+
+
+def _add2(p, d):
+    return (p[0] + d[0], p[1] + d[1])
+
+
+def _add3(p, d):
+    return (p[0] + d[0], p[1] + d[1], p[2] + d[2])
+
+
+
+class Lattice:
+    """
+    Descriptor of a lattice: neighbour offsets and their packed integer steps, plus the tables used by the moves.
+    Everything that depends on the lattice (dimension, number of neighbours, bipartite or not) is resolved here once,
+    so that the move and energy code stays free of per-call branching.
+    Lattices are shared module-level objects (SQUARE, CUBIC, TRIANGULAR), pickled by name.
+    """
+
+    def __init__(self, name, directions, bipartite, basis=None):
+        """
+        Args:
+            name (str): Name of the lattice (key of LATTICES).
+            directions (list of tuples): Offsets of the neighbours of a site (also the order of the random walks).
+            bipartite (bool): True if only sites of opposite coordinate-sum parity are neighbours, so that only
+                residues of opposite index parity can be in contact.
+            basis (list of tuples, optional): Cartesian vectors of the coordinate axes, for plotting. Defaults to
+                the identity.
+        """
+        self.name = name
+        self.directions = tuple(directions)
+        self.direction_set = frozenset(self.directions)
+        self.dimension = len(self.directions[0])
+        self.coordination = len(self.directions)
+        self.bipartite = bipartite
+        self.basis = basis
+        self.pack = _pack2 if self.dimension == 2 else _pack3
+        self.add = _add2 if self.dimension == 2 else _add3
+        self.steps = tuple(self.pack(d) for d in self.directions)
+        self.step_set = frozenset(self.steps)
+        # Neighbours of the square and cubic lattices are at Manhattan distance 1, which is the fastest test
+        hypercubic = self.coordination == 2 * self.dimension and all(sum(map(abs, d)) == 1 for d in self.directions)
+        if hypercubic:
+            self.is_adjacent = _unit2 if self.dimension == 2 else _unit3
+
+        # Bridges: for two sites a and b separated by the packed offset b - a, the offsets d such that a + d is a
+        # neighbour of both (the candidate positions of a corner move between a and b)
+        self.bridges = {}
+        for d1 in self.directions:
+            for d2 in self.directions:
+                offset = self.pack(d1) + self.pack(d2)
+                if offset != 0 and d1 not in self.bridges.get(offset, ()):
+                    self.bridges[offset] = self.bridges.get(offset, ()) + (d1,)
+
+    def __repr__(self):
+        return f"Lattice({self.name!r})"
+
+    def __reduce__(self):
+        return get_lattice, (self.name,)
+
+    def is_adjacent(self, p, q):
+        """Checks if two sites are neighbours (replaced by a Manhattan distance test on the square and cubic lattices)."""
+        return self.pack(q) - self.pack(p) in self.step_set
+
+    def neighbours(self, p):
+        """Returns the neighbour sites of a site, in the order of directions."""
+        return [self.add(p, d) for d in self.directions]
+
+    def to_cartesian(self, c):
+        """
+        Converts lattice coordinates to Cartesian coordinates (e.g. to plot triangular conformations).
+        Args:
+            c (list of tuples): Conformation.
+        Returns:
+            list of tuples: Cartesian coordinates (c itself if the axes are orthonormal).
+        """
+        if self.basis is None:
+            return c
+        return [tuple(sum(x * axis[i] for x, axis in zip(p, self.basis)) for i in range(len(self.basis[0]))) for p in c]
+
+    def contact_neighbours(self, i, n):
+        """
+        Returns the number of neighbours of residue i of a chain of length n that are free for contacts
+        (all neighbours but the chain neighbours).
+        """
+        return self.coordination - (1 if i == 0 or i == n - 1 else 2)
+
+
+
+SQUARE = Lattice("square", [(0, 1), (0, -1), (1, 0), (-1, 0)], bipartite=True)
+CUBIC = Lattice("cubic", [(0, 1, 0), (0, -1, 0), (1, 0, 0), (-1, 0, 0), (0, 0, 1), (0, 0, -1)], bipartite=True)
+# Axial coordinates: the second axis is at 60 degrees from the first one
+TRIANGULAR = Lattice("triangular", [(0, 1), (0, -1), (1, 0), (-1, 0), (1, -1), (-1, 1)], bipartite=False,
+                     basis=[(1, 0), (0.5, sqrt(3) / 2)])
+LATTICES = {lattice.name: lattice for lattice in (SQUARE, CUBIC, TRIANGULAR)}
+
+
+
+def get_lattice(name):
+    """
+    Returns a lattice by name.
+    Args:
+        name (str): "square", "cubic" or "triangular".
+    Returns:
+        Lattice: Shared lattice object.
+    """
+    if name not in LATTICES:
+        raise ValueError(f"unknown lattice {name} (choose from {', '.join(LATTICES)})")
+    return LATTICES[name]
+
+
+
+# ----- Lattice Tests -----
+if __name__ == "__main__":
+    for lattice in LATTICES.values():
+        origin = (0,) * lattice.dimension
+        print(f"{lattice.name}: {lattice.coordination} neighbours, bipartite {lattice.bipartite}, "
+              f"neighbours of the origin {lattice.neighbours(origin)}")
+        print(f"  corner positions between {origin} and {lattice.add(lattice.directions[0], lattice.directions[2])}: "
+              f"{lattice.bridges[lattice.steps[0] + lattice.steps[2]]}")
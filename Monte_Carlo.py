@@ -2,13 +2,61 @@ import random
 from math import exp
 from Neighbourhoods import *
 from Others_function import *
-from Grid import *
+from Observables import ObservablesAccumulator
+from Archive import ConformationArchive
+from Profiling import Profiler
+from Checkpoint import save_checkpoint, load_checkpoint
+from Trajectory import TrajectoryWriter, FrameBuffer
+from Results_db import ResultsDB
+from EnergyModel import EnergyModel
+from Lattice import SQUARE
+import contextlib
 import multiprocessing
+import os
+import sys
 import time
 
 
 
-def MCsearch_REMC(hp, c=[], phi=500, nu=0.5, T=160):
+def warm_start(hp, db, E_star=None):
+    """
+    Looks up the best stored result of a sequence to start a run from it.
+    Args:
+        hp (str): HP sequence.
+        db (ResultsDB): Results database (or None).
+        E_star (int, optional): Target energy given by the user. Defaults to None.
+    Returns:
+        tuple: (stored conformation or None, E_star), E_star defaulting to the stored energy.
+    """
+    stored = db.best(hp) if db is not None else None
+    if stored is None:
+        return None, E_star
+    return stored[0], stored[1] if E_star is None else E_star
+
+
+
+def check_options(model, **options):
+    """
+    Checks that the options implemented on the square lattice only (observables, archive, trajectory and results
+    database) are not used with an energy model on another lattice, and that the options storing HP energies or
+    counting H contacts (results database and observables) are only used with the HP model.
+    Args:
+        model (EnergyModel): Energy model of the search.
+        **options: Options of the search, by name (None if not used).
+    Raises:
+        ValueError: If an option is used on another lattice or with another energy model.
+    """
+    used = [name for name, value in options.items() if value is not None]
+    hp_only = [name for name in used if name in ("observables", "db")]
+    if model.model != "HP" and hp_only:
+        raise ValueError(f"{', '.join(hp_only)}: only supported with the HP energy model, not with {model.model}")
+    if model.lattice is not SQUARE and used:
+        raise ValueError(f"{', '.join(used)}: only supported on the square lattice, not on the {model.lattice.name} lattice")
+
+
+
+def MCsearch_REMC(hp, c=[], phi=500, nu=0.5, T=160, deadline=None, observables=None, archive=None, profiler=None,
+                  trajectory=None, stop_event=None, model=None):
     """
     Perform a Monte Carlo search to find a low-energy conformation of an HP sequence. Return the last conformation found (not necessarly the lowest energy), for REMC use purpose.
     Args:
@@ -17,45 +65,96 @@ def MCsearch_REMC(hp, c=[], phi=500, nu=0.5, T=160):
         phi (int, optional): Number of iterations/moves to perform. Defaults to 500.
         nu (float, optional): Probability of a pull move (vs. other moves). Defaults to 0.5.
         T (float, optional): Temperature parameter for Metropolis criterion. Defaults to 160.
+        deadline (float, optional): Absolute time (time.time()) after which the search stops early. Defaults to None (no limit).
+        observables (ObservablesAccumulator, optional): Accumulator updated at each step for temperature T. Defaults to None.
+        archive (ConformationArchive, optional): Archive of the best distinct conformations, updated in place. Defaults to None.
+        profiler (Profiler, optional): Profiler of the moves and of the time split, updated in place. Defaults to None.
+        trajectory (TrajectoryWriter or FrameBuffer, optional): Recorder of the current conformation at each step. Defaults to None.
+        stop_event (Event, optional): Cancels the search when set (checked every 64 moves). Defaults to None.
+        model (EnergyModel, optional): Energy model of hp, with its lattice. Defaults to the HP model.
     Returns:
         tuple: (best_conformation, best_energy)
     """
+    if model is None:
+        model = EnergyModel(hp)
     if c == []:
-        c = generate_random_conformation(hp)
+        c = generate_random_conformation(hp, model.lattice)
+    move = move_function(model.lattice)  # Move set of the lattice, chosen once
 
     n = len(c)
     cp = c.copy()
     c_courant = c.copy()
-    Ep = E(cp, hp)  # Current energy
+    Ep = model.energy(cp)  # Current energy
+    occupancy = model.occupancy(cp)  # Positions of the interacting residues of cp, for the energy changes
+
+    E_c_courant = Ep
+    if observables is not None:
+        observables.begin(T, cp, Ep)
 
     for i in range(phi):
+        # Stop early if the global time budget is exhausted or the run is cancelled (checked every 64 moves)
+        if i % 64 == 0 and ((deadline is not None and time.time() > deadline) or (stop_event is not None and stop_event.is_set())):
+            break
+
+        if profiler is not None:
+            profiler.lap()
         c_courant = cp.copy()
+        if profiler is not None:
+            profiler.lap("copy")
         k = random.randint(0, n-1)  # Choose a random residue (1-based index)
-        bool, c_courant = M(c_courant, k, nu)  # Apply a random move, nu is the probability of a pull move (instead of other moves)
+        bool, c_courant = move(c_courant, k, nu, profiler)  # Apply a random move, nu is the probability of a pull move (instead of other moves)
+        if profiler is not None:
+            profiler.lap("move")
 
-        # Calculate energy differences
-        E_c_courant = E(c_courant, hp)
-        delta_E = E_c_courant - Ep  # Energy difference with current conformation
+        # Calculate energy differences from the contacts of the moved residues
+        moved = moved_residues(cp, c_courant)
+        delta_E = model.delta(cp, c_courant, moved, occupancy)  # Energy difference with current conformation
+        E_c_courant = Ep + delta_E
+        if profiler is not None:
+            profiler.lap("energy")
 
         # Always accept if energy decreases or stays the same
         if delta_E <= 0:
+            if observables is not None:
+                observables.update(T, c_courant, E_c_courant, moved)
+            model.update(occupancy, cp, c_courant, moved)
             cp = c_courant
             Ep = E_c_courant
+            if archive is not None and archive.accepts(Ep):
+                archive.add(cp, Ep)
+            if profiler is not None:
+                profiler.accept()
 
         else:
             q = random.random()  # Generate a random number between 0 and 1
 
             # Metropolis criterion: accept with certain probability if energy increases
             if q > (1 / (exp(1) ** (delta_E / T))):
+                if observables is not None:
+                    observables.update(T, c_courant, E_c_courant, moved)
+                model.update(occupancy, cp, c_courant, moved)
                 cp = c_courant
                 Ep = E_c_courant
+                if archive is not None and archive.accepts(Ep):
+                    archive.add(cp, Ep)
+                if profiler is not None:
+                    profiler.accept()
 
-    # Return best conformation found and its energy
-    return c_courant, E_c_courant
+        if observables is not None:
+            observables.sample(T)
+        if trajectory is not None:
+            trajectory.record(cp, Ep, T)
+
+    if observables is not None:
+        observables.end(T)
+
+    # Return best conformation found and its energy (recomputed, as float contact energies accumulate rounding errors)
+    return c_courant, model.energy(c_courant)
 
 
 
-def MCsearch(hp, c=[], phi=500, nu=0.5, T=160, E_star = 0):
+def MCsearch(hp, c=[], phi=500, nu=0.5, T=160, E_star = None, archive=None, timeout=None, profiler=None, trajectory=None,
+             db=None, telemetry=None, stop_event=None, model=None):
     """
     Perform a Monte Carlo search to find a low-energy conformation of an HP sequence. Return the lowest-energy conformation found.
     Args:
@@ -64,91 +163,296 @@ def MCsearch(hp, c=[], phi=500, nu=0.5, T=160, E_star = 0):
         phi (int, optional): Number of iterations/moves to perform. Defaults to 500.
         nu (float, optional): Probability of a pull move (vs. other moves). Defaults to 0.5.
         T (float, optional): Temperature parameter for Metropolis criterion. Defaults to 160.
+        E_star (int, optional): Target energy, the search stops when it is reached. Defaults to the lower bound of the energy model (EnergyModel.lower_bound).
+        archive (ConformationArchive, optional): Archive of the best distinct conformations, updated in place. Defaults to None.
+        timeout (float, optional): Maximum runtime in seconds. Defaults to None (no limit).
+        profiler (Profiler, optional): Profiler of the moves and of the time split, updated in place. Defaults to None.
+        trajectory (TrajectoryWriter, optional): Recorder of the current conformation at each step. Defaults to None.
+        db (ResultsDB, optional): Results database: the search starts from the best stored conformation (if c is
+            empty), E_star defaults to the stored energy, and the result is recorded. Defaults to None.
+        telemetry (Telemetry or TelemetryClient, optional): Receives a record at each new best conformation. Defaults to None.
+        stop_event (Event, optional): Cancels the search when set (checked every 64 moves). Defaults to None.
+        model (EnergyModel, optional): Energy model of hp (HP, HP+ or contact matrix). Defaults to the HP model.
     Returns:
         tuple: (best_conformation, best_energy)
     """
+    if model is None:
+        model = EnergyModel(hp)
+    check_options(model, archive=archive, trajectory=trajectory, db=db)
+    warm, E_star = warm_start(hp, db, E_star)
     if c == []:
-        c = generate_random_conformation(hp)
+        c = warm.copy() if warm is not None else generate_random_conformation(hp, model.lattice)
+    move = move_function(model.lattice)  # Move set of the lattice, chosen once
+    if E_star is None:
+        E_star = model.lower_bound()
+    deadline = time.time() + timeout if timeout is not None else None
 
     n = len(c)
     c_mini = c.copy()  # Best conformation found
     cp = c.copy()
     c_courant = c.copy()
-    Ep = E(cp, hp)  # Current energy
+    Ep = model.energy(cp)  # Current energy
+    occupancy = model.occupancy(cp)  # Positions of the interacting residues of cp, for the energy changes
     E_mini = Ep  # Calculate initial energy
+    time_start = time.time()
+    if profiler is not None:
+        profiler.start()
 
-    for i in range(phi):
+    # Nothing to search if the initial conformation already reaches E_star (e.g. a stored solution)
+    for i in range(phi if E_mini > E_star else 0):
+        # Stop early if the time budget is exhausted or the run is cancelled (checked every 64 moves)
+        if i % 64 == 0 and ((deadline is not None and time.time() > deadline) or (stop_event is not None and stop_event.is_set())):
+            break
+
+        if profiler is not None:
+            profiler.lap()
         c_courant = cp.copy()
+        if profiler is not None:
+            profiler.lap("copy")
         k = random.randint(0, n-1)  # Choose a random residue (1-based index)
-        bool, c_courant = M(c_courant, k, nu)  # Apply a random move, nu is the probability of a pull move (instead of other moves)
+        bool, c_courant = move(c_courant, k, nu, profiler)  # Apply a random move, nu is the probability of a pull move (instead of other moves)
+        if profiler is not None:
+            profiler.lap("move")
 
-        # Calculate energy differences
-        E_c_courant = E(c_courant, hp)
-        delta_E = E_c_courant - Ep  # Energy difference with current conformation
+        # Calculate energy differences from the contacts of the moved residues
+        moved = moved_residues(cp, c_courant)
+        delta_E = model.delta(cp, c_courant, moved, occupancy)  # Energy difference with current conformation
+        E_c_courant = Ep + delta_E
+        if profiler is not None:
+            profiler.lap("energy")
 
         # Always accept if energy decreases or stays the same
         if delta_E <= 0:
+            model.update(occupancy, cp, c_courant, moved)
             cp = c_courant
             Ep = E_c_courant
+            if archive is not None and archive.accepts(Ep):
+                archive.add(cp, Ep)
+            if profiler is not None:
+                profiler.accept()
 
             # Update best conformation if this one is better
             if E_c_courant - E_mini < 0:
                 c_mini = c_courant
                 E_mini = E_c_courant
+                if telemetry is not None:
+                    telemetry.emit({"type": "best", "iteration": i, "best_energy": E_mini, "best_conformation": c_mini})
 
-                if E_mini == E_star : # If we reach the minimum energy, we stop and return the lowest-energy conformation
-                    return c_mini, E_mini
+                if E_mini <= E_star : # If we reach the minimum energy, we stop and return the lowest-energy conformation
+                    break
         else:
             q = random.random()  # Generate a random number between 0 and 1
 
             # Metropolis criterion: accept with certain probability if energy increases
             if q > (1 / (exp(1) ** (delta_E / T))):
+                model.update(occupancy, cp, c_courant, moved)
                 cp = c_courant
                 Ep = E_c_courant
+                if archive is not None and archive.accepts(Ep):
+                    archive.add(cp, Ep)
+                if profiler is not None:
+                    profiler.accept()
+
+        if trajectory is not None:
+            trajectory.record(cp, Ep, T)
+
+    if profiler is not None:
+        profiler.stop()
+    E_mini = model.energy(c_mini)  # Float contact energies accumulate rounding errors
+    if telemetry is not None:
+        telemetry.emit({"type": "end", "time": time.time() - time_start, "best_energy": E_mini,
+                        "best_conformation": c_mini}, force=True)
+    if db is not None:
+        db.record(hp, c_mini, E_mini, "MCsearch", {"phi": phi, "nu": nu, "T": T}, time.time() - time_start)
 
     # Return best conformation found and its energy
     return c_mini, E_mini
 
 
-def REMCSimulation(hp, E_star, c=[], phi=500, nu=0.5, T_init=160, T_final=220, chi=5, max_iterations=300, timeout =300):
+def energy_autocorrelation(energies):
+    """
+    Estimates the lag-1 autocorrelation of a series of energies.
+    Args:
+        energies (list of float): Energies sampled at successive REMC iterations.
+    Returns:
+        float: Lag-1 autocorrelation in [-1, 1] (0 if the series is too short or constant).
+    """
+    n = len(energies)
+    if n < 3:
+        return 0.0
+    mean = sum(energies) / n
+    variance = sum((e - mean) ** 2 for e in energies)
+    if variance == 0:
+        return 0.0
+    covariance = sum((energies[i] - mean) * (energies[i+1] - mean) for i in range(n - 1))
+    return covariance / variance
+
+
+
+def adapt_phi(phi, elapsed, energies, target_time, phi_min=50, phi_max=50000):
+    """
+    Computes the next sweep length of a replica from its last wall time and its energy autocorrelation.
+    The sweep length is grown when successive energies are still correlated, shrunk when they are
+    already decorrelated, and capped so that one sweep takes about target_time seconds.
+    Args:
+        phi (int): Sweep length used at the last iteration.
+        elapsed (float): Wall time (in seconds) taken by the last sweep.
+        energies (list of float): Recent energies of the replica, one per REMC iteration.
+        target_time (float): Target wall time (in seconds) of one sweep.
+        phi_min (int, optional): Lower bound of the sweep length. Defaults to 50.
+        phi_max (int, optional): Upper bound of the sweep length. Defaults to 50000.
+    Returns:
+        int: New sweep length.
+    """
+    # Sweep length needed to decorrelate: integrated autocorrelation time relative to a target of 2 sweeps
+    rho = min(max(energy_autocorrelation(energies), 0.0), 0.95)
+    tau = (1 + rho) / (1 - rho)
+    phi_decorrelation = phi * tau / 2
+
+    # Sweep length fitting in the time target, from the measured time per move
+    if elapsed > 0:
+        phi_time = target_time * phi / elapsed
+    else:
+        phi_time = phi_max
+
+    # Smooth the update to avoid oscillations between iterations
+    new_phi = 0.5 * phi + 0.5 * min(phi_decorrelation, phi_time)
+    return int(min(max(new_phi, phi_min), phi_max))
+
+
+
+def iteration_record(iteration, elapsed, replicas, temperatures, best_energy, exchanges_accepted, exchanges_attempted,
+                     moves, iteration_time, conformations=False):
+    """
+    Builds the telemetry record of a REMC iteration.
+    Args:
+        iteration (int): Iteration number.
+        elapsed (float): Time since the start of the run, in seconds.
+        replicas (list of tuples): (conformation, energy) of each replica.
+        temperatures (list of float): Temperature of each replica.
+        best_energy (int): Best energy found so far.
+        exchanges_accepted (int): Number of accepted replica exchanges at this iteration.
+        exchanges_attempted (int): Number of attempted replica exchanges at this iteration.
+        moves (int): Number of MC moves performed at this iteration.
+        iteration_time (float): Wall time of this iteration, in seconds.
+        conformations (bool, optional): Adds the conformation of each replica. Defaults to False.
+    Returns:
+        dict: Telemetry record of type "iteration".
+    """
+    record = {"type": "iteration", "iteration": iteration, "time": elapsed,
+              "energies": [energy for _, energy in replicas], "temperatures": list(temperatures),
+              "exchange_rate": exchanges_accepted / exchanges_attempted if exchanges_attempted else 0.0,
+              "best_energy": best_energy, "moves_per_sec": moves / iteration_time if iteration_time > 0 else 0.0}
+    if conformations:
+        record["conformations"] = [conformation for conformation, _ in replicas]
+    return record
+
+
+
+def checkpoint_state(hp, iteration, elapsed, offset, replicas, temperatures, phis, energy_history, best_conformation,
+                     best_energy, archive=None, observables=None):
+    """
+    Builds the checkpoint of a REMC run (see Checkpoint.py), with the state of the random module.
+    Args:
+        hp (str): HP sequence.
+        iteration (int): Number of iterations done.
+        elapsed (float): Time spent so far, in seconds.
+        offset (int): Offset of the next replica exchanges (0 or 1).
+        replicas (list of tuples): (conformation, energy) of each replica.
+        temperatures (list of float): Temperature of each replica.
+        phis (list of int): Sweep length of each replica.
+        energy_history (list of lists): Recent energies of each replica (for the adaptive phi).
+        best_conformation (list of tuples): Best conformation found so far.
+        best_energy (int): Its energy.
+        archive (ConformationArchive, optional): Archive of the run. Defaults to None.
+        observables (ObservablesAccumulator, optional): Observables of the run. Defaults to None.
+    Returns:
+        dict: State to pass to save_checkpoint.
+    """
+    return {"hp": hp, "iteration": iteration, "elapsed": elapsed, "offset": offset, "replicas": replicas,
+            "temperatures": temperatures, "phis": phis, "energy_history": energy_history,
+            "best_conformation": best_conformation, "best_energy": best_energy, "archive": archive,
+            "observables": observables, "random_state": random.getstate()}
+
+
+
+def REMCSimulation(hp, E_star=None, c=[], phi=500, nu=0.5, T_init=160, T_final=220, chi=5, max_iterations=300, timeout =300,
+                   adaptive_phi=False, target_time=None, phi_min=50, phi_max=50000, ladder=None, observables=None,
+                   archive=None, profiler=None, telemetry=None, checkpoint=None, checkpoint_interval=60, trajectory=None,
+                   db=None, stop_event=None, model=None):
     """
     Perform a Replica Exchange Monte Carlo (REMC) simulation to find a low-energy conformation of an HP sequence.
     Args:
         hp (str): HP sequence (Example: "HPPHHPH").
-        E_star (int): Target energy level for the simulation.
+        E_star (int, optional): Target energy level for the simulation. Defaults to the lower bound of the energy model (EnergyModel.lower_bound).
         c (list of tuples, optional): Initial conformation as a list of (x, y) coordinates. If empty, a random conformation is generated.
         phi (int, optional): Number of iterations/moves to perform for each replica. Defaults to 500.
         nu (float, optional): Probability of a pull move (vs. other moves). Defaults to 0.5.
         T_init (float, optional): Minimum temperature. Defaults to 160.
         T_final (float, optional): Maximum temperature. Defaults to 220.
         chi (int, optional): Number of replicas to simulate. Defaults to 5.
+        max_iterations (int, optional): Maximum number of REMC iterations. Defaults to 300.
+        timeout (float, optional): Maximum runtime in seconds. Defaults to 300.
+        adaptive_phi (bool, optional): If True, each replica adapts its own phi (see adapt_phi). Defaults to False.
+        target_time (float, optional): Target wall time of one sweep when adaptive_phi is set. Defaults to timeout / max_iterations.
+        phi_min (int, optional): Lower bound of the adaptive phi. Defaults to 50.
+        phi_max (int, optional): Upper bound of the adaptive phi. Defaults to 50000.
+        ladder (dict, optional): Temperature ladder to reuse, with keys 'temperatures' and 'phis' (overrides T_init,
+            T_final, chi and phi). Updated in place at the end of the run so that a following run can reuse it.
+        observables (ObservablesAccumulator, optional): Accumulator of the per-temperature averages, updated in place. Defaults to None.
+        archive (ConformationArchive, optional): Archive of the best distinct conformations, updated in place. Defaults to None.
+        profiler (Profiler, optional): Profiler of the moves and of the time split, with one summary per iteration. Defaults to None.
+        telemetry (Telemetry or TelemetryClient, optional): Progress stream replacing the per-iteration print. Defaults to None.
+        checkpoint (str, optional): Checkpoint file, saved every checkpoint_interval seconds and at the end of the run.
+            If it exists, the run resumes from it (the time already spent counts towards timeout, so a longer
+            timeout continues the run). Defaults to None.
+        checkpoint_interval (float, optional): Time between two checkpoints, in seconds. Defaults to 60.
+        trajectory (TrajectoryWriter, optional): Recorder of the replica conformations at each step. Defaults to None.
+        db (ResultsDB, optional): Results database: the coldest replica starts from the best stored conformation (if c
+            is empty), E_star defaults to the stored energy, and the result is recorded. Defaults to None.
+        stop_event (Event, optional): Cancels the run when set; the best conformation found so far is returned. Defaults to None.
+        model (EnergyModel, optional): Energy model of hp (HP, HP+ or contact matrix), shared by all the replicas.
+            Defaults to the HP model.
     Returns:
         tuple: (best_conformation, best_energy)
     """
+    if model is None:
+        model = EnergyModel(hp)
+    check_options(model, observables=observables, archive=archive, trajectory=trajectory, db=db)
+    warm, E_star = warm_start(hp, db, E_star)
+
+    # Without a known target energy, stop at the provable lower bound
+    if E_star is None:
+        E_star = model.lower_bound()
+
+    # Reuse the temperature ladder of a previous run if given
+    if ladder:
+        chi = len(ladder["temperatures"])
 
     if c == []:
          # Initialization of replicas with one linear conformation
-        c_init = generate_linear_conformation(hp)
-        best_energy = E(c_init, hp)
+        c_init = generate_linear_conformation(hp, model.lattice)
+        best_energy = model.energy(c_init)
+        best_conformation = c_init.copy()
         replicas = [(c_init, best_energy)]
 
         # Completion of replicas with random initial conformation
         for i in range (chi-1) :
-            c_init = generate_random_conformation(hp)
-            E_init = E(c_init, hp)
+            c_init = generate_random_conformation(hp, model.lattice)
+            E_init = model.energy(c_init)
             if E_init <= best_energy:
 
                 # Track best conformation and energy
                 best_conformation = c_init.copy()
                 best_energy = E_init
-            replicas.append((c_init, E(c_init, hp)))
+            replicas.append((c_init, model.energy(c_init)))
     else :
         # Initialize replicas with the same initial conformation and energy
-        replicas = [(c.copy(), E(c, hp)) for _ in range(chi)]
+        replicas = [(c.copy(), model.energy(c)) for _ in range(chi)]
 
         # Track best conformation and energy
         best_conformation = c.copy()
-        best_energy = E(c, hp)
+        best_energy = model.energy(c)
 
     # Create linear temperature schedule
     temperatures = [T_init + i * (T_final - T_init) / (chi - 1) for i in range(chi)]
@@ -158,29 +462,81 @@ def REMCSimulation(hp, E_star, c=[], phi=500, nu=0.5, T_init=160, T_final=220, c
     # Maximum number of iterations to prevent infinite loops
     iteration = 0
 
-    # Timeout initialization
-    time_start = time.time()
+    # Sweep length of each replica, and its recent energies (for the adaptive phi)
+    phis = [phi] * chi
+    energy_history = [[] for _ in range(chi)]
+    if target_time is None:
+        target_time = timeout / max(max_iterations, 1)
+
+    # Start the coldest replica from the best stored conformation
+    if warm is not None and c == []:
+        replicas[0] = (warm.copy(), model.energy(warm))
+        if replicas[0][1] <= best_energy:
+            best_conformation, best_energy = warm.copy(), replicas[0][1]
+
+    if ladder:
+        temperatures = list(ladder["temperatures"])
+        phis = list(ladder.get("phis", phis))
+
+    # Resume an interrupted run from its checkpoint
+    state = load_checkpoint(checkpoint, hp) if checkpoint is not None else None
+    elapsed = 0
+    if state is not None:
+        replicas, temperatures, phis = state["replicas"], state["temperatures"], state["phis"]
+        energy_history, offset, iteration = state["energy_history"], state["offset"], state["iteration"]
+        best_conformation, best_energy = state["best_conformation"], state["best_energy"]
+        chi, elapsed = len(replicas), state["elapsed"]
+        random.setstate(state["random_state"])
+        if archive is not None and state["archive"] is not None:
+            archive.merge(state["archive"])
+        if observables is not None and state["observables"] is not None:
+            observables.merge(state["observables"])
 
-    while best_energy > E_star and iteration < max_iterations and time.time() - time_start < timeout :
+    # Timeout initialization
+    time_start = time.time() - elapsed
+    last_checkpoint = time.time()
+    deadline = time_start + timeout if adaptive_phi else None
+    if profiler is not None:
+        profiler.start()
+    if telemetry is not None:
+        telemetry.emit({"type": "start", "hp": hp, "E_star": E_star, "temperatures": temperatures, "iteration": 0})
+
+    while best_energy > E_star and iteration < max_iterations and time.time() - time_start < timeout and \
+            not (stop_event is not None and stop_event.is_set()):
         iteration += 1
-        print(f"Iteration {iteration}, Best Energy: {best_energy}")
+        if telemetry is None:
+            print(f"Iteration {iteration}, Best Energy: {best_energy}, Gap: {best_energy - E_star}")
+        time_iteration = time.time()
 
         # Perform MC search for each replica
         for k in range(chi):
 
             # Perform MC search
-            new_conformation, new_energy = MCsearch_REMC(hp=hp, c=replicas[k][0], phi=phi, nu=nu, T=temperatures[k])
+            time_replica = time.time()
+            new_conformation, new_energy = MCsearch_REMC(hp=hp, c=replicas[k][0], phi=phis[k], nu=nu, T=temperatures[k], deadline=deadline,
+                                                         observables=observables, archive=archive, profiler=profiler,
+                                                         trajectory=trajectory, stop_event=stop_event, model=model)
             replicas[k] = (new_conformation, new_energy)
 
+            # Adapt the sweep length of this replica to its wall time and autocorrelation
+            if adaptive_phi:
+                energy_history[k] = (energy_history[k] + [new_energy])[-20:]
+                phis[k] = adapt_phi(phis[k], time.time() - time_replica, energy_history[k], target_time, phi_min, phi_max)
+
             # Update best conformation if needed
             if new_energy < best_energy:
                 best_conformation = new_conformation.copy()
                 best_energy = new_energy
+                if telemetry is not None:
+                    telemetry.emit({"type": "best", "iteration": iteration, "best_energy": best_energy,
+                                    "best_conformation": best_conformation})
 
         # Attempt replica exchanges between neighboring temperatures
         i = offset 
+        exchanges_attempted, exchanges_accepted = 0, 0
         while i + 1 < chi:
             j = i + 1
+            exchanges_attempted += 1
 
             # Calculate exchange probability
             delta = (1/temperatures[j] - 1/temperatures[i]) * (replicas[i][1] - replicas[j][1])
@@ -188,69 +544,258 @@ def REMCSimulation(hp, E_star, c=[], phi=500, nu=0.5, T_init=160, T_final=220, c
             # Accept exchange with Metropolis criterion
             if delta <= 0:
                 replicas[i], replicas[j] = replicas[j], replicas[i]
+                exchanges_accepted += 1
                 #temperatures[i], temperatures[j] = temperatures[j], temperatures[i]
             else:
                 if random.random() <= exp(-delta):
                     replicas[i], replicas[j] = replicas[j], replicas[i]
+                    exchanges_accepted += 1
                     #temperatures[i], temperatures[j] = temperatures[j], temperatures[i]
             i += 2
 
         # Toggle offset for next iteration
         offset = 1 - offset # At each iteration offset is equal to 1 or 0
 
+        if telemetry is not None and telemetry.accepts():
+            telemetry.emit(iteration_record(iteration, time.time() - time_start, replicas, temperatures, best_energy,
+                                            exchanges_accepted, exchanges_attempted, sum(phis), time.time() - time_iteration,
+                                            telemetry.conformations))
+
+        if profiler is not None:
+            profiler.end_iteration(iteration)
+
+        # Save the state of the run periodically
+        if checkpoint is not None and time.time() - last_checkpoint >= checkpoint_interval:
+            save_checkpoint(checkpoint, checkpoint_state(hp, iteration, time.time() - time_start, offset, replicas, temperatures, phis,
+                                                         energy_history, best_conformation, best_energy, archive, observables))
+            last_checkpoint = time.time()
+
+    if profiler is not None:
+        profiler.stop()
+    if checkpoint is not None:
+        save_checkpoint(checkpoint, checkpoint_state(hp, iteration, time.time() - time_start, offset, replicas, temperatures, phis,
+                                                     energy_history, best_conformation, best_energy, archive, observables))
+
+    # Save the (possibly tuned) ladder for a following run
+    if ladder is not None:
+        ladder["temperatures"] = temperatures
+        ladder["phis"] = phis
+
+    if telemetry is not None:
+        telemetry.emit({"type": "end", "iteration": iteration, "time": time.time() - time_start,
+                        "best_energy": best_energy, "best_conformation": best_conformation}, force=True)
+    if db is not None:
+        db.record(hp, best_conformation, best_energy, "REMCSimulation",
+                  {"phi": phi, "nu": nu, "T_init": T_init, "T_final": T_final, "chi": chi}, time.time() - time_start)
+
     return best_conformation, best_energy
 
 
 
-def worker_REMC_multi(hp, E_star, phi, nu, T_init, T_final, chi, max_iteration, timeout, resultat_partage, lock, index):
+def REMC_hierarchical(hp, E_star=None, c=[], stages=4, initial_length=None, phi=500, nu=0.5, T_init=160, T_final=220, chi=5,
+                      max_iterations=300, timeout=300, adaptive_phi=True, archive=None, stop_event=None, model=None):
+    """
+    Fold a long HP sequence in stages: a prefix is folded with REMCSimulation, then the chain is grown stage by stage.
+    Each stage starts from the best conformation of the previous one, extended by a short random self-avoiding walk,
+    and reuses the temperature ladder (and adapted phis) of the previous stage.
+    Args:
+        hp (str): HP sequence (Example: "HPPHHPH").
+        E_star (int, optional): Target energy of the full sequence. Defaults to the lower bound of the energy model (EnergyModel.lower_bound).
+        c (list of tuples, optional): Initial conformation of the first prefix. If empty, REMCSimulation initializes it.
+        stages (int, optional): Number of growth stages (the last one folds the full sequence). Defaults to 4.
+        initial_length (int, optional): Length of the first prefix. Defaults to len(hp) // stages (at least 20).
+        phi, nu, T_init, T_final, chi, max_iterations: See REMCSimulation (max_iterations applies to each stage).
+        timeout (float, optional): Total runtime in seconds, shared between stages proportionally to their length. Defaults to 300.
+        adaptive_phi (bool, optional): See REMCSimulation. Defaults to True.
+        archive (ConformationArchive, optional): Archive of the best distinct conformations of the full sequence
+            (filled during the last stage), updated in place. Defaults to None.
+        stop_event (Event, optional): Cancels the run when set. Defaults to None.
+        model (EnergyModel, optional): Energy model of hp; each stage uses the model of its prefix. Defaults to the HP model.
+    Returns:
+        tuple: (best_conformation, best_energy)
+    """
+    n = len(hp)
+    if model is None:
+        model = EnergyModel(hp)
+    check_options(model, archive=archive)
+    if initial_length is None:
+        initial_length = max(20, n // stages)
+    initial_length = min(initial_length, n)
+
+    # Prefix lengths of each stage, the last one being the full sequence
+    if stages > 1:
+        lengths = sorted({round(initial_length + i * (n - initial_length) / (stages - 1)) for i in range(stages)})
+    else:
+        lengths = [n]
+
+    time_start = time.time()
+    total_length = sum(lengths)
+    ladder = {}
+    best_conformation = c
+
+    for length in lengths:
+        if stop_event is not None and stop_event.is_set():
+            break
+        prefix = hp[:length]
+        prefix_model = model.prefix(length)
+
+        # Warm start: extend the previous best conformation up to the new prefix length
+        if best_conformation != []:
+            best_conformation = extend_conformation(best_conformation, prefix, model.lattice)
+
+        # Only the last stage stops at E_star, the others stop at their lower bound or use their share of the time budget
+        E_stage = E_star if length == n else prefix_model.lower_bound()
+        remaining = timeout - (time.time() - time_start)
+        stage_timeout = remaining if length == n else timeout * length / total_length
+
+        best_conformation, best_energy = REMCSimulation(hp=prefix, E_star=E_stage, c=best_conformation, phi=phi, nu=nu,
+                                                        T_init=T_init, T_final=T_final, chi=chi,
+                                                        max_iterations=max_iterations, timeout=stage_timeout,
+                                                        adaptive_phi=adaptive_phi, ladder=ladder,
+                                                        archive=archive if length == n else None, stop_event=stop_event,
+                                                        model=prefix_model)
+
+    return best_conformation, best_energy
+
+
+
+def worker_REMC_multi(hp, E_star, phi, nu, T_init, T_final, chi, max_iteration, timeout, resultat_partage, lock, index,
+                      adaptive_phi=False, observe=False, archive_size=0, profile=False, telemetry=None, checkpoint=None,
+                      checkpoint_interval=60, trajectory=None, stride=1, c=[], seed=None, stop_event=None, model=None,
+                      output="stdout"):
     """
     Worker function for multiprocessing: runs REMC Simulation with a random initial conformation.
-    Always stores the best conformation found.
+    Always stores the best conformation found (and its observables if observe is True,
+    an archive of its archive_size best distinct conformations if archive_size > 0, and a profiler if profile is True,
+    tracing memory too if profile is "memory").
+    Progress is sent to telemetry (a TelemetryClient) if given, and the run is checkpointed to checkpoint if given.
+    One step out of stride is recorded to the trajectory file if given.
+    The replicas start from c if given (e.g. a stored conformation), from random conformations otherwise.
+    The random module is seeded with seed if given, so that runs are reproducible.
+    The run stops early when stop_event is set. model is the EnergyModel of hp.
+    The progress prints go to output: "stdout", "stderr", or None to silence them (see worker_output).
     """
-    c = [] #generate_random_conformation(hp)
-    best_conformation, best_energy = REMCSimulation(hp=hp, E_star=E_star, c=c, phi=phi, nu=nu, T_init=T_init, 
-                                                    T_final=T_final, chi=chi, max_iterations=max_iteration, 
-                                                    timeout=timeout)
+    timing = {"begin": time.time()}
+    if seed is not None:
+        random.seed(seed)
+    observables = ObservablesAccumulator(hp) if observe else None
+    archive = ConformationArchive(archive_size) if archive_size > 0 else None
+    profiler = Profiler(trace_memory=profile == "memory") if profile else None
+    recorder = TrajectoryWriter(trajectory, len(hp), stride=stride) if trajectory is not None else None
+    with contextlib.ExitStack() as stack:
+        if output != "stdout":
+            stream = sys.stderr if output == "stderr" else stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(stream))
+        best_conformation, best_energy = REMCSimulation(hp=hp, E_star=E_star, c=c, phi=phi, nu=nu, T_init=T_init,
+                                                        T_final=T_final, chi=chi, max_iterations=max_iteration,
+                                                        timeout=timeout, adaptive_phi=adaptive_phi, observables=observables,
+                                                        archive=archive, profiler=profiler, telemetry=telemetry,
+                                                        checkpoint=checkpoint, checkpoint_interval=checkpoint_interval,
+                                                        trajectory=recorder, stop_event=stop_event, model=model)
+    if recorder is not None:
+        recorder.close()
+    timing["end"] = time.time()
     with lock:
-        resultat_partage[index] = (best_conformation, best_energy)
+        resultat_partage[index] = (best_conformation, best_energy, observables, archive, profiler, timing)
     return (best_conformation, best_energy)
 
 
 
-def REMC_multi(hp, E_star, phi=500, nu=0.5, T_init=160, T_final=220, chi=5, max_iteration = 300,  nb_processus=4, timeout = 300):
+def worker_output():
+    """
+    Returns where the worker processes should print their progress. A redirection of sys.stdout in the caller
+    (e.g. contextlib.redirect_stdout) is not inherited by processes started with spawn or forkserver, so it is
+    passed on explicitly: "stdout" if sys.stdout is not redirected, "stderr" if it is redirected to stderr, and
+    None (silenced) if it is redirected anywhere else.
+    """
+    if sys.stdout is sys.__stdout__:
+        return "stdout"
+    return "stderr" if sys.stdout is sys.stderr or sys.stdout is sys.__stderr__ else None
+
+
+
+def REMC_multi(hp, E_star=None, phi=500, nu=0.5, T_init=160, T_final=220, chi=5, max_iteration = 300,  nb_processus=4, timeout = 300,
+               adaptive_phi=False, observables=None, archive=None, profiler=None, report=None, telemetry=None,
+               checkpoint=None, checkpoint_interval=60, trajectory=None, db=None, stop_event=None, model=None, c=[]):
     """
     Run REMC Simulation in parallel using multiprocessing for calculating REMC for different initial configurations.
     Returns the best conformation found, even if no conformation satisfies E_star.
+    Without E_star, the lower bound of the energy model (EnergyModel.lower_bound) is used as the target.
+    If an ObservablesAccumulator is given, the observables of the finished workers are merged into it.
+    If a ConformationArchive is given, the archives of the finished workers are merged into it.
+    If a Profiler is given, the profilers of the finished workers are merged into it.
+    If a ParallelReport is given, the startup, compute time, result size and polling latency of each worker are recorded.
+    If a Telemetry is given, each worker sends its progress to it (records tagged with the worker index).
+    If a checkpoint path is given, worker i checkpoints its run to "<checkpoint>.<i>" and resumes from it
+    (see REMCSimulation).
+    If a TrajectoryWriter is given, worker i records its replicas to "<trajectory path>.<i>" with the same stride.
+    If a ResultsDB is given, the first worker starts from the best stored conformation, E_star defaults to the
+    stored energy, and the result is recorded.
+    If a stop_event (multiprocessing.Event) is given, setting it makes the workers stop and return their best conformation.
+    model is the EnergyModel of hp (HP, HP+ or contact matrix), defaulting to the HP model.
+    If c is given (e.g. the linear conformation), the replicas of the workers start from it instead of random
+    conformations (except for the warm start of the first worker).
     """
+    if model is None:
+        model = EnergyModel(hp)
+    check_options(model, observables=observables, archive=archive, trajectory=trajectory, db=db)
+    warm, E_star = warm_start(hp, db, E_star)
+    if E_star is None:
+        E_star = model.lower_bound()
+    time_start = time.time()
+
     manager = multiprocessing.Manager()
     resultat_partage = manager.list([None] * nb_processus)  # Shared list for results
     lock = manager.Lock()  # Lock to avoid race conditions
     processus = []  # List to store processes
+    launch_times = []  # Start time of each process
 
     # Start all processes
     for i in range(nb_processus):
         p = multiprocessing.Process(
             target=worker_REMC_multi,
-            args=(hp, E_star, phi, nu, T_init, T_final, chi, max_iteration, timeout, resultat_partage, lock, i)
+            args=(hp, E_star, phi, nu, T_init, T_final, chi, max_iteration, timeout, resultat_partage, lock, i, adaptive_phi,
+                  observables is not None, archive.k if archive is not None else 0,
+                  profiler is not None and ("memory" if profiler.trace_memory else True),
+                  telemetry.worker_client(i) if telemetry is not None else None,
+                  f"{checkpoint}.{i}" if checkpoint is not None else None, checkpoint_interval,
+                  f"{trajectory.path}.{i}" if trajectory is not None else None, trajectory.stride if trajectory is not None else 1,
+                  warm if warm is not None and i == 0 else c, random.getrandbits(64), stop_event, model, worker_output())
         )
         processus.append(p)
+        launch_times.append(time.time())
         p.start()
 
     # Wait for all processes to finish or a solution to be found
-    best_conformation, best_energy = generate_linear_conformation(hp), 0
+    best_conformation, best_energy = generate_linear_conformation(hp, model.lattice), 0
+    merged = set()  # Workers whose observables, archive and profiler are already merged
+    solved = False
 
-    while True:
+    while not solved:
         with lock:
             for i in range(nb_processus):
                 if resultat_partage[i] is not None:
-                    conformation, energy = resultat_partage[i]
+                    conformation, energy, worker_observables, worker_archive, worker_profiler, timing = resultat_partage[i]
+                    if i not in merged:
+                        if report is not None:
+                            report.add_worker(i, launch_times[i], timing, time.time(), resultat_partage[i])
+                        if observables is not None:
+                            observables.merge(worker_observables)
+                        if archive is not None:
+                            archive.merge(worker_archive)
+                        if profiler is not None:
+                            profiler.merge(worker_profiler)
+                        merged.add(i)
                     if energy < best_energy:
                         best_conformation, best_energy = conformation, energy
+                        if telemetry is None:
+                            print(f"Best Energy: {best_energy}, Gap: {best_energy - E_star}")
+                        else:
+                            telemetry.emit({"type": "best", "worker": i, "best_energy": best_energy, "gap": best_energy - E_star,
+                                            "best_conformation": best_conformation})
                     if energy <= E_star:
-                        # A solution was found: terminate all processes and return
-                        for p in processus:
-                            p.terminate()
-                        return best_conformation, best_energy
+                        # A solution was found: the remaining processes are terminated below
+                        solved = True
 
         # Check if all processes are done
         all_done = all(not p.is_alive() for p in processus)
@@ -263,46 +808,109 @@ def REMC_multi(hp, E_star, phi=500, nu=0.5, T_init=160, T_final=220, chi=5, max_
     for p in processus:
         if p.is_alive():
             p.terminate()
+    if db is not None:
+        db.record(hp, best_conformation, best_energy, "REMC_multi",
+                  {"phi": phi, "nu": nu, "T_init": T_init, "T_final": T_final, "chi": chi, "nb_processus": nb_processus},
+                  time.time() - time_start)
 
     # Return the best conformation found
     return best_conformation, best_energy
 
 
 
-def worker_MCsearch(args):
-    """Wrapper to call MCsearch with correct arguments."""
-    hp, c, phi, nu, T = args
-    return MCsearch_REMC(hp=hp, c=c, phi=phi, nu=nu, T=T)
+_worker_stop_event = None  # stop_event of REMC_paral in its pool workers (set by init_worker_MCsearch)
+
+
 
+def init_worker_MCsearch(stop_event):
+    """Initializer of the REMC_paral pool workers: keeps the stop event, which can only be passed at process creation."""
+    global _worker_stop_event
+    _worker_stop_event = stop_event
 
-def REMC_paral(hp, E_star, c=[], phi=500, nu=0.5, T_init=160, T_final=220, chi=5, max_iterations=300, timeout=300):
+
+
+def worker_MCsearch(args):
+    """
+    Wrapper to call MCsearch with correct arguments (the random module is seeded with the given seed,
+    so that runs are reproducible). Also returns the wall time of the search,
+    the observables of this sweep if observe is True and an archive of its archive_size best distinct
+    conformations if archive_size > 0, a profiler of the sweep if profile is True, and the frames recorded
+    every stride steps if stride > 0 (None otherwise). model is the EnergyModel of hp.
+    The sweep stops early when the stop event of the pool (see init_worker_MCsearch) is set.
+    """
+    hp, c, phi, nu, T, deadline, observe, archive_size, profile, seed, stride, model = args
+    random.seed(seed)
+    observables = ObservablesAccumulator(hp) if observe else None
+    frames = FrameBuffer(stride) if stride else None
+    archive = ConformationArchive(archive_size) if archive_size > 0 else None
+    profiler = Profiler(trace_memory=profile == "memory") if profile else None
+    time_start = time.time()
+    if profiler is not None:
+        profiler.start()
+    new_conformation, new_energy = MCsearch_REMC(hp=hp, c=c, phi=phi, nu=nu, T=T, deadline=deadline, observables=observables,
+                                                 archive=archive, profiler=profiler, trajectory=frames,
+                                                 stop_event=_worker_stop_event, model=model)
+    if profiler is not None:
+        profiler.stop()
+    return new_conformation, new_energy, time.time() - time_start, observables, archive, profiler, frames
+
+
+def REMC_paral(hp, E_star=None, c=[], phi=500, nu=0.5, T_init=160, T_final=220, chi=5, max_iterations=300, timeout=300,
+               adaptive_phi=False, target_time=None, phi_min=50, phi_max=50000, observables=None, archive=None,
+               profiler=None, processes=None, report=None, telemetry=None, checkpoint=None, checkpoint_interval=60,
+               trajectory=None, db=None, stop_event=None, model=None):
     """
     Perform a Replica Exchange Monte Carlo (REMC) simulation to find a low-energy conformation of an HP sequence.
     This version uses multiprocessing to parallelize the MC search for each replica.
+    With adaptive_phi, the sweep length of each replica adapts so that all workers take about target_time
+    per iteration (see REMCSimulation for the parameters).
+    Without E_star, the lower bound of the energy model (EnergyModel.lower_bound) is used as the target.
+    If an ObservablesAccumulator is given, the observables of each worker are merged into it.
+    If a ConformationArchive is given, the archive of each worker is merged into it.
+    If a Profiler is given, the profiler of each worker is merged into it, with one summary per iteration.
+    processes sets the size of the process pool (defaults to the number of cores).
+    If a ParallelReport is given, the pool startup, compute, barrier and pickling times of each iteration are recorded.
+    If a Telemetry is given, progress records replace the per-iteration print.
+    If a checkpoint path is given, the run is checkpointed and resumed from it (see REMCSimulation). The sweeps of the
+    workers are seeded from the random module, so a resumed run continues exactly as the interrupted one.
+    If a TrajectoryWriter is given, the frames recorded by the workers are appended to it by the main process.
+    If a ResultsDB is given, the coldest replica starts from the best stored conformation, E_star defaults to the
+    stored energy, and the result is recorded.
+    If a stop_event (multiprocessing.Event) is given, setting it stops the run: the workers end their sweeps early
+    and the best conformation found so far is returned.
+    model is the EnergyModel of hp (HP, HP+ or contact matrix), sent to the workers; defaults to the HP model.
     """
+    if model is None:
+        model = EnergyModel(hp)
+    check_options(model, observables=observables, archive=archive, trajectory=trajectory, db=db)
+    warm, E_star = warm_start(hp, db, E_star)
+    if E_star is None:
+        E_star = model.lower_bound()
+
     if c == []:
          # Initialization of replicas with one linear conformation
-        c_init = generate_linear_conformation(hp)
-        best_energy = E(c_init, hp)
+        c_init = generate_linear_conformation(hp, model.lattice)
+        best_energy = model.energy(c_init)
+        best_conformation = c_init.copy()
         replicas = [(c_init, best_energy)]
 
         # Completion of replicas with random initial conformation
         for i in range (chi-1) :
-            c_init = generate_random_conformation(hp)
-            E_init = E(c_init, hp)
+            c_init = generate_random_conformation(hp, model.lattice)
+            E_init = model.energy(c_init)
             if E_init <= best_energy:
 
                 # Track best conformation and energy
                 best_conformation = c_init.copy()
                 best_energy = E_init
-            replicas.append((c_init, E(c_init, hp)))
+            replicas.append((c_init, model.energy(c_init)))
     else :
         # Initialize replicas with the same initial conformation and energy
-        replicas = [(c.copy(), E(c, hp)) for _ in range(chi)]
+        replicas = [(c.copy(), model.energy(c)) for _ in range(chi)]
 
         # Track best conformation and energy
         best_conformation = c.copy()
-        best_energy = E(c, hp)
+        best_energy = model.energy(c)
         
     # Create linear temperature schedule
     temperatures = [T_init + i * (T_final - T_init) / (chi - 1) for i in range(chi)]
@@ -312,35 +920,97 @@ def REMC_paral(hp, E_star, c=[], phi=500, nu=0.5, T_init=160, T_final=220, chi=5
     # Maximum number of iterations to prevent infinite loops
     iteration = 0
 
-    # Timeout calculation
-    start_time = time.time() 
+    # Sweep length of each replica, and its recent energies (for the adaptive phi)
+    phis = [phi] * chi
+    energy_history = [[] for _ in range(chi)]
+    if target_time is None:
+        target_time = timeout / max(max_iterations, 1)
+
+    # Start the coldest replica from the best stored conformation
+    if warm is not None and c == []:
+        replicas[0] = (warm.copy(), model.energy(warm))
+        if replicas[0][1] <= best_energy:
+            best_conformation, best_energy = warm.copy(), replicas[0][1]
+
+    # Resume an interrupted run from its checkpoint
+    state = load_checkpoint(checkpoint, hp) if checkpoint is not None else None
+    elapsed = 0
+    if state is not None:
+        replicas, temperatures, phis = state["replicas"], state["temperatures"], state["phis"]
+        energy_history, offset, iteration = state["energy_history"], state["offset"], state["iteration"]
+        best_conformation, best_energy = state["best_conformation"], state["best_energy"]
+        chi, elapsed = len(replicas), state["elapsed"]
+        random.setstate(state["random_state"])
+        if archive is not None and state["archive"] is not None:
+            archive.merge(state["archive"])
+        if observables is not None and state["observables"] is not None:
+            observables.merge(state["observables"])
 
-    while best_energy > E_star and iteration < max_iterations and time.time() - start_time < timeout:
+    # Timeout calculation
+    start_time = time.time() - elapsed
+    last_checkpoint = time.time()
+    deadline = start_time + timeout if adaptive_phi else None
+    if profiler is not None:
+        profiler.start()
+    if telemetry is not None:
+        telemetry.emit({"type": "start", "hp": hp, "E_star": E_star, "temperatures": temperatures, "iteration": 0})
+
+    while best_energy > E_star and iteration < max_iterations and time.time() - start_time < timeout and \
+            not (stop_event is not None and stop_event.is_set()):
         iteration += 1
-        print(f"Iteration {iteration}, Best Energy: {best_energy}")
+        if telemetry is None:
+            print(f"Iteration {iteration}, Best Energy: {best_energy}, Gap: {best_energy - E_star}")
+        time_iteration = time.time()
 
         # Parallelize the MC search for each replica using multiprocessing
-        with multiprocessing.Pool() as pool:
+        time_pool = time.time()
+        with multiprocessing.Pool(processes, init_worker_MCsearch, (stop_event,)) as pool:
+            pool_startup = time.time() - time_pool
 
             # Prepare arguments for each worker
-            args = [(hp, replicas[k][0], phi, nu, temperatures[k]) for k in range(chi)]
+            args = [(hp, replicas[k][0], phis[k], nu, temperatures[k], deadline, observables is not None,
+                     archive.k if archive is not None else 0,
+                     profiler is not None and ("memory" if profiler.trace_memory else True), random.getrandbits(64),
+                     trajectory.stride if trajectory is not None else 0, model)
+                    for k in range(chi)]
 
             # Map the work to the pool
+            time_map = time.time()
             results = pool.map(worker_MCsearch, args)
+            if report is not None:
+                report.add_iteration(iteration, pool_startup, time.time() - time_map, [r[2] for r in results], args, results)
 
             # Update replicas with results
-            for k, (new_conformation, new_energy) in enumerate(results):
+            for k, (new_conformation, new_energy, elapsed, worker_observables, worker_archive, worker_profiler, frames) in enumerate(results):
                 replicas[k] = (new_conformation, new_energy)
+                if trajectory is not None:
+                    trajectory.write_frames(frames.data)
+                if observables is not None:
+                    observables.merge(worker_observables)
+                if archive is not None:
+                    archive.merge(worker_archive)
+                if profiler is not None:
+                    profiler.merge(worker_profiler)
+
+                # Adapt the sweep length of this replica to its wall time and autocorrelation
+                if adaptive_phi:
+                    energy_history[k] = (energy_history[k] + [new_energy])[-20:]
+                    phis[k] = adapt_phi(phis[k], elapsed, energy_history[k], target_time, phi_min, phi_max)
 
                 # Update best conformation if needed
                 if new_energy < best_energy:
                     best_conformation = new_conformation.copy()
                     best_energy = new_energy
+                    if telemetry is not None:
+                        telemetry.emit({"type": "best", "iteration": iteration, "best_energy": best_energy,
+                                        "best_conformation": best_conformation})
 
         # Attempt replica exchanges between neighboring temperatures
         i = offset
+        exchanges_attempted, exchanges_accepted = 0, 0
         while i + 1 < chi:
             j = i + 1
+            exchanges_attempted += 1
 
             # Calculate exchange probability
             delta = (1/temperatures[j] - 1/temperatures[i]) * (replicas[i][1] - replicas[j][1])
@@ -348,15 +1018,43 @@ def REMC_paral(hp, E_star, c=[], phi=500, nu=0.5, T_init=160, T_final=220, chi=5
             # Accept exchange with Metropolis criterion
             if delta <= 0:
                 replicas[i], replicas[j] = replicas[j], replicas[i]
+                exchanges_accepted += 1
                 #temperatures[i], temperatures[j] = temperatures[j], temperatures[i]
             else:
                 if random.random() < exp(-delta):
                     replicas[i], replicas[j] = replicas[j], replicas[i]
+                    exchanges_accepted += 1
                     #temperatures[i], temperatures[j] = temperatures[j], temperatures[i]
             i += 2
 
         # Toggle offset for next iteration
         offset = 1 - offset
+
+        if telemetry is not None and telemetry.accepts():
+            telemetry.emit(iteration_record(iteration, time.time() - start_time, replicas, temperatures, best_energy,
+                                            exchanges_accepted, exchanges_attempted, sum(phis), time.time() - time_iteration,
+                                            telemetry.conformations))
+
+        if profiler is not None:
+            profiler.end_iteration(iteration)
+
+        # Save the state of the run periodically
+        if checkpoint is not None and time.time() - last_checkpoint >= checkpoint_interval:
+            save_checkpoint(checkpoint, checkpoint_state(hp, iteration, time.time() - start_time, offset, replicas, temperatures, phis,
+                                                         energy_history, best_conformation, best_energy, archive, observables))
+            last_checkpoint = time.time()
+
+    if profiler is not None:
+        profiler.stop()
+    if checkpoint is not None:
+        save_checkpoint(checkpoint, checkpoint_state(hp, iteration, time.time() - start_time, offset, replicas, temperatures, phis,
+                                                     energy_history, best_conformation, best_energy, archive, observables))
+    if telemetry is not None:
+        telemetry.emit({"type": "end", "iteration": iteration, "time": time.time() - start_time,
+                        "best_energy": best_energy, "best_conformation": best_conformation}, force=True)
+    if db is not None:
+        db.record(hp, best_conformation, best_energy, "REMC_paral",
+                  {"phi": phi, "nu": nu, "T_init": T_init, "T_final": T_final, "chi": chi}, time.time() - start_time)
     return best_conformation, best_energy
 
 
@@ -364,8 +1062,25 @@ def REMC_paral(hp, E_star, c=[], phi=500, nu=0.5, T_init=160, T_final=220, chi=5
 
 # ----- Monte Carlo / REMC Tests -----
 if __name__ == "__main__":
-
-    test = "test_REMC_paral"  # "test_REMC_multiprocessing"   "test_MC_search"   ""test_REMC_paral""
+    from Grid import *  # Plotting is only needed by the tests
+
+    test = "test_REMC_paral"  # "test_REMC_multiprocessing"   "test_MC_search"   ""test_REMC_paral""   "test_check_options"
+
+    # -- Test the options rejected by the energy model -----
+    if test == "test_check_options":
+        from Lattice import CUBIC
+        hp = "HPHPPHHPHPPHPHHPPHPH"
+        for model, options in [(EnergyModel(hp, "HP+"), {"db": ResultsDB(":memory:")}),
+                               (EnergyModel(hp, "HP+"), {"observables": ObservablesAccumulator(hp)}),
+                               (EnergyModel(hp, lattice=CUBIC), {"archive": ConformationArchive(5)})]:
+            try:
+                check_options(model, **options)
+            except ValueError as error:
+                print("Rejected:", error)
+            else:
+                raise AssertionError(f"{', '.join(options)} accepted with {model.model} on the {model.lattice.name} lattice")
+        check_options(EnergyModel(hp), db=ResultsDB(":memory:"), observables=ObservablesAccumulator(hp))
+        print("HP model on the square lattice: accepted")
 
     # -- Test MCsearch -----
     if test == "test_MC_search":
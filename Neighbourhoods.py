@@ -1,331 +1,191 @@
 import random
+from functools import partial
 from Others_function import *
-from Grid import *
+from Lattice import SQUARE
 
 
-
-def M(c, k, nu):
+def move_function(lattice=SQUARE):
     """
-    Applies a random move (either pull or VSHD) to residue k based on probability nu.
+    Returns the move function of a lattice, called as move(c, k, nu, profiler) (bound once per search).
     Args:
-        c (list of tuples): Current conformation as a list of (x, y) coordinates.
-        k (int): Index of the residue to move.
-        nu (float): Probability of applying a pull move (vs. VSHD move).
+        lattice (Lattice, optional): Lattice of the conformations. Defaults to SQUARE.
     Returns:
-        tuple: (bool, new_conformation)
-            bool: True if the move was successful, False otherwise.
-            new_conformation: The new conformation after the move.
+        function: M bound to the lattice.
     """
-    rand = random.random()
-    if rand < nu:
-        return pull_move(c, k)
-    return M_vshd(c, k)
+    return partial(M, lattice=lattice)
 
 
 
-def M_vshd(c, k):
+def M(c, k, nu, profiler=None, lattice=SQUARE):
     """
-    Applies a VSHD move (end, corner, or crankshaft) to residue k.
+    Applies a random move (either pull or VSHD) to residue k.
     Args:
-        c (list of tuples): Current conformation as a list of (x, y) coordinates.
-        k (int): Index of the residue to move (must be between 1 and n-3).
+        c (list of tuples): Current conformation.
+        k (int): Index of the residue to move.
+        nu (float): Probability of applying a pull move (vs. VSHD move).
+        profiler (Profiler, optional): Profiler recording the proposed and possible moves. Defaults to None.
+        lattice (Lattice, optional): Lattice of the conformation. Defaults to SQUARE.
     Returns:
         tuple: (bool, new_conformation)
             bool: True if the move was successful, False otherwise.
-            new_conformation: The new conformation after the move (or the original if no move was possible).
+            new_conformation: The new conformation after the move (or c if no move was possible).
     """
-    c_prime = c.copy()  # Create a copy of the conformation
-    n = len(c_prime)
-
-    # Case 1: End move (if k is the first or last residue)
+    n = len(c)
+    occupied = set(c)
+    if random.random() < nu:
+        possible, new_c = pull_move(c, k, lattice, occupied)
+        if profiler is not None:
+            profiler.move("pull", possible)
+        return possible, new_c
+
+    # VSHD moves: end move for the chain ends, corner move for the second-to-last residue, otherwise corner or
+    # crankshaft move in random order
     if k == 0 or k == n-1:
-        end_move_possible, new_c = end_move(c_prime, k)
-        if end_move_possible:
-            return (True, new_c)
-        
-    # Case 2: Corner move (if k is the second-to-last residue)
+        moves = [("end", end_move)]
     elif k == n-2:
-        corner_possible, new_c = corner_move(c_prime, k)
-        if corner_possible:
-            return (True, new_c)
-
-    # Case 3: For internal residues, try corner or crankshaft move
+        moves = [("corner", corner_move)]
+    elif random.randint(1, 2) == 1:
+        moves = [("corner", corner_move), ("crankshaft", crankshaft_move)]
     else:
-        rand = random.randint(1, 2)  # Randomly choose between corner and crankshaft
-        
-        # Try corner move first if randomly selected, crankshaft otherwise
-        if rand == 1 :
-            corner_possible, new_c_corner = corner_move(c_prime, k)
-            if corner_possible:
-                return (True, new_c_corner)
-            else :
-                crankshaft_possible, new_c_crankshaft = crankshaft_move(c_prime, k)
-                if crankshaft_possible:
-                    return (True, new_c_crankshaft)
-                
-        # Try crankshaft move if possible, corner otherwise
-        else :
-            crankshaft_possible, new_c_crankshaft = crankshaft_move(c_prime, k)
-            if crankshaft_possible:
-                return (True, new_c_crankshaft)
-            else :
-                corner_possible, new_c_corner = corner_move(c_prime, k)
-                if corner_possible:
-                    return (True, new_c_corner)
-        
-    # If no move is possible, return the unchanged conformation
-    return (False, c_prime)
+        moves = [("crankshaft", crankshaft_move), ("corner", corner_move)]
+    for name, move in moves:
+        possible, new_c = move(c, k, lattice, occupied)
+        if profiler is not None:
+            profiler.move(name, possible)
+        if possible:
+            return True, new_c
+    return False, c
 
 
 
-def end_move(c, k):
+def end_move(c, k, lattice=SQUARE, occupied=None):
     """
-    Applies an end move to residue k, where k must be first (0) or last residue (n-1).
+    Moves the end residue k (0 or n-1) to a random free neighbour of the next residue.
     Args:
         c (list of tuples): Current conformation.
         k (int): Index of the residue to move (0 or n-1).
+        lattice (Lattice, optional): Lattice of the conformation. Defaults to SQUARE.
+        occupied (set, optional): Positions of c, if already computed by the caller. Defaults to None.
     Returns:
         tuple: (bool, new_conformation)
-            bool: True if the move was successful, False otherwise.
-            new_conformation: The new conformation after the move (or the original if no move was possible).
     """
-
+    if occupied is None:
+        occupied = set(c)
+    neighbour_residue = c[1] if k == 0 else c[-2]
+    sites = [site for site in lattice.neighbours(neighbour_residue) if site not in occupied]
+    if not sites:
+        return False, c
     cp = c.copy()
-    if k == 0:
-        neighbour_residue = c[1]  # Residue 1
-    else:  
-        neighbour_residue = c[-2]  # Residue n-1
-        
-    # Possible directions in a 2D lattice:
-    x_nr = neighbour_residue[0]
-    y_nr = neighbour_residue[1]
-    directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-    random.shuffle(directions)  # Shuffle to get a random position
-
-    for x, y in directions:
-        # Test all neighbor positions of neighbour_residue and return the first one which is empty
-        new_x = x_nr + x
-        new_y = y_nr + y
-        new_k = (new_x, new_y)
-        if (new_k not in c):
-            if k == 0:
-                cp[0] = new_k
-            else:
-                cp[-1] = new_k
-            return (True, cp)
-        
-    return (False, cp)  # No move possible
+    cp[k] = random.choice(sites)
+    return True, cp
 
 
 
-def corner_move(c, k):
+def corner_move(c, k, lattice=SQUARE, occupied=None):
     """
-    Applies a corner move to residue k, where k must be between 1 and n-2.
+    Moves residue k (between 1 and n-2) to a random free site adjacent to both residues k-1 and k+1.
     Args:
         c (list of tuples): Current conformation.
         k (int): Index of the residue to move.
+        lattice (Lattice, optional): Lattice of the conformation. Defaults to SQUARE.
+        occupied (set, optional): Positions of c, if already computed by the caller. Defaults to None.
     Returns:
         tuple: (bool, new_conformation)
-            bool: True if the move was successful, False otherwise.
-            new_conformation: The new conformation after the move (or the original if no move was possible).
     """
-
+    if occupied is None:
+        occupied = set(c)
+    previous = c[k-1]
+    bridges = lattice.bridges.get(lattice.pack(c[k+1]) - lattice.pack(previous), ())
+    sites = [site for site in (lattice.add(previous, d) for d in bridges) if site not in occupied]
+    if not sites:
+        return False, c
     cp = c.copy()
+    cp[k] = random.choice(sites)
+    return True, cp
 
-    # Create variables containing the coordinates of k, its previous neighbors, and its next one.
-    coord, coord_prev, coord_next = cp[k], cp[k-1], cp[k+1]
-    x = coord[0]
-    x_prev, y_prev = coord_prev[0], coord_prev[1]
-    x_next, y_next = coord_next[0], coord_next[1]
-    if x_prev != x_next and y_prev != y_next:
-
-        # The condition above checks if k and its neighbors form a corner.
-        if x_prev == x and ((x_next, y_prev) not in c):
-            cp[k] = (x_next, y_prev)
-            return (True, cp)
-        elif ((x_prev, y_next) not in c):
-            cp[k] = (x_prev, y_next)
-            return (True, cp)
-
-    return (False, cp)
 
 
-
-def crankshaft_move(c, k):
+def crankshaft_move(c, k, lattice=SQUARE, occupied=None):
     """
-    Applies a crankshaft move to residue k, where k must be between 1 and n-3.
-    We consider k as the first corner of the U-shaped segment.
+    Moves residues k and k+1 (k between 1 and n-3) when residues k-1 and k+2 are adjacent: the pair is
+    translated to another free pair of sites next to k-1 and k+2 (a 180 degree flip on the square lattice).
     Args:
-        c (list of tuples): Current conformation as a list of (x, y) coordinates.
-        k (int): Index of the residue to move (must be between 1 and n-3).
+        c (list of tuples): Current conformation.
+        k (int): Index of the first residue to move.
+        lattice (Lattice, optional): Lattice of the conformation. Defaults to SQUARE.
+        occupied (set, optional): Positions of c, if already computed by the caller. Defaults to None.
     Returns:
         tuple: (bool, new_conformation)
-            bool: True if the move was successful, False otherwise.
-            new_conformation: The new conformation after the move (or the original if no move was possible).
     """
+    if occupied is None:
+        occupied = set(c)
+    first, last = c[k-1], c[k+2]
+    if lattice.pack(last) - lattice.pack(first) not in lattice.step_set:
+        return False, c
+    pairs = []
+    for d in lattice.directions:
+        site, next_site = lattice.add(first, d), lattice.add(last, d)
+        if site not in occupied and next_site not in occupied:
+            pairs.append((site, next_site))
+    if not pairs:
+        return False, c
     cp = c.copy()
+    cp[k], cp[k+1] = random.choice(pairs)
+    return True, cp
 
-    # Get coordinates of the four residues involved in the crankshaft move
-    x_prev, y_prev = cp[k-1]   # Previous residue (first corner of U)
-    x, y = cp[k]              # Current residue (second corner of U)
-    x_next, y_next = cp[k+1]  # Next residue (third corner of U)
-    x_next2, y_next2 = cp[k+2] # Residue after next (fourth corner of U)
 
-    # Check for horizontal U-shape (residues k-1 and k+2 have same x-coordinate)
-    if x_prev == x_next2 and x == x_next:
-        
-        # Case 1: U opens to the right - rotate 180° to the left
-        if x == x_prev + 1 and ((x - 2, y) not in c) and ((x_next - 2, y_next) not in c):
-            cp[k] = (x - 2, y)          # Move current residue left by 2 units
-            cp[k+1] = (x_next - 2, y_next)  # Move next residue left by 2 units
-            return (True, cp)
-        
-        # Case 2: U opens to the left - rotate 180° to the right
-        elif x == x_prev - 1 and ((x + 2, y) not in c) and ((x_next + 2, y_next) not in c):
-            cp[k] = (x + 2, y)          # Move current residue right by 2 units
-            cp[k+1] = (x_next + 2, y_next)  # Move next residue right by 2 units
-            return (True, cp)
-        
-    # Check for vertical U-shape (residues k-1 and k+2 have same y-coordinate)
-    elif y_prev == y_next2 and y == y_next:
 
-        # Case 3: U opens downward - rotate 180° upward
-        if y == y_prev + 1 and ((x, y - 2) not in c) and ((x_next, y_next - 2) not in c):
-            cp[k] = (x, y - 2)          # Move current residue down by 2 units
-            cp[k+1] = (x_next, y_next - 2)  # Move next residue down by 2 units
-            return (True, cp)
-        
-        # Case 4: U opens upward - rotate 180° downward
-        elif y == y_prev - 1 and ((x, y + 2) not in c) and ((x_next, y_next + 2) not in c):
-            cp[k] = (x, y + 2)          # Move current residue up by 2 units
-            cp[k+1] = (x_next, y_next + 2)  # Move next residue up by 2 units
-            return (True, cp)
-        
-    # If none of the above conditions are met, return False with original conformation
-    return (False, cp)
-
-
-
-def pull_move(c, k, max_try=3):
+def pull_move(c, k, lattice=SQUARE, occupied=None):
     """
-    Applies a pull move (forward or backward) to residue k.
+    Applies a pull move to residue k (Lesh et al., 2003), pulling the chain from one side or the other in random order:
+    k moves to a free site L next to its neighbour on the other side, its neighbour on the pulled side moves to the
+    site C completing the parallelogram (unless already there), and the next residues follow two positions behind
+    until the chain is connected again.
     Args:
-        c (list of tuples): Current conformation as a list of (x, y) coordinates.
-        k (int): Index of the residue to move (must be between 0 and n-3).
-        max_try (int, optional): Maximum number of attempts to find a valid move. Defaults to 3.
-    Returns:
-        tuple: (bool, new_conformation)
-            bool: True if the move was successful, False otherwise.
-            new_conformation: The new conformation after the move (or the original if no move was possible).
-    """
-    if k <= len(c)-3:
-        bool_forward, c_forward = pull_move_forward(c, k, max_try)
-        if bool_forward:
-            return bool_forward, c_forward
-    return pull_move_backward(c, k, max_try)
-
-
-
-def pull_move_backward(c, k, max_try=3):
-    """
-    Applies a pull move backward to residue k where k must be between 0 and n-3.
-    Args:
-        c (list of tuples): Current conformation as a list of (x, y) coordinates.
-        k (int): Index of the residue to move (must be between 0 and n-3).
-        max_try (int, optional): Maximum number of attempts to find a valid move. Defaults to 3.
+        c (list of tuples): Current conformation.
+        k (int): Index of the residue to move.
+        lattice (Lattice, optional): Lattice of the conformation. Defaults to SQUARE.
+        occupied (set, optional): Positions of c, if already computed by the caller. Defaults to None.
     Returns:
         tuple: (bool, new_conformation)
-            bool: True if the move was successful, False otherwise.
-            new_conformation: The new conformation after the move (or the original if no move was possible).
     """
-    cp = c.copy()
+    if occupied is None:
+        occupied = set(c)
     n = len(c)
-    cp.reverse()
-    c0 = pull_move_forward(cp, n-k+1, max_try)
-    c1 = c0[1]
-    c1.reverse()
-    return c0[0], c1
-
-
-
-def pull_move_forward(c, k, max_try=3):
-    """
-    Applies a pull move forward to residue k where k must be between 0 and n-3.
-    Args:
-        c (list of tuples): Current conformation as a list of (x, y) coordinates.
-        k (int): Index of the residue to move (must be between 0 and n-3).
-        max_try (int, optional): Maximum number of attempts to find a valid move. Defaults to 3.
-    Returns:
-        tuple: (bool, new_conformation)
-            bool: True if the move was successful, False otherwise.
-            new_conformation: The new conformation after the move (or the original if no move was possible).
-    """
-    cp = c.copy()
-    cp2 = c.copy()
-    n = len(cp)
-    if k > n-3:
-        return (False, c)
-    q = 0
-    seuil = 0
-    while k + q != n-3 or seuil > max_try:
-        xi, yi = cp2[k + q]
-        xi_next, yi_next = cp2[k + q + 1]
-        xi_next2, yi_next2 = cp2[k + q + 2]
-
-        # Two possible candidates to be adjacent to previous residue and in the corner of the current one (L)
-        L1_x, L1_y = xi + (yi - yi_next), yi + (xi_next - xi)
-        L2_x, L2_y = xi - (yi - yi_next), yi - (xi_next - xi)
-
-        # And the two candidates to be in the corner (C)
-        C1_x, C1_y = xi_next - (yi_next - yi), yi_next - (xi - xi_next)
-        C2_x, C2_y = xi_next + (yi_next - yi), yi_next + (xi - xi_next)
-
-        # Check if L1/2 is free and C1/2 is in the correct place with the next residue
-        cond_L1 = (L1_x, L1_y) not in cp2
-        cond_L2 = (L2_x, L2_y) not in cp2
-        cond_C1_in_Cp2 = (C1_x, C1_y) not in cp2
-        cond_C2_in_Cp2 = (C2_x, C2_y) not in cp2
-
-        cp2 = cp.copy()
-        rand = random.randint(1, 2)
-
-        # If a candidate is free and the corresponding C is in the right place, make the move and return
-        if cond_L1 and (C1_x, C1_y) == (xi_next2, yi_next2):
-            cp[k + q + 1] = (L1_x, L1_y)
-            if is_valid_conformation(cp):
-                return (True, cp)
-            elif seuil < max_try: # If confromation is not valid, retry utill max_try
-                cp = c.copy()
-                cp2 = c.copy()
-                q = 0
-                seuil += 1
-            else:
-                return (False, c)
-
-        elif cond_L2 and (C2_x, C2_y) == (xi_next2, yi_next2):
-            cp[k + q + 1] = (L2_x, L2_y)
-            if is_valid_conformation(cp):
-                return (True, cp)
-            elif seuil < max_try: # If confromation is not valid, retry utill max_try
-                cp = c.copy()
-                cp2 = c.copy()
-                q = 0
-                seuil += 1
-            else:
-                return (False, c)
-        elif rand == 1 and cond_L1 and cond_C1_in_Cp2: 
-            cp[k + q + 1] = (L1_x, L1_y)
-        elif cond_L2 and cond_C2_in_Cp2:
-            cp[k + q + 1] = (L2_x, L2_y)
-        elif cond_L1 and cond_C1_in_Cp2:
-            cp[k + q + 1] = (L1_x, L1_y)
-        q += 1
-    return (False, c)
+    sides = [1, -1]
+    random.shuffle(sides)
+    for side in sides:
+        anchor = k + side  # Neighbour of k that stays in place
+        pulled = k - side  # Neighbour of k that follows it
+        if not 0 <= anchor < n:
+            continue
+        directions = list(lattice.directions)
+        random.shuffle(directions)
+        for d in directions:
+            site = lattice.add(c[anchor], d)        # L, adjacent to the anchor
+            corner = lattice.add(c[k], d)           # C, adjacent to L and to the old position of k
+            if site in occupied:
+                continue
+            chain_end = not 0 <= pulled < n
+            if not chain_end and corner != c[pulled] and corner in occupied:
+                continue
+            cp = c.copy()
+            cp[k] = site
+            if chain_end or corner == c[pulled]:
+                return True, cp
+            cp[pulled] = corner
+            j = pulled - side
+            while 0 <= j < n and not lattice.is_adjacent(c[j], cp[j + side]):
+                cp[j] = c[j + 2 * side]
+                j -= side
+            return True, cp
+    return False, c
 
 
 
 # ----- Neighbourhoods Tests -----
 if __name__ == "__main__":
+    from Grid import *  # Plotting is only needed by the tests
 
     test = "test_pull_move"  # "test_crankshaft_move"  # "test_corner_move"  # "test_end_move"
 
@@ -354,16 +214,8 @@ if __name__ == "__main__":
     # ----- Test Pull Move -----
     if test == "test_pull_move":
         hp = "HPHHPPHPPH"
-        c = [(0, 0), (0, 1), (0, 2), (1, 2), (1, 3), (2, 3), (2, 2), (2, 1), (2, 0)]
-        # c = [(2, 0), (2, 1), (2, 2), (2, 3), (1, 3), (1, 2), (0, 2), (0, 1), (0, 0)]
         c = [(0,0), (0,1), (0,2), (1,2), (2,2), (3,2), (3,1), (2,1), (2,0), (2,-1)]
         cp = pull_move(c, 6)
-        print("Pull move result 0:", pull_move(c, 0))
-        print("Pull move result 1:", pull_move(c, 1))
-        print("Pull move result 2:", pull_move(c, 2))
-        print("Pull move result 3:", pull_move(c, 3))
-        print("Pull move result 4:", pull_move(c, 4))
-        print("Pull move result 5:", pull_move(c, 5))
-        print("Pull move result 6:", pull_move(c, 6))
-        print("Pull move result 7:", pull_move(c, 7))
+        for k in range(len(c)):
+            print(f"Pull move result {k}:", pull_move(c, k))
         plot_molecules_side_by_side(c, cp[1], hp)
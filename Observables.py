@@ -0,0 +1,180 @@
+from math import sqrt
+
+
+class ObservablesAccumulator:
+    """
+    Streaming accumulator of thermodynamic observables, one set per temperature:
+    energy histogram, mean energy, radius of gyration, end-to-end distance and H-H contact frequencies.
+    The chain state of each temperature is updated incrementally from the residues moved by an accepted move,
+    so no trajectory needs to be stored. The contact map is sparse (at most O(n²) entries).
+    Accumulators of different worker processes can be combined with merge().
+    """
+
+    def __init__(self, hp):
+        """
+        Args:
+            hp (str): HP sequence (Example: "HPPHHPH").
+        """
+        self.hp = hp
+        self.stats = {}    # Accumulated statistics, by temperature
+        self._state = {}   # Current chain state, by temperature (not merged)
+
+    def _stats(self, T):
+        if T not in self.stats:
+            self.stats[T] = {"samples": 0, "energy_sum": 0.0, "energy_sq_sum": 0.0, "histogram": {},
+                             "rg_sum": 0.0, "end_to_end_sum": 0.0, "contact_samples": {}}
+        return self.stats[T]
+
+    def _contacts_of(self, i, state):
+        """Returns the H-H contacts (as sorted index pairs) of residue i in the current chain state."""
+        contacts = set()
+        if self.hp[i] != 'H':
+            return contacts
+        x, y = state["positions"][i]
+        for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+            j = state["index"].get((x + dx, y + dy))
+            if j is not None and abs(i - j) > 1 and self.hp[j] == 'H':
+                contacts.add((min(i, j), max(i, j)))
+        return contacts
+
+    def begin(self, T, c, energy):
+        """
+        (Re)starts the chain state of temperature T from conformation c, e.g. after a replica exchange.
+        Args:
+            T (float): Temperature.
+            c (list of tuples): Current conformation.
+            energy (float): Energy of c.
+        """
+        self._stats(T)
+        state = {"positions": list(c), "index": {pos: i for i, pos in enumerate(c)}, "energy": energy,
+                 "sum_x": sum(x for x, y in c), "sum_y": sum(y for x, y in c),
+                 "sum_sq": sum(x * x + y * y for x, y in c), "contacts": {}}
+        for i in range(len(c)):
+            for pair in self._contacts_of(i, state):
+                state["contacts"][pair] = self.stats[T]["samples"]  # Sample count at which the contact formed
+        self._state[T] = state
+
+    def update(self, T, c, energy, moved):
+        """
+        Applies an accepted move to the chain state of temperature T.
+        Args:
+            T (float): Temperature.
+            c (list of tuples): New conformation.
+            energy (float): Energy of c.
+            moved (list of int): Indices of the residues whose position changed.
+        """
+        state = self._state[T]
+        samples = self.stats[T]["samples"]
+        positions = state["positions"]
+
+        # Contacts of the moved residues before the move
+        old_contacts = set()
+        for i in moved:
+            old_contacts |= self._contacts_of(i, state)
+
+        # Update positions, position index and coordinate sums
+        for i in moved:
+            x, y = positions[i]
+            del state["index"][(x, y)]
+            state["sum_x"] -= x
+            state["sum_y"] -= y
+            state["sum_sq"] -= x * x + y * y
+        for i in moved:
+            x, y = c[i]
+            positions[i] = (x, y)
+            state["index"][(x, y)] = i
+            state["sum_x"] += x
+            state["sum_y"] += y
+            state["sum_sq"] += x * x + y * y
+        state["energy"] = energy
+
+        # Contacts of the moved residues after the move
+        new_contacts = set()
+        for i in moved:
+            new_contacts |= self._contacts_of(i, state)
+
+        # Close broken contacts and open new ones
+        contact_samples = self.stats[T]["contact_samples"]
+        for pair in old_contacts - new_contacts:
+            contact_samples[pair] = contact_samples.get(pair, 0) + samples - state["contacts"].pop(pair)
+        for pair in new_contacts - old_contacts:
+            state["contacts"][pair] = samples
+
+    def sample(self, T):
+        """
+        Adds the current chain state of temperature T to the averages (called once per MC step).
+        Args:
+            T (float): Temperature.
+        """
+        state = self._state[T]
+        stats = self.stats[T]
+        n = len(state["positions"])
+        energy = state["energy"]
+
+        stats["samples"] += 1
+        stats["energy_sum"] += energy
+        stats["energy_sq_sum"] += energy * energy
+        stats["histogram"][energy] = stats["histogram"].get(energy, 0) + 1
+
+        # Radius of gyration from the coordinate sums: Rg² = <r²> - <r>²
+        mean_x, mean_y = state["sum_x"] / n, state["sum_y"] / n
+        stats["rg_sum"] += sqrt(max(state["sum_sq"] / n - mean_x * mean_x - mean_y * mean_y, 0.0))
+
+        (x0, y0), (x1, y1) = state["positions"][0], state["positions"][-1]
+        stats["end_to_end_sum"] += sqrt((x1 - x0) ** 2 + (y1 - y0) ** 2)
+
+    def end(self, T):
+        """
+        Flushes the open contacts of temperature T into the contact counts (called at the end of a sweep).
+        Args:
+            T (float): Temperature.
+        """
+        state = self._state.pop(T, None)
+        if state is None:
+            return
+        samples = self.stats[T]["samples"]
+        contact_samples = self.stats[T]["contact_samples"]
+        for pair, start in state["contacts"].items():
+            contact_samples[pair] = contact_samples.get(pair, 0) + samples - start
+
+    def merge(self, other):
+        """
+        Adds the statistics of another accumulator (e.g. from a worker process) to this one.
+        Args:
+            other (ObservablesAccumulator): Accumulator for the same HP sequence.
+        Returns:
+            ObservablesAccumulator: self
+        """
+        for T, other_stats in other.stats.items():
+            stats = self._stats(T)
+            for key in ("samples", "energy_sum", "energy_sq_sum", "rg_sum", "end_to_end_sum"):
+                stats[key] += other_stats[key]
+            for energy, count in other_stats["histogram"].items():
+                stats["histogram"][energy] = stats["histogram"].get(energy, 0) + count
+            for pair, count in other_stats["contact_samples"].items():
+                stats["contact_samples"][pair] = stats["contact_samples"].get(pair, 0) + count
+        return self
+
+    def summary(self):
+        """
+        Returns the averages of each temperature.
+        Returns:
+            dict: {T: {"samples", "mean_energy", "energy_variance", "histogram", "mean_rg", "mean_end_to_end",
+                   "contact_frequency"}}, where contact_frequency maps (i, j) pairs to the fraction of samples in contact.
+        """
+        result = {}
+        for T, stats in sorted(self.stats.items()):
+            samples = stats["samples"]
+            if samples == 0:
+                continue
+            mean_energy = stats["energy_sum"] / samples
+            result[T] = {
+                "samples": samples,
+                "mean_energy": mean_energy,
+                "energy_variance": stats["energy_sq_sum"] / samples - mean_energy ** 2,
+                "histogram": dict(sorted(stats["histogram"].items())),
+                "mean_rg": stats["rg_sum"] / samples,
+                "mean_end_to_end": stats["end_to_end_sum"] / samples,
+                "contact_frequency": {pair: count / samples for pair, count in sorted(stats["contact_samples"].items())},
+            }
+        return result
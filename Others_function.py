@@ -1,37 +1,39 @@
 from random import shuffle
-from Grid import *
-import re
+from Lattice import SQUARE
 
-def generate_linear_conformation(hp_sequence):
+def generate_linear_conformation(hp_sequence, lattice=SQUARE):
     """
     Creates a linear initial configuration for an HP molecule.
     Args:
         hp_sequence (str): HP sequence (Example: "HPH")
+        lattice (Lattice, optional): Lattice of the conformation. Defaults to SQUARE.
     Returns:
-        list: Linear configuration as a list of (x, y) coordinates.
+        list: Linear configuration as a list of (x, y) coordinates ((x, y, z) on the cubic lattice).
               Example: generate_linear_conformation('HPH') returns [(0, 0), (1, 0), (2, 0)]
     """
 
-    # Create a linear configuration along the x-axis starting from (0, 0)
-    c_initial = [(i, 0) for i in range(len(hp_sequence))]
+    # Create a linear configuration along the x-axis starting from the origin
+    zeros = (0,) * (lattice.dimension - 1)
+    c_initial = [(i,) + zeros for i in range(len(hp_sequence))]
     return c_initial
 
 
 
-def generate_random_conformation(hp_sequence):
+def generate_random_conformation(hp_sequence, lattice=SQUARE):
     """
     Generates a random valid conformation for an HP sequence without overlaps.
     Uses an iterative approach with a stack to simulate recursion.
     Args:
         hp_sequence (str): HP sequence (e.g., "HPPHHPHPPH")
+        lattice (Lattice, optional): Lattice of the conformation. Defaults to SQUARE.
     Returns:
         list: List of (x, y) coordinates representing a valid self-avoiding conformation, or None if no solution is found.
     """
     if not hp_sequence:
         return []
 
-    # Initialization: Start at the origin (0, 0)
-    start = (0, 0)
+    # Initialization: Start at the origin
+    start = (0,) * lattice.dimension
     current_conformation = [start]
     visited = {start}
     # Stack stores tuples of (current_conformation, visited_positions, remaining_length)
@@ -47,15 +49,15 @@ def generate_random_conformation(hp_sequence):
             return current_conformation
 
         # Get the last position in the current conformation
-        last_x, last_y = current_conformation[-1]
-        # Possible directions: right, left, down, up
-        directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+        last = current_conformation[-1]
+        # Possible directions: the neighbour offsets of the lattice
+        directions = list(lattice.directions)
         # Shuffle directions to explore them in random order
         shuffle(directions)
 
         # Try each direction
-        for dx, dy in directions:
-            new_pos = (last_x + dx, last_y + dy)
+        for direction in directions:
+            new_pos = lattice.add(last, direction)
             # Check if the new position is not already visited
             if new_pos not in visited:
                 # Add the new position to the conformation and mark it as visited
@@ -69,12 +71,55 @@ def generate_random_conformation(hp_sequence):
 
 
 
+def extend_conformation(c, hp_sequence, lattice=SQUARE):
+    """
+    Extends a conformation with a random self-avoiding walk until it matches the length of an HP sequence.
+    If the last residue is trapped, the last residues of c are released until an extension is possible.
+    Args:
+        c (list of tuples): Conformation of a prefix of hp_sequence, as a list of (x, y) coordinates.
+        hp_sequence (str): Full HP sequence (e.g., "HPPHHPHPPH")
+        lattice (Lattice, optional): Lattice of the conformation. Defaults to SQUARE.
+    Returns:
+        list: List of (x, y) coordinates of a valid self-avoiding conformation of hp_sequence.
+    """
+    n = len(hp_sequence)
+    if len(c) >= n:
+        return c[:n]
+    if not c:
+        return generate_random_conformation(hp_sequence, lattice)
+
+    # Release residues from the end of c until the walk can be completed
+    for keep in range(len(c), 0, -1):
+        start = c[:keep]
+        stack = [(start, set(start), n - keep)]
+
+        while stack:
+            # Pop the most recent state from the stack
+            current_conformation, visited, remaining_length = stack.pop()
+
+            # Base case: all residues are placed
+            if remaining_length == 0:
+                return current_conformation
+
+            last = current_conformation[-1]
+            directions = list(lattice.directions)
+            shuffle(directions)
+
+            for direction in directions:
+                new_pos = lattice.add(last, direction)
+                if new_pos not in visited:
+                    stack.append((current_conformation + [new_pos], visited | {new_pos}, remaining_length - 1))
+
+    return generate_random_conformation(hp_sequence, lattice)
+
+
 
-def is_valid_conformation(cp):
+def is_valid_conformation(cp, lattice=SQUARE):
     """
     Checks if a conformation is valid (self-avoiding and connected).
     Args:
         cp (list of tuples): List of (x, y) coordinates representing a conformation.
+        lattice (Lattice, optional): Lattice of the conformation. Defaults to SQUARE.
     Returns:
         bool: True if the conformation is valid, False otherwise.
     """
@@ -85,6 +130,7 @@ def is_valid_conformation(cp):
         return False
     
     # Check connectivity of adjacent residues
+    is_adjacent = lattice.is_adjacent
     for i in range(1, n):
         if not is_adjacent(cp[i-1], cp[i]):
             return False
@@ -123,16 +169,196 @@ def E(c, hp_sequence):
 
 
 
-def is_adjacent(pos1, pos2):
+def energy_lower_bound(hp_sequence):
+    """
+    Calculates a provable lower bound on the energy of an HP sequence on the 2D square lattice.
+    The lattice is bipartite, so two residues can only be in contact if their indices have opposite parity.
+    Each H residue has at most 2 free neighbours for contacts (3 for the chain ends), hence the number of
+    H-H contacts is at most the smaller of the free-neighbour counts of the even and the odd H residues.
+    Args:
+        hp_sequence (str): String representing the HP sequence (Example: "HPPH").
+    Returns:
+        int: Lower bound on the energy (every conformation has an energy >= this value).
+    """
+    n = len(hp_sequence)
+    if n < 4:
+        return 0
+
+    # Count the free neighbours of H residues on even and odd indices
+    free_neighbours = [0, 0]
+    for i, residue in enumerate(hp_sequence):
+        if residue == 'H':
+            free_neighbours[i % 2] += 3 if i == 0 or i == n - 1 else 2
+
+    return -min(free_neighbours)
+
+
+
+def moved_residues(c_old, c_new):
+    """
+    Lists the residues whose position differs between two conformations of the same sequence.
+    Args:
+        c_old (list of tuples): Conformation before a move.
+        c_new (list of tuples): Conformation after the move.
+    Returns:
+        list: Indices of the moved residues.
+    """
+    return [i for i in range(len(c_new)) if c_old[i] != c_new[i]]
+
+
+
+def is_adjacent(pos1, pos2, lattice=SQUARE):
     """
-    Checks if two positions are adjacent on a 2D lattice.
+    Checks if two positions are adjacent on a lattice.
     Args:
         pos1 (tuple): First position as (x, y).
         pos2 (tuple): Second position as (x, y).
+        lattice (Lattice, optional): Lattice of the positions. Defaults to SQUARE.
     Returns:
         bool: True if the positions are adjacent, False otherwise.
     """
-    return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1]) == 1
+    return lattice.is_adjacent(pos1, pos2)
+
+
+def _hp_tokens(chunks):
+    """
+    Splits a compact HP notation into tokens in a single pass. Whitespace is ignored.
+    Args:
+        chunks (iterable of str): Text of the notation, possibly in several pieces (a str, or e.g. the lines of a file).
+    Yields:
+        tuple: (kind, value, position) with kind "residue", "number", "(", ")" and finally "end".
+    Raises:
+        ValueError: On a character that is not H, P, a digit, a parenthesis or whitespace.
+    """
+    position = 0
+    digits, start = [], 0
+    for chunk in chunks:
+        for char in chunk:
+            if '0' <= char <= '9':
+                if not digits:
+                    start = position
+                digits.append(char)
+            else:
+                if digits:
+                    yield "number", int(''.join(digits)), start
+                    digits = []
+                if char in ('H', 'P'):
+                    yield "residue", char, position
+                elif char in ('(', ')'):
+                    yield char, char, position
+                elif not char.isspace():
+                    raise ValueError(f"invalid character {char!r} at position {position}")
+            position += 1
+    if digits:
+        yield "number", int(''.join(digits)), start
+    yield "end", None, position
+
+
+
+class _HPParser:
+    """
+    Recursive-descent parser of the compact HP notation:
+        sequence := item*
+        item     := ("H" | "P" | "(" sequence ")") [number]
+    Items are (kind, payload, count, length) tuples: ("run", residue, count, length) or ("group", items, count, length).
+    """
+
+    def __init__(self, chunks):
+        self.tokens = _hp_tokens(chunks)
+        self.advance()
+
+    def advance(self):
+        self.kind, self.value, self.position = next(self.tokens)
+
+    def count(self):
+        """Reads the optional repeat count of an item (1 if absent)."""
+        if self.kind != "number":
+            return 1
+        count, position = self.value, self.position
+        if count == 0:
+            raise ValueError(f"repeat count must be positive at position {position}")
+        self.advance()
+        return count
+
+    def item(self):
+        if self.kind == "residue":
+            residue = self.value
+            self.advance()
+            count = self.count()
+            return "run", residue, count, count
+        if self.kind == "(":
+            opening = self.position
+            self.advance()
+            items = []
+            while self.kind not in (")", "end"):
+                items.append(self.item())
+            if self.kind == "end":
+                raise ValueError(f"unclosed '(' at position {opening}")
+            if not items:
+                raise ValueError(f"empty group at position {opening}")
+            self.advance()
+            count = self.count()
+            return "group", items, count, count * sum(item[3] for item in items)
+        if self.kind == ")":
+            raise ValueError(f"unmatched ')' at position {self.position}")
+        raise ValueError(f"repeat count without residue or group at position {self.position}")
+
+    def items(self):
+        """Yields the top-level items as soon as they are parsed."""
+        while self.kind != "end":
+            yield self.item()
+
+
+
+def _expand_item(item, chunk_size):
+    """Yields the expansion of a parsed item in pieces of at most about chunk_size residues."""
+    kind, payload, count, length = item
+    if kind == "run":
+        for start in range(0, count, chunk_size):
+            yield payload * min(chunk_size, count - start)
+    elif length // count <= chunk_size:
+        # Short group: expanded once, then repeated
+        unit = ''.join(piece for child in payload for piece in _expand_item(child, chunk_size))
+        repeat = max(1, chunk_size // len(unit))
+        for start in range(0, count, repeat):
+            yield unit * min(repeat, count - start)
+    else:
+        for _ in range(count):
+            for child in payload:
+                yield from _expand_item(child, chunk_size)
+
+
+
+def iter_hp_sequence(compact_notation, chunk_size=65536):
+    """
+    Expands a compact HP notation lazily, in time linear in the size of the input and of the output.
+    Top-level items are expanded as soon as they are read, so an input given as pieces (e.g. an open file)
+    is streamed, and the output never has to be held in memory.
+
+    Args:
+        compact_notation (str or iterable of str): Compact notation (e.g., "P2H(P2H2)2P5"), possibly nested
+            (e.g., "(H2(PH)3)4"), given as a string or as pieces of text.
+        chunk_size (int, optional): Approximate size of the yielded pieces. Defaults to 65536.
+
+    Yields:
+        str: Consecutive pieces of the expanded HP sequence.
+
+    Raises:
+        ValueError: If the notation is invalid (the message gives the position of the error).
+    """
+    if isinstance(compact_notation, str):
+        compact_notation = (compact_notation,)
+    buffer, size = [], 0
+    for item in _HPParser(compact_notation).items():
+        for piece in _expand_item(item, chunk_size):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
 
 
 def expand_hp_sequence(compact_notation):
@@ -140,54 +366,23 @@ def expand_hp_sequence(compact_notation):
     Expand a compact HP sequence notation into its full form.
 
     Args:
-        compact_notation (str): Compact notation of HP sequence (e.g., "P3H2P2H2P5H7P2H2P4H2P2HP2")
+        compact_notation (str): Compact notation of HP sequence (e.g., "P3H2P2H2P5H7P2H2P4H2P2HP2"), with
+            nested repeated groups (e.g., "(P(HP)2)3") and whitespace allowed.
 
     Returns:
         str: Expanded HP sequence
-    """
-    # First expand all (pattern)number notations
-    while True:
-        match = re.search(r'\(([^)]+)\)(\d+)', compact_notation)
-        if not match:
-            break
-        pattern = match.group(1)
-        repeat = int(match.group(2))
-        expanded_pattern = pattern * repeat
-        compact_notation = compact_notation.replace(match.group(0), expanded_pattern, 1)
-
-    # Then expand all Hnumber/Pnumber notations
-    expanded = []
-    i = 0
-    n = len(compact_notation)
-    while i < n:
-        if compact_notation[i] in ('H', 'P'):
-            # Check if there's a number following the H or P
-            j = i + 1
-            num_str = ''
-            while j < n and compact_notation[j].isdigit():
-                num_str += compact_notation[j]
-                j += 1
-
-            if num_str:
-                # Expand the notation (e.g., H3 becomes HHH)
-                count = int(num_str)
-                expanded.append(compact_notation[i] * count)
-                i = j
-            else:
-                # Single character, no number
-                expanded.append(compact_notation[i])
-                i += 1
-        else:
-            # Skip any non-H/P characters (shouldn't happen in valid input)
-            i += 1
 
-    return ''.join(expanded)
+    Raises:
+        ValueError: If the notation is invalid (the message gives the position of the error).
+    """
+    return ''.join(iter_hp_sequence(compact_notation))
 
 
 
 
 # ----- Others functions Tests -----
 if __name__ == "__main__":
+    from Grid import *  # Plotting is only needed by the tests
 
     test = "energy"    #  "linear_conformation"  # "energy"    # "linear_conformation"    #  "expanded"
 
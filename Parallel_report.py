@@ -0,0 +1,164 @@
+import argparse
+import pickle
+import statistics
+import time
+from Others_function import *
+from Monte_Carlo import REMCSimulation, REMC_paral, REMC_multi
+
+
+class ParallelReport:
+    """
+    Parallel-efficiency measurements of REMC_paral and REMC_multi.
+    For REMC_paral, one record per iteration: pool startup, pool.map wall time, per-replica compute time and
+    time blocked at the pool.map barrier, and the size and time of pickling the arguments and results.
+    For REMC_multi, one record per worker: process startup, compute time, result size and polling latency
+    (delay between the worker storing its result and the main loop seeing it).
+    """
+
+    def __init__(self):
+        self.iterations = []   # REMC_paral records
+        self.workers = []      # REMC_multi records
+
+    def add_iteration(self, iteration, pool_startup, map_wall, computes, args, results):
+        """
+        Records one REMC_paral iteration. Pickling sizes and times are measured here by pickling the
+        arguments and results again, so they only cost time when a report is requested.
+        Args:
+            iteration (int): Iteration number.
+            pool_startup (float): Time to create the process pool, in seconds.
+            map_wall (float): Wall time of pool.map, in seconds.
+            computes (list of float): Compute time of each replica, in seconds.
+            args (list): Arguments sent to the workers.
+            results (list): Results received from the workers.
+        """
+        start = time.perf_counter()
+        bytes_out = sum(len(pickle.dumps(a)) for a in args)
+        bytes_in = sum(len(pickle.dumps(r)) for r in results)
+        pickle_time = time.perf_counter() - start
+        self.iterations.append({
+            "iteration": iteration, "pool_startup": pool_startup, "map_wall": map_wall,
+            "workers": [{"replica": k, "compute": compute, "barrier": max(map_wall - compute, 0.0)}
+                        for k, compute in enumerate(computes)],
+            "bytes_out": bytes_out, "bytes_in": bytes_in, "pickle_time": pickle_time,
+        })
+
+    def add_worker(self, index, launch, timing, detected, result):
+        """
+        Records one REMC_multi worker.
+        Args:
+            index (int): Worker index.
+            launch (float): Time (time.time()) at which the process was started.
+            timing (dict): {"begin", "end"} times (time.time()) measured in the worker.
+            detected (float): Time at which the main loop read the result.
+            result (tuple): Result stored by the worker.
+        """
+        start = time.perf_counter()
+        size = len(pickle.dumps(result))
+        self.workers.append({
+            "worker": index, "startup": timing["begin"] - launch, "compute": timing["end"] - timing["begin"],
+            "poll_latency": detected - timing["end"], "bytes": size, "pickle_time": time.perf_counter() - start,
+        })
+
+    def summary(self):
+        """
+        Aggregates the records.
+        Returns:
+            dict: Mean times and fractions for REMC_paral ("paral") and REMC_multi ("multi").
+        """
+        summary = {}
+        if self.iterations:
+            computes = [w["compute"] for it in self.iterations for w in it["workers"]]
+            barriers = [w["barrier"] for it in self.iterations for w in it["workers"]]
+            iteration_wall = sum(it["pool_startup"] + it["map_wall"] for it in self.iterations)
+            summary["paral"] = {
+                "iterations": len(self.iterations),
+                "pool_startup_mean": statistics.mean(it["pool_startup"] for it in self.iterations),
+                "map_wall_mean": statistics.mean(it["map_wall"] for it in self.iterations),
+                "compute_mean": statistics.mean(computes),
+                "barrier_mean": statistics.mean(barriers),
+                "load_imbalance": max(computes) / statistics.mean(computes) if statistics.mean(computes) > 0 else 1.0,
+                "startup_fraction": sum(it["pool_startup"] for it in self.iterations) / iteration_wall,
+                "bytes_per_iteration": statistics.mean(it["bytes_out"] + it["bytes_in"] for it in self.iterations),
+                "pickle_time_per_iteration": statistics.mean(it["pickle_time"] for it in self.iterations),
+            }
+        if self.workers:
+            summary["multi"] = {
+                "workers": len(self.workers),
+                "startup_mean": statistics.mean(w["startup"] for w in self.workers),
+                "compute_mean": statistics.mean(w["compute"] for w in self.workers),
+                "poll_latency_mean": statistics.mean(w["poll_latency"] for w in self.workers),
+                "bytes_mean": statistics.mean(w["bytes"] for w in self.workers),
+            }
+        return summary
+
+    def print_report(self):
+        """Prints the per-iteration / per-worker records and the summary."""
+        for it in self.iterations:
+            workers = " ".join(f"{w['compute']:.3f}/{w['barrier']:.3f}" for w in it["workers"])
+            print(f"iteration {it['iteration']:4d}: startup {it['pool_startup']:.3f} s, map {it['map_wall']:.3f} s, "
+                  f"IPC {it['bytes_out'] + it['bytes_in']} B, compute/barrier per replica: {workers}")
+        for w in self.workers:
+            print(f"worker {w['worker']:3d}: startup {w['startup']:.3f} s, compute {w['compute']:.3f} s, "
+                  f"poll latency {w['poll_latency']:.3f} s, result {w['bytes']} B")
+        for name, values in self.summary().items():
+            print(f"{name}: " + ", ".join(f"{key} {value:.4g}" for key, value in values.items()))
+
+
+
+def speedup_table(hp, cores, phi=500, nu=0.5, T_init=160, T_final=220, chi=5, iterations=20):
+    """
+    Measures the speedup and efficiency of REMC_paral and REMC_multi against the serial REMCSimulation.
+    All runs do a fixed number of iterations (the target energy is unreachable). REMC_paral does the same
+    work as the serial run; REMC_multi runs `cores` independent simulations, so its speedup is measured
+    on throughput (cores serial runs).
+    Args:
+        hp (str): HP sequence.
+        cores (int): Number of cores (pool size of REMC_paral, number of processes of REMC_multi).
+        phi, nu, T_init, T_final, chi: See REMCSimulation.
+        iterations (int, optional): Number of REMC iterations of each run. Defaults to 20.
+    Returns:
+        list: Rows {"engine", "wall", "speedup", "efficiency", "report"} (report is the ParallelReport summary).
+    """
+    params = {"phi": phi, "nu": nu, "T_init": T_init, "T_final": T_final, "chi": chi}
+    unreachable = float('-inf')
+
+    start = time.time()
+    REMCSimulation(hp, unreachable, max_iterations=iterations, timeout=float('inf'), **params)
+    serial = time.time() - start
+    rows = [{"engine": "REMCSimulation", "wall": serial, "speedup": 1.0, "efficiency": 1.0, "report": {}}]
+
+    report = ParallelReport()
+    start = time.time()
+    REMC_paral(hp, unreachable, max_iterations=iterations, timeout=float('inf'), processes=cores, report=report, **params)
+    wall = time.time() - start
+    rows.append({"engine": "REMC_paral", "wall": wall, "speedup": serial / wall,
+                 "efficiency": serial / wall / cores, "report": report.summary()})
+
+    report = ParallelReport()
+    start = time.time()
+    REMC_multi(hp, unreachable, max_iteration=iterations, nb_processus=cores, timeout=float('inf'), report=report, **params)
+    wall = time.time() - start
+    rows.append({"engine": "REMC_multi", "wall": wall, "speedup": cores * serial / wall,
+                 "efficiency": serial / wall, "report": report.summary()})
+    return rows
+
+
+
+# ----- Parallel efficiency report -----
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Speedup and efficiency of the multiprocessing REMC drivers.")
+    parser.add_argument("--hp", default="PPPHHPPHHPPPPPHHHHHHHPPHHPPPPHHPPHPP", help="HP sequence (compact notation accepted)")
+    parser.add_argument("--cores", type=int, nargs="+", default=[2, 4], help="Core counts to measure")
+    parser.add_argument("--phi", type=int, default=500, help="Iterations in Monte Carlo search")
+    parser.add_argument("--chi", type=int, default=5, help="Number of replicas")
+    parser.add_argument("--iterations", type=int, default=20, help="REMC iterations of each run")
+    args = parser.parse_args()
+
+    hp = expand_hp_sequence(args.hp)
+    print(f"{'cores':>5s} {'engine':15s} {'wall (s)':>9s} {'speedup':>8s} {'efficiency':>10s}")
+    for cores in args.cores:
+        for row in speedup_table(hp, cores, phi=args.phi, chi=args.chi, iterations=args.iterations):
+            print(f"{cores:5d} {row['engine']:15s} {row['wall']:9.2f} {row['speedup']:8.2f} {row['efficiency']:10.2f}")
+            for name, values in row["report"].items():
+                print("      " + ", ".join(f"{key} {value:.4g}" for key, value in values.items()))
@@ -0,0 +1,149 @@
+import time
+import tracemalloc
+
+
+class Profiler:
+    """
+    Opt-in instrumentation of the Monte Carlo hot path.
+    Collects, per move type, the number of proposed, possible and accepted moves, the cumulative time spent
+    copying conformations, generating moves and evaluating energies, and optionally the tracemalloc peak.
+    Engines only call it when a profiler is given, so the overhead is a None check when disabled.
+    Profilers of different worker processes can be combined with merge().
+    """
+
+    CATEGORIES = ("copy", "move", "energy")
+
+    def __init__(self, trace_memory=False, verbose=False):
+        """
+        Args:
+            trace_memory (bool, optional): If True, tracks allocation peaks with tracemalloc (slower). Defaults to False.
+            verbose (bool, optional): If True, prints a summary line at the end of each REMC iteration. Defaults to False.
+        """
+        self.trace_memory = trace_memory
+        self.verbose = verbose
+        self.moves = {}                                   # {move: {"proposed", "possible", "accepted"}}
+        self.times = {category: 0.0 for category in self.CATEGORIES}
+        self.steps = 0
+        self.peak_memory = 0                              # Bytes
+        self.iterations = []                              # Per REMC iteration summaries
+        self.last_move = None                             # Move type of the last possible move
+        self._last_lap = 0.0
+        self._started_tracemalloc = False
+        self._iteration_start = None
+
+    def start(self):
+        """Starts tracemalloc if memory tracking is enabled."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._iteration_start = self._snapshot()
+
+    def stop(self):
+        """Records the memory peak and stops tracemalloc if it was started by this profiler."""
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+    def lap(self, category=None):
+        """
+        Adds the time elapsed since the previous lap to a category (or only restarts the clock if category is None).
+        Args:
+            category (str, optional): One of CATEGORIES. Defaults to None.
+        """
+        now = time.perf_counter()
+        if category is not None:
+            self.times[category] += now - self._last_lap
+        else:
+            self.steps += 1
+        self._last_lap = now
+
+    def move(self, name, possible):
+        """
+        Records a proposed move.
+        Args:
+            name (str): Move type (e.g. "end", "corner", "crankshaft", "pull").
+            possible (bool): True if the move could be applied.
+        """
+        counters = self.moves.get(name)
+        if counters is None:
+            counters = self.moves[name] = {"proposed": 0, "possible": 0, "accepted": 0}
+        counters["proposed"] += 1
+        if possible:
+            counters["possible"] += 1
+            self.last_move = name
+        else:
+            self.last_move = None
+
+    def accept(self):
+        """Records the acceptance of the last possible move by the Metropolis criterion."""
+        if self.last_move is not None:
+            self.moves[self.last_move]["accepted"] += 1
+            self.last_move = None
+
+    def _snapshot(self):
+        return {"steps": self.steps, "times": dict(self.times),
+                "moves": {name: dict(counters) for name, counters in self.moves.items()}}
+
+    def end_iteration(self, iteration):
+        """
+        Stores (and prints if verbose) the counters and times of the REMC iteration that just ended.
+        Args:
+            iteration (int): Iteration number.
+        """
+        current = self._snapshot()
+        previous = self._iteration_start or {"steps": 0, "times": {c: 0.0 for c in self.CATEGORIES}, "moves": {}}
+        record = {"iteration": iteration, "steps": current["steps"] - previous["steps"],
+                  "times": {c: current["times"][c] - previous["times"][c] for c in self.CATEGORIES},
+                  "accepted": sum(m["accepted"] for m in current["moves"].values())
+                  - sum(m["accepted"] for m in previous["moves"].values())}
+        if self.trace_memory and tracemalloc.is_tracing():
+            record["peak_memory"] = tracemalloc.get_traced_memory()[1]
+            self.peak_memory = max(self.peak_memory, record["peak_memory"])
+            tracemalloc.reset_peak()
+        self.iterations.append(record)
+        self._iteration_start = current
+
+        if self.verbose:
+            times = ", ".join(f"{c} {record['times'][c]:.3f} s" for c in self.CATEGORIES)
+            print(f"[profile] iteration {iteration}: {record['steps']} steps, {record['accepted']} accepted, {times}")
+
+    def merge(self, other):
+        """
+        Adds the counters and times of another profiler (e.g. from a worker process) to this one.
+        Args:
+            other (Profiler): Profiler to merge.
+        Returns:
+            Profiler: self
+        """
+        for name, counters in other.moves.items():
+            mine = self.moves.setdefault(name, {"proposed": 0, "possible": 0, "accepted": 0})
+            for key in mine:
+                mine[key] += counters[key]
+        for category in self.CATEGORIES:
+            self.times[category] += other.times[category]
+        self.steps += other.steps
+        self.peak_memory = max(self.peak_memory, other.peak_memory)
+        return self
+
+    def report(self):
+        """
+        Builds a text summary of the run.
+        Returns:
+            str: Summary with the move counters, the time split and the memory peak.
+        """
+        lines = [f"{'move':12s} {'proposed':>10s} {'possible':>10s} {'accepted':>10s} {'acc. rate':>10s}"]
+        for name, counters in sorted(self.moves.items()):
+            rate = counters["accepted"] / counters["proposed"] if counters["proposed"] else 0
+            lines.append(f"{name:12s} {counters['proposed']:10d} {counters['possible']:10d} "
+                         f"{counters['accepted']:10d} {rate:10.3f}")
+        total = sum(self.times.values())
+        for category in self.CATEGORIES:
+            share = self.times[category] / total if total else 0
+            lines.append(f"{category:12s} {self.times[category]:10.3f} s {100 * share:5.1f} %")
+        if self.steps:
+            lines.append(f"{'steps':12s} {self.steps:10d} ({1e6 * total / self.steps:.1f} us per step)")
+        if self.trace_memory:
+            lines.append(f"{'peak memory':12s} {self.peak_memory / 1024:10.1f} KiB")
+        return "\n".join(lines)
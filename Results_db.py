@@ -0,0 +1,106 @@
+import json
+import sqlite3
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    hp TEXT NOT NULL,
+    params_key TEXT NOT NULL,
+    energy REAL NOT NULL,
+    conformation TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    params TEXT NOT NULL,
+    wall REAL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_best ON results (hp, energy);
+CREATE INDEX IF NOT EXISTS results_params ON results (hp, params_key, energy);
+"""
+
+
+
+def params_key(params):
+    """Returns the canonical text form of a parameters dict (sorted JSON), used to look results up by parameters."""
+    return json.dumps(params or {}, sort_keys=True, separators=(",", ":"))
+
+
+
+class ResultsDB:
+    """
+    Local SQLite store of folding results, keyed by HP sequence (and optionally by parameters).
+    Each run records its best energy, conformation, engine, parameters and wall time, and later runs
+    on the same sequence can start from the best stored conformation (see the db argument of the engines).
+    """
+
+    def __init__(self, path="results.sqlite"):
+        """
+        Args:
+            path (str, optional): Path of the database file (":memory:" for a temporary one). Defaults to "results.sqlite".
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.executescript(SCHEMA)
+
+    def record(self, hp, conformation, energy, engine, params=None, wall=None):
+        """
+        Stores the result of a run.
+        Args:
+            hp (str): HP sequence.
+            conformation (list of tuples): Best conformation found.
+            energy (float): Its energy.
+            engine (str): Name of the search function.
+            params (dict, optional): Parameters of the run. Defaults to None.
+            wall (float, optional): Wall time of the run, in seconds. Defaults to None.
+        """
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO results (hp, params_key, energy, conformation, engine, params, wall, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (hp, params_key(params), energy, json.dumps([list(p) for p in conformation]), engine,
+                 json.dumps(params or {}), wall, time.time()))
+
+    def best(self, hp, params=None):
+        """
+        Returns the best stored result of a sequence.
+        Args:
+            hp (str): HP sequence.
+            params (dict, optional): Only considers the runs with exactly these parameters. Defaults to all runs.
+        Returns:
+            tuple: (conformation, energy), or None if the sequence was never folded.
+        """
+        if params is None:
+            row = self.connection.execute(
+                "SELECT conformation, energy FROM results WHERE hp = ? ORDER BY energy, created LIMIT 1", (hp,)).fetchone()
+        else:
+            row = self.connection.execute(
+                "SELECT conformation, energy FROM results WHERE hp = ? AND params_key = ? ORDER BY energy, created LIMIT 1",
+                (hp, params_key(params))).fetchone()
+        if row is None:
+            return None
+        energy = row[1]
+        return [tuple(p) for p in json.loads(row[0])], int(energy) if energy == int(energy) else energy
+
+    def history(self, hp):
+        """
+        Returns all the stored runs of a sequence, best first.
+        Args:
+            hp (str): HP sequence.
+        Returns:
+            list: Dicts with the energy, engine, parameters, wall time and date of each run.
+        """
+        rows = self.connection.execute(
+            "SELECT energy, engine, params, wall, created FROM results WHERE hp = ? ORDER BY energy, created", (hp,))
+        return [{"energy": energy, "engine": engine, "params": json.loads(params), "wall": wall, "created": created}
+                for energy, engine, params, wall, created in rows]
+
+    def close(self):
+        """Closes the database."""
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,599 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import http.client
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from Others_function import *
+from EnergyModel import EnergyModel
+from Monte_Carlo import MCsearch, REMCSimulation
+from Results_db import ResultsDB, params_key
+from Telemetry import TelemetryClient
+
+
+# Local folding service: jobs are submitted over HTTP (on localhost or a Unix socket), queued by priority and run by a
+# persistent pool of worker processes, one dispatcher per worker so that the priority order holds. Progress comes back
+# from the workers as telemetry records and is streamed to the clients; results are cached in the results database.
+ENGINES = {"REMCSimulation": ["phi", "nu", "T_init", "T_final", "chi"], "MCsearch": ["phi", "nu", "T"]}  # Serial engines
+FINISHED = ("done", "cancelled", "failed")
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+HISTORY = 256   # Progress records kept per job for the clients that subscribe late
+RETENTION = 3600        # Finished jobs are forgotten after this time (in seconds)...
+MAX_FINISHED = 1000     # ... or when there are more of them than this (the oldest first)
+MAX_BUDGET = 3600       # Longest time budget of a job (in seconds), so that no job holds a shared worker for ever
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+_stop_flags = None  # Shared stop flags of the running jobs, one per dispatcher (set in the workers by _init_worker)
+
+
+
+class StopFlag:
+    """
+    Cancellation flag of a running job, with the is_set() / set() interface of an Event. The flag is a byte of
+    shared memory, so that the engines can check it in their inner loop without an IPC round trip.
+    """
+
+    def __init__(self, flags, slot):
+        self.flags = flags
+        self.slot = slot
+
+    def is_set(self):
+        return self.flags[self.slot] != 0
+
+    def set(self):
+        self.flags[self.slot] = 1
+
+    def clear(self):
+        self.flags[self.slot] = 0
+
+
+
+def _init_worker(flags):
+    """Initializer of the worker processes: keeps the shared stop flags."""
+    global _stop_flags
+    _stop_flags = flags
+
+
+
+def fold(job_id, hp, engine, params, budget, seed, progress, slot):
+    """
+    Folds one sequence (in a worker process of the server, with the engine prints silenced).
+    Args:
+        job_id (int): Job number, added to the telemetry records.
+        hp (str): HP sequence.
+        engine (str): One of ENGINES.
+        params (dict): Engine parameters.
+        budget (float): Time budget, in seconds.
+        seed (int): Seed of the random module.
+        progress (Queue): Receives the telemetry records of the run.
+        slot (int): Stop flag of the job in the shared flags: cancels the run when set (the best conformation
+            found so far is returned).
+    Returns:
+        dict: Energy, conformation, wall time and whether the run was cancelled.
+    """
+    stop_event = StopFlag(_stop_flags, slot)
+    random.seed(seed)
+    telemetry = TelemetryClient(progress, job_id, min_interval=0.5)
+    start = time.time()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if engine == "MCsearch":
+            conformation, energy = MCsearch(hp, phi=params.get("phi", 10**9), nu=params.get("nu", 0.5),
+                                            T=params.get("T", 160), timeout=budget, telemetry=telemetry,
+                                            stop_event=stop_event)
+        else:
+            conformation, energy = REMCSimulation(hp, timeout=budget, max_iterations=10**9, telemetry=telemetry,
+                                                  stop_event=stop_event, **params)
+    return {"energy": energy, "conformation": [list(p) for p in conformation], "wall": time.time() - start,
+            "cancelled": stop_event.is_set()}
+
+
+
+class Job:
+    """Folding job of the server: request, state, progress history and result."""
+
+    def __init__(self, job_id, hp, engine, params, budget, priority, seed):
+        self.id = job_id
+        self.hp = hp
+        self.engine = engine
+        self.params = params
+        self.budget = budget
+        self.priority = priority
+        self.seed = seed
+        self.status = "queued"
+        self.cached = False
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.stop_event = None
+        self.events = collections.deque(maxlen=HISTORY)  # Progress records
+        self.subscribers = set()                         # asyncio queues of the streaming clients
+
+    def cache_params(self):
+        """Returns the parameters identifying the job in the cache (the seed is not part of them)."""
+        return dict(self.params, engine=self.engine, budget=self.budget)
+
+    def summary(self):
+        """Returns the state of the job as a JSON-serialisable dict."""
+        return {"id": self.id, "hp": self.hp, "length": len(self.hp), "engine": self.engine, "params": self.params,
+                "budget": self.budget, "priority": self.priority, "seed": self.seed, "status": self.status,
+                "cached": self.cached, "submitted": self.submitted, "started": self.started,
+                "finished": self.finished, "progress": self.events[-1] if self.events else None,
+                "result": self.result, "error": self.error}
+
+
+
+class JobServer:
+    """
+    Asyncio job server: accepts folding jobs over HTTP, queues them by priority (higher first), runs them on a
+    persistent ProcessPoolExecutor, streams their progress and supports cancellation.
+    A job identical to a queued or running one (same sequence, engine, parameters and budget) is attached to it,
+    and a job already solved is answered from the results database: with the same parameters, or by any stored
+    result reaching the lower bound of the energy.
+
+    HTTP API (JSON bodies and responses):
+        POST /jobs                {"hp", "engine", "params", "budget", "priority", "seed", "refresh"} -> job
+        GET /jobs                 -> list of jobs
+        GET /jobs/<id>            -> job
+        GET /jobs/<id>/events     -> stream of progress records (JSON lines), ending with the final job
+        DELETE /jobs/<id>         -> cancels the job (the best conformation found so far is kept)
+    """
+
+    def __init__(self, workers=None, db_path="results.sqlite", default_budget=60, retention=RETENTION,
+                 max_finished=MAX_FINISHED, max_budget=MAX_BUDGET):
+        """
+        Args:
+            workers (int, optional): Worker processes (jobs run at the same time). Defaults to the number of cores.
+            db_path (str, optional): Results database used as the cache. Defaults to "results.sqlite".
+            default_budget (float, optional): Time budget of the jobs that do not give one, in seconds. Defaults to 60.
+            retention (float, optional): Time finished jobs are kept, in seconds. Defaults to RETENTION.
+            max_finished (int, optional): Maximum number of finished jobs kept (the oldest are forgotten first).
+                Defaults to MAX_FINISHED.
+            max_budget (float, optional): Longest time budget of a job, in seconds (longer budgets are capped).
+                Defaults to MAX_BUDGET.
+        """
+        self.workers = workers or os.cpu_count()
+        self.db_path = db_path
+        self.default_budget = default_budget
+        self.retention = retention
+        self.max_finished = max_finished
+        self.max_budget = max_budget
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.order = itertools.count()  # Submission order, to keep equal priorities first in first out
+        self.pending = None
+        self.pool = None
+        self.manager = None
+        self.progress = None
+        self.stop_flags = None
+        self.finished = collections.deque()  # Ids of the finished jobs, in finishing order
+        self.db = None
+        self._server = None
+        self._dispatchers = []
+        self._listener = None
+        self._loop = None
+        self.address = None
+
+    async def start(self, address=DEFAULT_ADDRESS):
+        """
+        Starts the worker pool, the dispatchers and the HTTP listener.
+        Args:
+            address (str, optional): "host:port" (localhost), or "unix:/path/to/socket". Defaults to DEFAULT_ADDRESS.
+        """
+        self._loop = asyncio.get_running_loop()
+        self.pending = asyncio.PriorityQueue()
+        self.db = ResultsDB(self.db_path)
+        self.manager = multiprocessing.Manager()
+        self.progress = self.manager.Queue()
+        self.stop_flags = multiprocessing.RawArray("b", self.workers)
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                           initargs=(self.stop_flags,))
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+        self._dispatchers = [asyncio.create_task(self._dispatch(slot)) for slot in range(self.workers)]
+        if address.startswith("unix:"):
+            path = address[len("unix:"):]
+            if os.path.exists(path):
+                os.unlink(path)  # Socket left by a previous server
+            self._server = await asyncio.start_unix_server(self._handle, path)
+        else:
+            host, port = address.rsplit(":", 1)
+            self._server = await asyncio.start_server(self._handle, host, int(port))
+        self.address = address
+
+    async def close(self):
+        """Stops accepting requests, cancels the running jobs and shuts the worker pool down."""
+        self._server.close()
+        await self._server.wait_closed()
+        for job in list(self.jobs.values()):
+            if job.status in ("queued", "running"):
+                self.cancel(job.id)
+        while any(job.status == "running" for job in self.jobs.values()):
+            await asyncio.sleep(0.05)
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self.pool.shutdown()
+        self.progress.put(None)
+        self._listener.join()
+        self.manager.shutdown()
+        self.db.close()
+        if self.address.startswith("unix:"):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.address[len("unix:"):])
+
+    def submit(self, request):
+        """
+        Queues a folding job, or answers it from a live identical job or from the cache.
+        Args:
+            request (dict): "hp" (compact notation accepted), and optionally "engine" (default REMCSimulation),
+                "params" (engine parameters), "budget" (seconds, capped at max_budget), "priority" (higher first, default 0), "seed",
+                and "refresh" (true to bypass the cache).
+        Returns:
+            Job: The new job, or the identical job already queued or running (a queued job takes the priority
+                of the new request if it is higher).
+        Raises:
+            ValueError: If the request is invalid.
+        """
+        if not isinstance(request, dict) or "hp" not in request:
+            raise ValueError("a job needs an HP sequence (hp)")
+        hp = expand_hp_sequence(request["hp"])
+        if not hp:
+            raise ValueError("empty HP sequence")
+        engine = request.get("engine", "REMCSimulation")
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine {engine} (choose from {', '.join(ENGINES)})")
+        params = dict(request.get("params") or {})
+        unknown = set(params) - set(ENGINES[engine])
+        if unknown:
+            raise ValueError(f"unknown parameters for {engine}: {', '.join(sorted(unknown))}")
+        budget = float(request.get("budget", self.default_budget))
+        if not math.isfinite(budget) or budget <= 0:
+            raise ValueError(f"the budget must be a positive number of seconds, not {request.get('budget')}")
+        budget = min(budget, self.max_budget)
+        seed = request.get("seed")
+        job = Job(next(self.ids), hp, engine, params, budget, int(request.get("priority", 0)),
+                  int(seed) if seed is not None else random.getrandbits(32))
+
+        if not request.get("refresh"):
+            key = params_key(job.cache_params())
+            for other in self.jobs.values():
+                if other.status in ("queued", "running") and other.hp == hp and params_key(other.cache_params()) == key:
+                    if other.status == "queued" and job.priority > other.priority:
+                        # Queued again at the higher priority, the old entry of the queue is skipped by _dispatch
+                        other.priority = job.priority
+                        self.pending.put_nowait((-other.priority, next(self.order), other.id))
+                    return other
+            stored = self.db.best(hp, job.cache_params())
+            if stored is None:
+                best = self.db.best(hp)
+                if best is not None and best[1] <= EnergyModel(hp).lower_bound():
+                    stored = best  # Proven optimal, whatever the parameters
+            if stored is not None:
+                conformation, energy = stored
+                job.cached = True
+                job.status = "done"
+                job.started = job.finished = time.time()
+                job.result = {"energy": energy, "conformation": [list(p) for p in conformation], "wall": 0.0,
+                              "cancelled": False}
+                self.jobs[job.id] = job
+                self._finish(job)
+                return job
+
+        self.jobs[job.id] = job
+        self.pending.put_nowait((-job.priority, next(self.order), job.id))
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancels a job: a queued job is dropped, a running one stops at its next check and keeps its best conformation.
+        Args:
+            job_id (int): Job number.
+        Returns:
+            Job: The job.
+        Raises:
+            KeyError: If the job does not exist.
+        """
+        job = self.jobs[job_id]
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.finished = time.time()
+            self._finish(job)
+        elif job.status == "running" and job.stop_event is not None:
+            job.stop_event.set()
+        return job
+
+    async def _dispatch(self, slot):
+        """
+        Runs the queued jobs one at a time on the pool, highest priority first.
+        Args:
+            slot (int): Stop flag of the jobs of this dispatcher in the shared flags.
+        """
+        while True:
+            priority, _, job_id = await self.pending.get()
+            job = self.jobs.get(job_id)
+            if job is None or job.status != "queued" or -priority != job.priority:
+                continue  # Cancelled while queued, or queued again at a higher priority
+            job.status = "running"
+            job.started = time.time()
+            job.stop_event = StopFlag(self.stop_flags, slot)
+            job.stop_event.clear()
+            try:
+                job.result = await self._loop.run_in_executor(self.pool, fold, job.id, job.hp, job.engine, job.params,
+                                                              job.budget, job.seed, self.progress, slot)
+            except Exception as error:
+                job.status = "failed"
+                job.error = f"{type(error).__name__}: {error}"
+            else:
+                job.status = "cancelled" if job.result["cancelled"] else "done"
+                if job.status == "done":
+                    self.db.record(job.hp, job.result["conformation"], job.result["energy"], job.engine,
+                                   job.cache_params(), job.result["wall"])
+            job.finished = time.time()
+            self._finish(job)
+
+    def _listen(self):
+        """Moves the telemetry records of the workers to the event loop (in a thread)."""
+        while True:
+            try:
+                record = self.progress.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if record is None:
+                return
+            self._loop.call_soon_threadsafe(self._publish, record)
+
+    def _publish(self, record):
+        """Adds a progress record to the history of its job and sends it to the streaming clients."""
+        job = self.jobs.get(record.get("worker"))
+        if job is None:
+            return
+        job.events.append(record)
+        for subscriber in job.subscribers:
+            subscriber.put_nowait(record)
+
+    def _finish(self, job):
+        """Sends the final state of a job to the streaming clients, closes their streams and forgets old jobs."""
+        for subscriber in job.subscribers:
+            subscriber.put_nowait({"type": "job", **job.summary()})
+            subscriber.put_nowait(None)
+        job.subscribers.clear()
+        job.stop_event = None
+        self.finished.append(job.id)
+        self._prune()
+
+    def _prune(self):
+        """Forgets the finished jobs older than the retention time, and the oldest ones above max_finished."""
+        deadline = time.time() - self.retention
+        while self.finished and (len(self.finished) > self.max_finished
+                                 or self.jobs[self.finished[0]].finished < deadline):
+            del self.jobs[self.finished.popleft()]
+
+    async def _handle(self, reader, writer):
+        """Serves one HTTP request."""
+        try:
+            method, path, _ = (await reader.readline()).decode().split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            parts = path.strip("/").split("/")
+            if parts[0] != "jobs" or len(parts) > 3:
+                raise KeyError(path)
+            if len(parts) == 3 and parts[2] == "events" and method == "GET":
+                await self._stream(self.jobs[int(parts[1])], writer)
+                return
+            if len(parts) == 1 and method == "POST":
+                code, payload = 201, self.submit(json.loads(body or b"{}")).summary()
+            elif len(parts) == 1 and method == "GET":
+                code, payload = 200, [job.summary() for job in self.jobs.values()]
+            elif len(parts) == 2 and method == "GET":
+                code, payload = 200, self.jobs[int(parts[1])].summary()
+            elif len(parts) == 2 and method == "DELETE":
+                code, payload = 200, self.cancel(int(parts[1])).summary()
+            else:
+                code, payload = 405, {"error": f"{method} {path} is not supported"}
+        except KeyError:
+            code, payload = 404, {"error": f"not found: {path}"}
+        except (ValueError, TypeError) as error:  # Including invalid JSON and invalid sequences
+            code, payload = 400, {"error": str(error)}
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+
+        data = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {code} {REASONS[code]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        with contextlib.suppress(ConnectionError):
+            await writer.drain()
+        writer.close()
+
+    async def _stream(self, job, writer):
+        """Streams the progress of a job as JSON lines until it finishes (or the client disconnects)."""
+        subscriber = asyncio.Queue()
+        for record in job.events:
+            subscriber.put_nowait(record)
+        if job.status in FINISHED:
+            subscriber.put_nowait({"type": "job", **job.summary()})
+            subscriber.put_nowait(None)
+        else:
+            job.subscribers.add(subscriber)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n")
+        try:
+            while (record := await subscriber.get()) is not None:
+                writer.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            job.subscribers.discard(subscriber)
+            writer.close()
+
+
+
+async def serve(address=DEFAULT_ADDRESS, workers=None, db_path="results.sqlite", default_budget=60,
+                retention=RETENTION, max_finished=MAX_FINISHED, max_budget=MAX_BUDGET):
+    """
+    Runs a job server until SIGINT or SIGTERM.
+    Args:
+        address, workers, db_path, default_budget, retention, max_finished, max_budget: See JobServer and
+            JobServer.start.
+    """
+    server = JobServer(workers, db_path, default_budget, retention, max_finished, max_budget)
+    await server.start(address)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"Job server on {address} with {server.workers} workers (results database {db_path})", file=sys.stderr)
+    await stop.wait()
+    await server.close()
+
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix socket."""
+
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+
+def _connect(address, timeout=None):
+    if address.startswith("unix:"):
+        return _UnixHTTPConnection(address[len("unix:"):], timeout)
+    host, port = address.rsplit(":", 1)
+    return http.client.HTTPConnection(host, int(port), timeout=timeout)
+
+
+
+def request(address, method, path, body=None, timeout=30):
+    """
+    Sends a request to a job server.
+    Args:
+        address (str): Address of the server ("host:port" or "unix:/path/to/socket").
+        method (str): HTTP method.
+        path (str): Path (e.g. "/jobs" or "/jobs/3").
+        body (dict, optional): JSON body. Defaults to None.
+        timeout (float, optional): Socket timeout, in seconds. Defaults to 30.
+    Returns:
+        dict or list: JSON response.
+    Raises:
+        RuntimeError: If the server answers with an error.
+    """
+    connection = _connect(address, timeout)
+    try:
+        data = json.dumps(body).encode() if body is not None else None
+        connection.request(method, path, body=data, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        payload = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status >= 400:
+        raise RuntimeError(f"{response.status} {payload.get('error')}")
+    return payload
+
+
+
+def watch(address, job_id):
+    """
+    Streams the progress records of a job until it finishes.
+    Args:
+        address (str): Address of the server.
+        job_id (int): Job number.
+    Yields:
+        dict: Progress records, the last one being the final job (type "job").
+    """
+    connection = _connect(address)
+    try:
+        connection.request("GET", f"/jobs/{job_id}/events")
+        response = connection.getresponse()
+        if response.status >= 400:
+            raise RuntimeError(f"{response.status} {json.loads(response.read()).get('error')}")
+        for line in response:
+            yield json.loads(line)
+    finally:
+        connection.close()
+
+
+
+# ----- Job server -----
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Local folding job server and its client.")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="host:port or unix:/path/to/socket")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Runs the server")
+    serve_parser.add_argument("--workers", type=int, help="Worker processes (default: number of cores)")
+    serve_parser.add_argument("--db", default="results.sqlite", help="Results database used as the cache")
+    serve_parser.add_argument("--budget", type=float, default=60, help="Default time budget of a job (s)")
+    serve_parser.add_argument("--max-budget", type=float, default=MAX_BUDGET, help="Longest time budget of a job (s)")
+    serve_parser.add_argument("--retention", type=float, default=RETENTION, help="Time finished jobs are kept (s)")
+    serve_parser.add_argument("--max-finished", type=int, default=MAX_FINISHED, help="Maximum number of finished jobs kept")
+    submit_parser = commands.add_parser("submit", help="Submits a job")
+    submit_parser.add_argument("hp", help="HP sequence (compact notation accepted)")
+    submit_parser.add_argument("--engine", default="REMCSimulation", choices=list(ENGINES), help="Search function")
+    submit_parser.add_argument("--budget", type=float, help="Time budget (s)")
+    submit_parser.add_argument("--priority", type=int, default=0, help="Priority (higher first)")
+    submit_parser.add_argument("--seed", type=int, help="Seed of the run")
+    submit_parser.add_argument("--params", default="{}", help='Engine parameters as JSON (e.g. \'{"phi": 500}\')')
+    submit_parser.add_argument("--refresh", action="store_true", help="Runs the job even if the result is cached")
+    submit_parser.add_argument("--watch", action="store_true", help="Prints the progress until the job finishes")
+    status_parser = commands.add_parser("status", help="Prints a job, or all the jobs")
+    status_parser.add_argument("job", type=int, nargs="?", help="Job number")
+    cancel_parser = commands.add_parser("cancel", help="Cancels a job")
+    cancel_parser.add_argument("job", type=int, help="Job number")
+    watch_parser = commands.add_parser("watch", help="Prints the progress of a job until it finishes")
+    watch_parser.add_argument("job", type=int, help="Job number")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        asyncio.run(serve(args.address, args.workers, args.db, args.budget, args.retention, args.max_finished,
+                          args.max_budget))
+        sys.exit()
+
+    try:
+        if args.command == "submit":
+            body = {"hp": args.hp, "engine": args.engine, "priority": args.priority, "params": json.loads(args.params),
+                    "refresh": args.refresh}
+            body.update({key: value for key, value in (("budget", args.budget), ("seed", args.seed)) if value is not None})
+            job = request(args.address, "POST", "/jobs", body)
+            print(json.dumps(job))
+            records = watch(args.address, job["id"]) if args.watch else []
+        elif args.command == "status":
+            print(json.dumps(request(args.address, "GET", f"/jobs/{args.job}" if args.job is not None else "/jobs")))
+            records = []
+        elif args.command == "cancel":
+            print(json.dumps(request(args.address, "DELETE", f"/jobs/{args.job}")))
+            records = []
+        else:
+            records = watch(args.address, args.job)
+        for record in records:
+            print(json.dumps(record), flush=True)
+    except (OSError, RuntimeError) as error:
+        parser.exit(1, f"error: {error}\n")
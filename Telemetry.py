@@ -0,0 +1,265 @@
+import collections
+import json
+import multiprocessing
+import queue
+import socket
+import struct
+import sys
+import threading
+import time
+
+
+# Binary format: each record starts with a type byte and the iteration number
+ITERATION_HEADER = struct.Struct("<BIddddHh")   # type=1, iteration, time, best energy, exchange rate, moves/s, chi, worker
+REPLICA = struct.Struct("<dd")                   # energy, temperature (chi times)
+OTHER_HEADER = struct.Struct("<BII")             # type=0, iteration, JSON length (followed by the JSON record)
+
+
+
+def encode_binary(record):
+    """
+    Encodes a record in the compact binary format (iteration records as fixed-size fields, others as JSON).
+    Args:
+        record (dict): Telemetry record.
+    Returns:
+        bytes: Encoded record.
+    """
+    if record.get("type") == "iteration":
+        energies, temperatures = record["energies"], record["temperatures"]
+        data = ITERATION_HEADER.pack(1, record["iteration"], record["time"], record["best_energy"],
+                                     record["exchange_rate"], record["moves_per_sec"], len(energies),
+                                     record.get("worker", -1))
+        return data + b"".join(REPLICA.pack(e, t) for e, t in zip(energies, temperatures))
+    payload = json.dumps(record, separators=(",", ":")).encode()
+    return OTHER_HEADER.pack(0, record.get("iteration", 0), len(payload)) + payload
+
+
+
+def read_binary_log(path):
+    """
+    Decodes a binary telemetry log.
+    Args:
+        path (str): Path of the log.
+    Yields:
+        dict: Telemetry records.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset < len(data):
+        if data[offset] == 1:
+            _, iteration, t, best, rate, speed, chi, worker = ITERATION_HEADER.unpack_from(data, offset)
+            offset += ITERATION_HEADER.size
+            replicas = [REPLICA.unpack_from(data, offset + k * REPLICA.size) for k in range(chi)]
+            offset += chi * REPLICA.size
+            record = {"type": "iteration", "iteration": iteration, "time": t, "best_energy": best,
+                      "exchange_rate": rate, "moves_per_sec": speed,
+                      "energies": [e for e, _ in replicas], "temperatures": [t for _, t in replicas]}
+            if worker >= 0:
+                record["worker"] = worker
+            yield record
+        else:
+            _, _, length = OTHER_HEADER.unpack_from(data, offset)
+            offset += OTHER_HEADER.size
+            yield json.loads(data[offset:offset + length])
+            offset += length
+
+
+
+class Telemetry:
+    """
+    Low-overhead progress stream of the REMC drivers, written as JSON lines or in a compact binary format
+    to a file, a pipe or a local socket. Records are kept in a ring buffer and written in batches by a background
+    thread, so that a slow sink never blocks the search (records are dropped instead, and counted in dropped), and
+    iteration records are throttled to at most one every min_interval seconds.
+    Worker processes send their records through worker_client().
+    """
+
+    def __init__(self, sink="-", fmt="jsonl", buffer_size=1024, min_interval=0.0, flush_interval=1.0, conformations=False):
+        """
+        Args:
+            sink (str or file, optional): "-" for stdout, a file path, "unix:/path/to/socket", "tcp:host:port",
+                or an object with write() and flush() (e.g. a pipe). Defaults to "-".
+            fmt (str, optional): "jsonl" or "binary". Defaults to "jsonl".
+            buffer_size (int, optional): Size of the ring buffer (the oldest records are dropped when it is full). Defaults to 1024.
+            min_interval (float, optional): Minimum time between two iteration records of a same source, in seconds. Defaults to 0.
+            flush_interval (float, optional): Maximum time between two writes, in seconds (the buffer is also written
+                as soon as it is half full). Defaults to 1.
+            conformations (bool, optional): Asks the engines to add the replica conformations to the iteration
+                records (not kept by the binary format). Defaults to False.
+        """
+        if fmt not in ("jsonl", "binary"):
+            raise ValueError("fmt must be 'jsonl' or 'binary'")
+        self.fmt = fmt
+        self.min_interval = min_interval
+        self.flush_interval = flush_interval
+        self.conformations = conformations
+        self.buffer = collections.deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._last_emit = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)  # Wakes the flusher when the buffer is half full or on close
+        self._closed = False
+        self._write_lock = threading.Lock()
+        self._socket = None
+        self._owns_stream = False
+        self._queue = None
+        self._listener = None
+        self._manager = None
+
+        if hasattr(sink, "write"):
+            self._stream = sink
+        elif sink == "-":
+            self._stream = sys.stdout.buffer if fmt == "binary" else sys.stdout
+        elif sink.startswith("unix:"):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(sink[len("unix:"):])
+            self._stream = None
+        elif sink.startswith("tcp:"):
+            host, port = sink[len("tcp:"):].rsplit(":", 1)
+            self._socket = socket.create_connection((host, int(port)))
+            self._stream = None
+        else:
+            self._stream = open(sink, "ab" if fmt == "binary" else "a")
+            self._owns_stream = True
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def accepts(self, source=None):
+        """
+        Checks the rate limit of iteration records, so that callers can skip building records that would be dropped.
+        Args:
+            source (optional): Source of the records (e.g. a worker index). Defaults to None.
+        Returns:
+            bool: True if an iteration record of this source would be kept.
+        """
+        return time.time() - self._last_emit.get(source, float("-inf")) >= self.min_interval
+
+    def emit(self, record, force=False):
+        """
+        Adds a record to the ring buffer (iteration records are throttled unless force is True). Never writes to the
+        sink itself, so that it is safe to call from the search loop and from the worker listener.
+        Args:
+            record (dict): Telemetry record, with a "type" key.
+            force (bool, optional): If True, bypasses the rate limit. Defaults to False.
+        """
+        source = record.get("worker")
+        now = time.time()
+        with self._lock:
+            if record.get("type") == "iteration" and not force:
+                if now - self._last_emit.get(source, float("-inf")) < self.min_interval:
+                    return
+            self._last_emit[source] = now
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1  # The sink does not keep up: the oldest record is dropped
+            self.buffer.append(record)
+            if len(self.buffer) >= max(1, self.buffer.maxlen // 2):
+                self._wake.notify()
+
+    def flush(self):
+        """Writes the buffered records to the sink."""
+        with self._write_lock:
+            with self._lock:
+                records = list(self.buffer)
+                self.buffer.clear()
+            if not records:
+                return
+            if self.fmt == "binary":
+                data = b"".join(encode_binary(r) for r in records)
+            else:
+                data = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+            if self._socket is not None:
+                self._socket.sendall(data.encode() if isinstance(data, str) else data)
+            else:
+                self._stream.write(data)
+                self._stream.flush()
+
+    def _flush_loop(self):
+        """Writes the buffer every flush_interval seconds, or as soon as it is half full, until the telemetry is closed."""
+        while True:
+            with self._wake:
+                self._wake.wait_for(lambda: self._closed or len(self.buffer) >= max(1, self.buffer.maxlen // 2),
+                                    timeout=self.flush_interval)
+                if self._closed:
+                    return
+            self.flush()
+
+    def worker_client(self, worker=None):
+        """
+        Returns a picklable client that worker processes use to send records to this telemetry.
+        Args:
+            worker (int, optional): Worker index added to the records. Defaults to None.
+        Returns:
+            TelemetryClient: Client with the same emit() interface.
+        """
+        if self._queue is None:
+            self._manager = multiprocessing.Manager()
+            self._queue = self._manager.Queue()
+            self._listener = threading.Thread(target=self._listen, daemon=True)
+            self._listener.start()
+        return TelemetryClient(self._queue, worker, self.min_interval, self.conformations)
+
+    def _listen(self):
+        """Moves the records sent by worker processes to the ring buffer."""
+        while True:
+            try:
+                record = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if record is None:
+                return
+            self.emit(record, force=True)
+
+    def close(self):
+        """Stops the worker listener, flushes the buffer and closes the sink."""
+        if self._queue is not None:
+            self._queue.put(None)
+            self._listener.join()
+            self._manager.shutdown()
+            self._queue = None
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        self._flusher.join()
+        self.flush()
+        if self._socket is not None:
+            self._socket.close()
+        elif self._owns_stream:
+            self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+
+class TelemetryClient:
+    """Picklable telemetry sender for worker processes (see Telemetry.worker_client)."""
+
+    def __init__(self, queue, worker=None, min_interval=0.0, conformations=False):
+        self.queue = queue
+        self.worker = worker
+        self.min_interval = min_interval
+        self.conformations = conformations
+        self._last_emit = float("-inf")
+
+    def accepts(self, source=None):
+        """Checks the rate limit of iteration records (see Telemetry.accepts)."""
+        return time.time() - self._last_emit >= self.min_interval
+
+    def emit(self, record, force=False):
+        """Sends a record to the main process (iteration records are throttled unless force is True)."""
+        if record.get("type") == "iteration" and not force and not self.accepts():
+            return
+        self._last_emit = time.time()
+        if self.worker is not None:
+            record = dict(record, worker=self.worker)
+        self.queue.put(record)
+
+    def worker_client(self, worker=None):
+        """Returns a client sending to the same queue on behalf of a worker (so that a client can be passed to REMC_multi)."""
+        return TelemetryClient(self.queue, worker, self.min_interval, self.conformations)
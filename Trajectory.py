@@ -0,0 +1,313 @@
+import mmap
+import os
+import struct
+
+
+# File layout: a 32-byte header, then fixed-size frames. Each frame holds the energy and the temperature (float32)
+# and the directions of the n-1 bonds, 2 bits each (0: +x, 1: +y, 2: -x, 3: -y), 4 bonds per byte.
+# Conformations are stored up to translation (the first residue is decoded at (0, 0)).
+HEADER = struct.Struct("<4sB3xIQ12x")   # signature, version, chain length, number of frames
+FRAME_HEADER = struct.Struct("<ff")     # energy, temperature
+MAGIC = b"HPTR"
+VERSION = 1
+DIRECTIONS = {(1, 0): 0, (0, 1): 1, (-1, 0): 2, (0, -1): 3}
+STEPS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+
+
+def frame_size(n):
+    """Returns the size in bytes of a frame of a chain of n residues."""
+    return FRAME_HEADER.size + (n + 2) // 4
+
+
+
+def encode_frame(c, energy, T):
+    """
+    Encodes a conformation with its energy and temperature as a trajectory frame.
+    Args:
+        c (list of tuples): Conformation.
+        energy (float): Energy of the conformation.
+        T (float): Temperature of the sample.
+    Returns:
+        bytes: Encoded frame.
+    """
+    moves = bytearray((len(c) + 2) // 4)
+    for i in range(len(c) - 1):
+        (x0, y0), (x1, y1) = c[i], c[i + 1]
+        moves[i >> 2] |= DIRECTIONS[(x1 - x0, y1 - y0)] << (2 * (i & 3))
+    return FRAME_HEADER.pack(energy, T) + bytes(moves)
+
+
+
+def decode_frame(data, n):
+    """
+    Decodes a trajectory frame.
+    Args:
+        data (bytes): Encoded frame.
+        n (int): Chain length.
+    Returns:
+        tuple: (conformation, energy, temperature)
+    """
+    energy, T = FRAME_HEADER.unpack_from(data)
+    x, y = 0, 0
+    c = [(0, 0)]
+    for i in range(n - 1):
+        dx, dy = STEPS[(data[FRAME_HEADER.size + (i >> 2)] >> (2 * (i & 3))) & 3]
+        x, y = x + dx, y + dy
+        c.append((x, y))
+    return c, energy, T
+
+
+
+class FrameBuffer:
+    """
+    In-memory frame recorder, used by worker processes whose frames are written to the file by the main process.
+    Same record() interface as TrajectoryWriter.
+    """
+
+    def __init__(self, stride=1):
+        self.stride = stride
+        self.data = bytearray()
+        self._calls = 0
+
+    def record(self, c, energy, T):
+        """Encodes the conformation if it falls on the sampling stride."""
+        self._calls += 1
+        if (self._calls - 1) % self.stride == 0:
+            self.data += encode_frame(c, energy, T)
+
+
+
+class TrajectoryWriter:
+    """
+    Appends sampled conformations, energies and temperatures to a memory-mapped trajectory file.
+    The file is preallocated and its capacity doubles when it is full, so appending a frame is a copy into the
+    mapping. The frame count in the header is kept up to date, so the file can be read while it is written
+    and survives an interrupted run. Opening an existing file of the same chain length appends to it.
+    """
+
+    def __init__(self, path, n, capacity=65536, stride=1):
+        """
+        Args:
+            path (str): Path of the trajectory file.
+            n (int): Chain length.
+            capacity (int, optional): Initial capacity, in frames. Defaults to 65536.
+            stride (int, optional): Records one step out of stride. Defaults to 1.
+        """
+        self.path = path
+        self.n = n
+        self.stride = stride
+        self.frame_size = frame_size(n)
+        self._calls = 0
+
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER.size:
+            self._file = open(path, "r+b")
+            magic, version, file_n, self.count = HEADER.unpack(self._file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a trajectory file")
+            if file_n != n:
+                raise ValueError(f"{path} holds chains of length {file_n}, not {n}")
+        else:
+            self._file = open(path, "w+b")
+            self.count = 0
+        self.capacity = max(capacity, self.count)
+        self._file.truncate(HEADER.size + self.capacity * self.frame_size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._write_header()
+
+    def _write_header(self):
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.n, self.count)
+
+    def _reserve(self, frames):
+        """Grows the file (doubling its capacity) so that it can hold frames more frames."""
+        if self.count + frames <= self.capacity:
+            return
+        self.capacity = max(2 * self.capacity, self.count + frames)
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(HEADER.size + self.capacity * self.frame_size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def record(self, c, energy, T):
+        """
+        Appends a sampled conformation (one call out of stride is written).
+        Args:
+            c (list of tuples): Conformation.
+            energy (float): Its energy.
+            T (float): Temperature of the sample.
+        """
+        self._calls += 1
+        if (self._calls - 1) % self.stride == 0:
+            self.write_frames(encode_frame(c, energy, T))
+
+    def write_frames(self, data):
+        """
+        Appends encoded frames (e.g. the data of a FrameBuffer).
+        Args:
+            data (bytes): Concatenated frames.
+        """
+        frames = len(data) // self.frame_size
+        if frames == 0:
+            return
+        self._reserve(frames)
+        start = HEADER.size + self.count * self.frame_size
+        self._map[start:start + len(data)] = data
+        self.count += frames
+        self._write_header()
+
+    def close(self):
+        """Flushes the mapping and truncates the file to the recorded frames."""
+        if self._map is None:
+            return
+        self._map.flush()
+        self._map.close()
+        self._map = None
+        self._file.truncate(HEADER.size + self.count * self.frame_size)
+        self._file.close()
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+
+def read_header(path):
+    """
+    Reads the header of a trajectory file.
+    Returns:
+        tuple: (chain length, number of frames)
+    """
+    with open(path, "rb") as f:
+        magic, version, n, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a trajectory file")
+    return n, count
+
+
+
+def iter_frames(path):
+    """
+    Iterates over the frames of a trajectory file without NumPy.
+    Args:
+        path (str): Path of the trajectory file.
+    Yields:
+        tuple: (conformation, energy, temperature)
+    """
+    n, count = read_header(path)
+    size = frame_size(n)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for k in range(count):
+            start = HEADER.size + k * size
+            yield decode_frame(data[start:start + size], n)
+
+
+
+def load_trajectory(path):
+    """
+    Maps a trajectory file as a NumPy structured array (zero-copy, read-only), with fields
+    "energy", "temperature" and "moves" (packed bond directions, see frame_coordinates).
+    Args:
+        path (str): Path of the trajectory file.
+    Returns:
+        tuple: (chain length, numpy.memmap of the frames)
+    """
+    import numpy as np
+
+    n, count = read_header(path)
+    dtype = np.dtype([("energy", "<f4"), ("temperature", "<f4"), ("moves", "u1", ((n + 2) // 4,))])
+    return n, np.memmap(path, dtype=dtype, mode="r", offset=HEADER.size, shape=(count,))
+
+
+
+def frame_coordinates(frames, n):
+    """
+    Decodes a batch of frames into coordinates.
+    Args:
+        frames (numpy structured array): Frames of load_trajectory (or a slice of them).
+        n (int): Chain length.
+    Returns:
+        numpy.ndarray: int32 array of shape (frames, n, 2).
+    """
+    import numpy as np
+
+    shifts = np.array([0, 2, 4, 6], dtype=np.uint8)
+    codes = ((frames["moves"][:, :, None] >> shifts) & 3).reshape(len(frames), -1)[:, :n - 1]
+    steps = np.array(STEPS, dtype=np.int32)[codes]
+    coordinates = np.zeros((len(frames), n, 2), dtype=np.int32)
+    np.cumsum(steps, axis=1, dtype=np.int32, out=coordinates[:, 1:])
+    return coordinates
+
+
+
+def _batches(frames, pairs, batch_size):
+    """Splits the frames in batches whose pairwise arrays stay around 4 M elements."""
+    if batch_size is None:
+        batch_size = max(1, (1 << 22) // max(pairs, 1))
+    for start in range(0, len(frames), batch_size):
+        yield frames[start:start + batch_size]
+
+
+
+def _contacts(coordinates, indices):
+    """Boolean array (frames, k, k) of lattice contacts between the residues of indices."""
+    import numpy as np
+
+    selected = coordinates[:, indices]
+    distance = np.abs(selected[:, :, None, :] - selected[:, None, :, :]).sum(axis=3)
+    separated = np.abs(np.subtract.outer(indices, indices)) > 1
+    return (distance == 1) & separated
+
+
+
+def batch_energies(path, hp, batch_size=None):
+    """
+    Recomputes the HP energy of every frame of a trajectory, by batches (e.g. to check a run or to rescore it).
+    Args:
+        path (str): Path of the trajectory file.
+        hp (str): HP sequence.
+        batch_size (int, optional): Frames per batch. Defaults to a size bounding the memory use.
+    Returns:
+        numpy.ndarray: int32 energies, one per frame.
+    """
+    import numpy as np
+
+    n, frames = load_trajectory(path)
+    h_indices = np.array([i for i, residue in enumerate(hp) if residue == 'H'])
+    energies = np.empty(len(frames), dtype=np.int32)
+    start = 0
+    for batch in _batches(frames, len(h_indices) ** 2, batch_size):
+        contacts = _contacts(frame_coordinates(batch, n), h_indices)
+        energies[start:start + len(batch)] = -contacts.sum(axis=(1, 2)) // 2
+        start += len(batch)
+    return energies
+
+
+
+def contact_map(path, temperature=None, batch_size=None):
+    """
+    Computes the contact frequency of every pair of residues over a trajectory, by batches.
+    Args:
+        path (str): Path of the trajectory file.
+        temperature (float, optional): Only uses the frames sampled at this temperature. Defaults to all frames.
+        batch_size (int, optional): Frames per batch. Defaults to a size bounding the memory use.
+    Returns:
+        numpy.ndarray: (n, n) array of contact frequencies.
+    """
+    import numpy as np
+
+    n, frames = load_trajectory(path)
+    indices = np.arange(n)
+    counts = np.zeros((n, n), dtype=np.int64)
+    total = 0
+    for batch in _batches(frames, n * n, batch_size):
+        if temperature is not None:
+            batch = batch[batch["temperature"] == np.float32(temperature)]
+        if len(batch):
+            counts += _contacts(frame_coordinates(batch, n), indices).sum(axis=0)
+            total += len(batch)
+    return counts / max(total, 1)
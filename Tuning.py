@@ -0,0 +1,250 @@
+import argparse
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+from Others_function import *
+from Benchmark import random_hp_sequence
+from Benchmark_HP import benchmark_sequences, run_once
+
+
+# Default search space of the REMC parameters
+SPACE = {
+    "phi": [100, 250, 500, 1000, 2000],
+    "nu": [0.2, 0.35, 0.5, 0.65, 0.8],
+    "T_init": [120, 160, 200],
+    "T_final": [200, 220, 260, 300],
+    "chi": [3, 5, 8, 12],
+}
+LENGTH_BUCKETS = [25, 50, 100, 200, 500]   # Upper bounds of the length buckets
+H_BUCKETS = [0.4, 0.6]                     # Upper bounds of the H-fraction buckets
+TUNED_FILE = "tuned_params.json"           # Default file of the tuned parameters
+
+
+
+def bucket_key(hp):
+    """
+    Returns the length / H-fraction bucket of a sequence (e.g. "n<=50,h<0.4").
+    Args:
+        hp (str): HP sequence.
+    Returns:
+        str: Bucket name.
+    """
+    n = len(hp)
+    length = next((f"n<={bound}" for bound in LENGTH_BUCKETS if n <= bound), f"n>{LENGTH_BUCKETS[-1]}")
+    h_fraction = hp.count('H') / n if n else 0
+    fraction = next((f"h<{bound}" for bound in H_BUCKETS if h_fraction < bound), f"h>={H_BUCKETS[-1]}")
+    return f"{length},{fraction}"
+
+
+
+def valid_config(config):
+    """Checks that a configuration has an increasing temperature ladder."""
+    return config.get("T_final", 220) > config.get("T_init", 160)
+
+
+
+def grid_configs(space=SPACE):
+    """
+    Lists all the configurations of a search space.
+    Args:
+        space (dict): Candidate values by parameter name.
+    Returns:
+        list of dict: Configurations.
+    """
+    names = list(space)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    return [config for config in configs if valid_config(config)]
+
+
+
+def random_configs(space=SPACE, n=30, rng=None):
+    """
+    Draws distinct random configurations of a search space.
+    Args:
+        space (dict): Candidate values by parameter name.
+        n (int, optional): Number of configurations. Defaults to 30.
+        rng (random.Random, optional): Random generator. Defaults to a new one.
+    Returns:
+        list of dict: Configurations.
+    """
+    rng = rng or random.Random()
+    configs = grid_configs(space)
+    return rng.sample(configs, min(n, len(configs)))
+
+
+
+def run_trial(job):
+    """
+    Runs one trial of a configuration (in a pool worker, with the engine prints silenced).
+    Args:
+        job (tuple): (config index, config, name, hp, E_star, seed, budget).
+    Returns:
+        dict: Config index with the result of Benchmark_HP.run_once.
+    """
+    index, config, name, hp, E_star, seed, budget = job
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = run_once(("REMCSimulation", name, hp, E_star, seed, budget, config))
+    result["config"] = index
+    result["gap"] = (result["energy"] - E_star) / max(abs(E_star), 1)
+    return result
+
+
+
+def score(results):
+    """
+    Scores the trials of a configuration (lower is better): failure rate first, then the mean
+    relative gap to E_star, then the mean wall time.
+    Args:
+        results (list of dict): Trials of run_trial.
+    Returns:
+        tuple: Sort key.
+    """
+    return (sum(not r["success"] for r in results) / len(results), statistics.mean(r["gap"] for r in results),
+            statistics.mean(r["wall"] for r in results))
+
+
+
+def evaluate(pool, configs, sequences, seeds, budget):
+    """
+    Runs every configuration on every sequence with every seed, in parallel.
+    Args:
+        pool (multiprocessing.Pool): Process pool.
+        configs (list of dict): Configurations.
+        sequences (list of tuples): (name, hp, E_star) tuples.
+        seeds (list of int): Seeds of the trials.
+        budget (float): Time budget of each trial, in seconds.
+    Returns:
+        list: (score, config) pairs, best first.
+    """
+    jobs = [(i, config, name, hp, E_star, seed, budget)
+            for i, config in enumerate(configs) for name, hp, E_star in sequences for seed in seeds]
+    trials = {i: [] for i in range(len(configs))}
+    for result in pool.imap_unordered(run_trial, jobs):
+        trials[result["config"]].append(result)
+    return sorted(((score(trials[i]), config) for i, config in enumerate(configs)), key=lambda item: item[0])
+
+
+
+def tune(sequences, method="halving", space=SPACE, n_configs=27, seeds=3, budget=10, eta=3, processes=None, seed=0):
+    """
+    Searches the best REMC parameters for a set of sequences.
+    grid and random run every configuration with the full budget. halving (successive halving) starts
+    with a budget of budget / eta^k, keeps the best 1/eta configurations after each round and multiplies
+    their budget by eta, so that losing configurations are stopped early.
+    Args:
+        sequences (list of tuples): (name, hp, E_star) tuples.
+        method (str, optional): "grid", "random" or "halving". Defaults to "halving".
+        space (dict, optional): Search space. Defaults to SPACE.
+        n_configs (int, optional): Number of random configurations (random and halving). Defaults to 27.
+        seeds (int, optional): Number of seeds per sequence and configuration. Defaults to 3.
+        budget (float, optional): Time budget of each trial (of the last round for halving), in seconds. Defaults to 10.
+        eta (int, optional): Reduction factor of successive halving. Defaults to 3.
+        processes (int, optional): Pool workers. Defaults to the number of cores.
+        seed (int, optional): Seed of the configuration draw and base seed of the trials. Defaults to 0.
+    Returns:
+        list: (score, config) pairs of the last round, best first.
+    """
+    rng = random.Random(seed)
+    trial_seeds = [seed + k for k in range(seeds)]
+    configs = grid_configs(space) if method == "grid" else random_configs(space, n_configs, rng)
+
+    with multiprocessing.Pool(processes) as pool:
+        if method != "halving":
+            return evaluate(pool, configs, sequences, trial_seeds, budget)
+
+        rounds = 0
+        while eta ** (rounds + 1) <= len(configs):
+            rounds += 1
+        for r in range(rounds + 1):
+            round_budget = budget / eta ** (rounds - r)
+            ranking = evaluate(pool, configs, sequences, trial_seeds, round_budget)
+            print(f"round {r}: {len(configs)} configurations, {round_budget:.2f} s per trial, best {ranking[0][1]} {ranking[0][0]}")
+            configs = [config for _, config in ranking[:max(1, len(configs) // eta)]]
+    return ranking
+
+
+
+def save_tuned(config, hps, path=TUNED_FILE, score_value=None):
+    """
+    Saves a configuration as the tuned defaults of the buckets of the given sequences.
+    Args:
+        config (dict): Parameters.
+        hps (list of str): Sequences the configuration was tuned on.
+        path (str, optional): JSON file. Defaults to TUNED_FILE.
+        score_value (tuple, optional): Score of the configuration, stored for reference. Defaults to None.
+    """
+    tuned = load_tuned(path)
+    for bucket in sorted({bucket_key(hp) for hp in hps}):
+        tuned[bucket] = {"params": config, "score": list(score_value) if score_value is not None else None}
+    with open(path, "w") as f:
+        json.dump(tuned, f, indent=1, sort_keys=True)
+
+
+
+def load_tuned(path=TUNED_FILE):
+    """
+    Reads the tuned parameters of all the buckets.
+    Args:
+        path (str, optional): JSON file written by save_tuned. Defaults to TUNED_FILE.
+    Returns:
+        dict: {bucket: {"params", "score"}}, empty if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+
+def load_tuned_defaults(hp, path=TUNED_FILE, tuned=None):
+    """
+    Returns the tuned parameters of the bucket of a sequence.
+    Args:
+        hp (str): HP sequence.
+        path (str, optional): JSON file written by save_tuned. Defaults to TUNED_FILE.
+        tuned (dict, optional): Table already read with load_tuned (path is then ignored). Defaults to None.
+    Returns:
+        dict: Parameters (phi, nu, T_init, T_final, chi), empty if the bucket was not tuned.
+    """
+    if tuned is None:
+        tuned = load_tuned(path)
+    return dict(tuned.get(bucket_key(hp), {}).get("params", {}))
+
+
+
+# ----- Parameter tuning -----
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Parallel tuning of the REMC parameters.")
+    parser.add_argument("--hp", nargs="+", default=[], help="Sequences to tune on (compact notation accepted)")
+    parser.add_argument("--benchmarks", nargs="+", default=[], help="Benchmark sequences to tune on (e.g. S1-4 S1-5)")
+    parser.add_argument("--random", type=int, default=0, help="Number of random sequences of a class to tune on")
+    parser.add_argument("--length", type=int, default=50, help="Length of the random sequences")
+    parser.add_argument("--h-fraction", type=float, default=0.5, help="H fraction of the random sequences")
+    parser.add_argument("--method", default="halving", choices=["grid", "random", "halving"], help="Search method")
+    parser.add_argument("--configs", type=int, default=27, help="Number of configurations (random, halving)")
+    parser.add_argument("--seeds", type=int, default=3, help="Seeds per sequence and configuration")
+    parser.add_argument("--budget", type=float, default=10, help="Time budget of each trial (s)")
+    parser.add_argument("--eta", type=int, default=3, help="Reduction factor of successive halving")
+    parser.add_argument("--processes", type=int, help="Pool workers")
+    parser.add_argument("--seed", type=int, default=0, help="Seed")
+    parser.add_argument("--output", default=TUNED_FILE, help="JSON file of the tuned parameters")
+    args = parser.parse_args()
+
+    sequences = [(compact, expand_hp_sequence(compact), None) for compact in args.hp]
+    sequences += benchmark_sequences(args.benchmarks) if args.benchmarks else []
+    rng = random.Random(args.seed)
+    sequences += [(f"random{k}", random_hp_sequence(args.length, args.h_fraction, rng), None) for k in range(args.random)]
+    sequences = [(name, hp, E_star if E_star is not None else energy_lower_bound(hp)) for name, hp, E_star in sequences]
+    if not sequences:
+        parser.error("no sequence given (--hp, --benchmarks or --random)")
+
+    ranking = tune(sequences, args.method, SPACE, args.configs, args.seeds, args.budget, args.eta, args.processes, args.seed)
+    for value, config in ranking[:5]:
+        print(f"{config}  success {1 - value[0]:.2f}  gap {value[1]:.3f}  wall {value[2]:.2f} s")
+    save_tuned(ranking[0][1], [hp for _, hp, _ in sequences], args.output, ranking[0][0])
+    print(f"Best parameters saved to {args.output} for {sorted({bucket_key(hp) for _, hp, _ in sequences})}")
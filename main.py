@@ -2,139 +2,291 @@
 ####################################### DESCRIPTION ########################################
 ############################################################################################
 #
-# This script  can be used to run thre functions : MCsearch, REMC_multi and REMC_paral.
+# This script runs the search functions from the command line : MCsearch (MC_search),
+# REMCSimulation (REMC), REMC_paral (REMC_parallelized), REMC_multi (REMC_multi_processes)
+# and REMC_hierarchical (REMC_hierarchical).
 #
-# MCsearch, applies the Monte Carlo algorithm to a given HP sequence. 
-# The number of iterations ϕ (phi), the probability ν (nu)  of performing a pull move 
-# (otherwise, a VSHD move is used), an initial conformation c (random if not provided) 
+# MCsearch, applies the Monte Carlo algorithm to a given HP sequence.
+# The number of iterations ϕ (phi), the probability ν (nu)  of performing a pull move
+# (otherwise, a VSHD move is used), an initial conformation c (random if not provided)
 # can be specified.
 #
-# The other two functions, REMC_multi and REMC_paral, both implement the REMC algorithm but 
-# use different parallelization approaches. 
-# REMC_multi runs the REMC algorithm multiple times simultaneously and returns the best
-# conformation found. REMC_paral parallelizes the Monte Carlo calculations for each replica 
-# to improve efficiency. Both functions include the parameters ϕ, ν, and c, as well as 
-# initial and final temperatures T_1 (T_init) and T_χ (T_final), the number of replicas
-# χ (chi), and maximum iteration (max_iteration) and timeout criteria to stop the
-# algorithm if it runs too long. The REMC_multi function also has an argument, Nb_processes,
-#  which determines the number of simultaneous REMC executions.
+# The REMC functions implement the REMC algorithm. REMC_multi runs the REMC algorithm
+# multiple times simultaneously and returns the best conformation found. REMC_paral
+# parallelizes the Monte Carlo calculations for each replica to improve efficiency.
+# They include the parameters ϕ, ν, as well as initial and final temperatures T_1 (T_init)
+# and T_χ (T_final), the number of replicas χ (chi), and maximum iteration (max_iteration)
+# and timeout criteria to stop the algorithm if it runs too long. --workers sets the
+# number of simultaneous REMC executions of REMC_multi and the pool size of REMC_paral.
+#
+# Every parameter can be given on the command line or in a JSON config file (keys are the
+# option names, e.g. {"method": "REMC_multi_processes", "phi": 500, "T_init": 160}); the
+# command line overrides the config file. Examples :
+#
+#   uv run main.py --hp HHPPHPPHPPHPPHPPHPPHPPHH --E-star -9 --method REMC_parallelized
+#   uv run main.py --config run.json --seed 3 --format json --plot-out best.png
+#   uv run main.py --hp "(HP)10" --lattice cubic --energy-model HP+ --method REMC
+#
+# Results are printed as text, JSON or CSV (to stdout or --output); the progress of the
+# search goes to stderr, so the output can be parsed by a scheduler.
 #
 ############################################################################################
 ######################################## PARAMETERS ########################################
 ############################################################################################
 
-#--- Method & Plotting ---------------------------------------------------------------------
-method = "REMC_parallelized"  # "REMC_multi_processes"  "MC_search"  "REMC_parallelized"
-plot = True # Chose True to plot the best configuration, false otherwise
-
-#--- Molecule Parameters -------------------------------------------------------------------
-hp = "HHPPHPPHPPHPPHPPHPPHPPHH"                # HP Sequence
-E_star = -9                                               # Target Energy
-
-#--- REMC Parallelized Method Parameters ---------------------------------------------------
-phi_paral = 500                     # Iterations in Monte Carlo search
-nu_paral = 0.4                      # Porbability of a pull move
-T_init_paral = 160                  # Initial temperature
-T_final_paral = 220                 # Final Temperature
-chi_paral = 5                       # Number of replicas
-max_iteration_paral = 1000          # Number of maximum iteration
-timeout_paral = 300                 # Timeout (in seconds)
-random_initial_config = True        # If true, the initial c is random, otherwise linear
-
-#--- REMC Multi Method Parameters ----------------------------------------------------------
-phi_multi = 500                     # Iterations in Monte Carlo search
-nu_multi = 0.4                      # Porbability of a pull move
-T_init_multi = 160                  # Initial temperature
-T_final_multi = 220                 # Final Temperature
-chi_multi = 5                       # Number of replicas
-max_iteration_multi = 1000          # Number of maximum iteration
-nb_processus_multi = 8              # Number of simulations (differents initial conformations)
-timeout_multi = 300                 # Timeout (in seconds)
-
-#--- Monte Carlo Method Parameters ---------------------------------------------------------
-phi_mc = 10000                      # Iterations in Monte Carlo search
-nu_mc = 0.4                         # Probability of a pull move
-T_mc = 200                          # Temperature
+#--- Default parameters of each method (used for the options not given) -------------------
+DEFAULTS = {
+    "REMC_parallelized": {"phi": 500, "nu": 0.4, "T_init": 160, "T_final": 220, "chi": 5, "max_iteration": 1000,
+                          "timeout": 300},
+    "REMC_multi_processes": {"phi": 500, "nu": 0.4, "T_init": 160, "T_final": 220, "chi": 5, "max_iteration": 1000,
+                             "timeout": 300, "workers": 8},
+    "REMC_hierarchical": {"phi": 500, "nu": 0.4, "T_init": 160, "T_final": 220, "chi": 5, "max_iteration": 1000,
+                          "timeout": 300, "stages": 4},
+    "REMC": {"phi": 500, "nu": 0.4, "T_init": 160, "T_final": 220, "chi": 5, "max_iteration": 1000, "timeout": 300},
+    "MC_search": {"phi": 10000, "nu": 0.4, "T": 200},
+}
+METHODS = list(DEFAULTS)
 
 
 ############################################################################################
 ###################################### CODE EXECUTION ######################################
 ############################################################################################
+import argparse
+import contextlib
+import csv
+import json
+import os
+import random
+import sys
 from Monte_Carlo import *
-from Grid import *
+from EnergyModel import EnergyModel, load_contact_matrix
+from Lattice import LATTICES, get_lattice
 
-#--- REMC Parallelized ---------------------------------------------------------------------
-if method == "REMC_parallelized":
 
-    # Execution time calculation
-    time_init = time.time()
-    
-    # Function
-    if random_initial_config :
-        best_conformation, best_energy = REMC_paral(hp=hp, E_star=E_star, phi=phi_paral,
-                                                    nu=nu_paral, T_init=T_init_paral, 
-                                                    T_final=T_final_paral, chi=chi_paral, 
-                                                    max_iterations=max_iteration_paral, 
-                                                    timeout=timeout_paral)
-    else :
-        best_conformation, best_energy = REMC_paral(hp=hp, c= generate_linear_conformation(hp),
-                                                    E_star=E_star, phi=phi_paral,
-                                                    nu=nu_paral, T_init=T_init_paral, 
-                                                    T_final=T_final_paral, chi=chi_paral, 
-                                                    max_iterations=max_iteration_paral, 
-                                                    timeout=timeout_paral)
+def build_parser():
+    """Returns the parser of the command-line options (all defaults are None, see DEFAULTS)."""
+    parser = argparse.ArgumentParser(description="Lowest-energy conformation of an HP sequence on the 2D lattice.")
+    parser.add_argument("--config", help="JSON file of options (overridden by the command line)")
+    parser.add_argument("--method", choices=METHODS, help="Search function (default: REMC_parallelized)")
+    parser.add_argument("--hp", help="HP sequence (compact notation accepted)")
+    parser.add_argument("--E-star", dest="E_star", type=int, help="Target energy (default: stored energy or lower bound)")
+    parser.add_argument("--phi", type=int, help="Iterations in Monte Carlo search")
+    parser.add_argument("--nu", type=float, help="Probability of a pull move")
+    parser.add_argument("--T", type=float, help="Temperature (MC_search)")
+    parser.add_argument("--T-init", dest="T_init", type=float, help="Initial temperature")
+    parser.add_argument("--T-final", dest="T_final", type=float, help="Final temperature")
+    parser.add_argument("--chi", type=int, help="Number of replicas")
+    parser.add_argument("--max-iteration", dest="max_iteration", type=int, help="Number of maximum iterations")
+    parser.add_argument("--timeout", type=float, help="Timeout (in seconds)")
+    parser.add_argument("--workers", type=int, help="Simulations of REMC_multi_processes / pool size of REMC_parallelized")
+    parser.add_argument("--stages", type=int, help="Growth stages of REMC_hierarchical")
+    parser.add_argument("--adaptive-phi", dest="adaptive_phi", action="store_true", default=None,
+                        help="Adapt phi per replica to its wall time and autocorrelation")
+    parser.add_argument("--linear-start", dest="linear_start", action="store_true", default=None,
+                        help="Start the replicas from the linear conformation instead of random ones")
+    parser.add_argument("--energy-model", dest="energy_model", choices=["HP", "HP+", "matrix"],
+                        help="Energy function (default: HP; matrix needs --matrix)")
+    parser.add_argument("--matrix", help="Contact energy matrix file of the matrix model (e.g. Miyazawa-Jernigan)")
+    parser.add_argument("--lattice", choices=list(LATTICES), help="Lattice of the conformations (default: square)")
+    parser.add_argument("--seed", type=int, help="Seed of the random generator")
+    parser.add_argument("--db", help="Results database (warm start and recording)")
+    parser.add_argument("--tuned", help="File of tuned parameters (see Tuning.py) used as defaults")
+    parser.add_argument("--checkpoint", help="Checkpoint file (the run resumes from it if it exists)")
+    parser.add_argument("--format", choices=["text", "json", "csv"], help="Output format (default: text)")
+    parser.add_argument("--output", help="Output file (default: stdout)")
+    parser.add_argument("--plot", action="store_true", default=None, help="Show the best conformation")
+    parser.add_argument("--plot-out", dest="plot_out", help="Save the plot of the best conformation (png, svg, pdf) without display")
+    parser.add_argument("--quiet", action="store_true", default=None, help="Do not print the progress of the search")
+    return parser
 
-    execution_time = time.time() - time_init
-        
-    # Results
-    print("execution time: " + str(execution_time))
-    print("Best conformation found:", best_conformation)
-    print("Associated energy:", best_energy)
 
-    if plot :
-        plot_molecule(best_conformation, hp)
 
+def convert_config(parser, options, path):
+    """
+    Converts and checks the values of a config file like the command line would (type and choices of each option),
+    so that invalid values are reported by the parser instead of failing in the search.
+    Args:
+        parser (ArgumentParser): Parser of build_parser.
+        options (dict): Options of the config file.
+        path (str): Path of the config file (for the error messages).
+    Returns:
+        dict: Converted options.
+    """
+    actions = {action.dest: action for action in parser._actions}
+    converted = {}
+    for key, value in options.items():
+        action = actions[key]
+        if value is not None:
+            if action.const is True:  # store_true flags
+                if not isinstance(value, bool):
+                    parser.error(f"invalid value for {key} in {path}: {value!r} (expected true or false)")
+            elif action.type is not None:
+                try:
+                    value = action.type(str(value))  # Through str, as on the command line (so that 2.5 is not an int)
+                except ValueError:
+                    parser.error(f"invalid {action.type.__name__} value for {key} in {path}: {value!r}")
+            elif not isinstance(value, str):
+                parser.error(f"invalid value for {key} in {path}: {value!r} (expected a string)")
+            if action.choices is not None and value not in action.choices:
+                parser.error(f"invalid choice for {key} in {path}: {value!r} (choose from {', '.join(map(str, action.choices))})")
+        converted[key] = value
+    return converted
 
-#--- REMC Multi -------------------------------------------------------------------------
-elif method == "REMC_multi_processes":
 
-    # Execution time calculation
-    time_init = time.time()
-    
-    # Function
-    best_conformation, best_energy = REMC_multi(hp=hp, E_star=E_star, phi=phi_multi,
-                                                nu=nu_multi, T_init=T_init_multi, 
-                                                T_final=T_final_multi, chi=chi_multi, 
-                                                max_iteration=max_iteration_multi, 
-                                                nb_processus=nb_processus_multi, 
-                                                timeout=timeout_multi)
 
-    execution_time = time.time() - time_init
-        
-    # Results
-    print("execution time: " + str(execution_time))
-    print("Best conformation found:", best_conformation)
-    print("Associated energy:", best_energy)
+def parse_options(argv=None):
+    """
+    Parses the command line and merges it with the config file, the tuned parameters and DEFAULTS
+    (in decreasing priority).
+    Args:
+        argv (list of str, optional): Arguments. Defaults to sys.argv[1:].
+    Returns:
+        dict: Options.
+    """
+    parser = build_parser()
+    args = vars(parser.parse_args(argv))
+    options = {}
+    if args["config"] is not None:
+        with open(args["config"]) as f:
+            options = json.load(f)
+        unknown = set(options) - set(args)
+        if unknown:
+            parser.error(f"unknown options in {args['config']}: {', '.join(sorted(unknown))}")
+        options = convert_config(parser, options, args["config"])
+    options.update({key: value for key, value in args.items() if value is not None})
+
+    if options.get("hp") is None:
+        parser.error("an HP sequence is required (--hp or config file)")
+    options.setdefault("energy_model", "HP")
+    if options["energy_model"] == "matrix":
+        if options.get("matrix") is None:
+            parser.error("the matrix energy model needs --matrix")
+        options["hp"] = "".join(options["hp"].split()).upper()  # Any residue alphabet, no compact notation
+    else:
+        try:
+            options["hp"] = expand_hp_sequence(options["hp"])
+        except ValueError as error:
+            parser.error(f"invalid HP sequence: {error}")
+    if options["energy_model"] != "HP" and options.get("db") is not None:
+        parser.error("the results database only stores HP energies (--db needs --energy-model HP)")
+    options.setdefault("lattice", "square")
+    if options["lattice"] != "square" and options.get("db") is not None:
+        parser.error("the results database only stores square lattice conformations (--db needs --lattice square)")
+    if options["lattice"] == "cubic" and (options.get("plot") or options.get("plot_out")):
+        parser.error("3D conformations cannot be plotted (--plot and --plot-out need a 2D lattice)")
+    options.setdefault("method", "REMC_parallelized")
+    if options["method"] not in DEFAULTS:
+        parser.error(f"unknown method {options['method']} (choose from {', '.join(METHODS)})")
+
+    defaults = dict(DEFAULTS[options["method"]])
+    if options.get("tuned") is not None:
+        from Tuning import load_tuned_defaults
+        defaults.update({key: value for key, value in load_tuned_defaults(options["hp"], options["tuned"]).items()
+                         if key in defaults})
+    for key, value in defaults.items():
+        options.setdefault(key, value)
+    options.setdefault("format", "text")
+    return options
+
 
-    if plot :
-        plot_molecule(best_conformation, hp)
-    
 
-#--- Monte Carlo Search ----------------------------------------------------------------
-elif method == "MC_search":        
+def run(options):
+    """
+    Runs the search function selected by the options.
+    Args:
+        options (dict): Options of parse_options.
+    Returns:
+        dict: Result with the method, sequence, energy, conformation, wall time and parameters.
+    """
+    hp, method = options["hp"], options["method"]
+    if options.get("seed") is not None:
+        random.seed(options["seed"])
+    db = ResultsDB(options["db"]) if options.get("db") is not None else None
+    matrix = load_contact_matrix(options["matrix"]) if options.get("matrix") is not None else None
+    lattice = get_lattice(options.get("lattice", "square"))
+    model = EnergyModel(hp, options.get("energy_model", "HP"), matrix, lattice)
+    c = generate_linear_conformation(hp, lattice) if options.get("linear_start") else []
+    remc = {key: options[key] for key in ("phi", "nu", "T_init", "T_final", "chi") if key in options}
+    adaptive_phi = bool(options.get("adaptive_phi"))
+    checkpoint = options.get("checkpoint")
 
-    # Execution time calculation
     time_init = time.time()
-        
-    # Function
-    best_conformation, best_energy = MCsearch(hp=hp, phi=phi_mc, nu=nu_mc, T=T_mc)
+    if method == "REMC_parallelized":
+        best_conformation, best_energy = REMC_paral(hp=hp, E_star=options.get("E_star"), c=c, **remc,
+                                                    max_iterations=options["max_iteration"], timeout=options["timeout"],
+                                                    adaptive_phi=adaptive_phi, processes=options.get("workers"),
+                                                    checkpoint=checkpoint, db=db, model=model)
+    elif method == "REMC_multi_processes":
+        best_conformation, best_energy = REMC_multi(hp=hp, E_star=options.get("E_star"), c=c, **remc,
+                                                    max_iteration=options["max_iteration"], nb_processus=options["workers"],
+                                                    timeout=options["timeout"], adaptive_phi=adaptive_phi,
+                                                    checkpoint=checkpoint, db=db, model=model)
+    elif method == "REMC_hierarchical":
+        best_conformation, best_energy = REMC_hierarchical(hp=hp, E_star=options.get("E_star"), c=c, stages=options["stages"],
+                                                           **remc, max_iterations=options["max_iteration"],
+                                                           timeout=options["timeout"], model=model)
+    elif method == "REMC":
+        best_conformation, best_energy = REMCSimulation(hp=hp, E_star=options.get("E_star"), c=c, **remc,
+                                                        max_iterations=options["max_iteration"], timeout=options["timeout"],
+                                                        adaptive_phi=adaptive_phi, checkpoint=checkpoint, db=db, model=model)
+    else:
+        best_conformation, best_energy = MCsearch(hp=hp, c=c, phi=options["phi"], nu=options["nu"], T=options["T"],
+                                                  E_star=options.get("E_star"), timeout=options.get("timeout"), db=db,
+                                                  model=model)
     execution_time = time.time() - time_init
-        
-    # Results
-    print("execution time: " + str(execution_time))
-    print("Best conformation found:", best_conformation)
-    print("Associated energy:", best_energy)
+    if db is not None:
+        db.close()
+
+    params = {key: options[key] for key in DEFAULTS[method] if key in options}
+    return {"method": method, "hp": hp, "length": len(hp), "energy": best_energy, "E_star": options.get("E_star"),
+            "bound": model.lower_bound(), "energy_model": model.model, "lattice": lattice.name,
+            "execution_time": execution_time,
+            "seed": options.get("seed"), "params": params, "conformation": [list(p) for p in best_conformation]}
+
+
+
+def write_result(result, fmt, stream):
+    """
+    Writes a result as text, JSON or CSV (one header line and one row, nested fields as JSON).
+    Args:
+        result (dict): Result of run.
+        fmt (str): "text", "json" or "csv".
+        stream (file): Output stream.
+    """
+    if fmt == "json":
+        stream.write(json.dumps(result) + "\n")
+    elif fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=list(result))
+        writer.writeheader()
+        writer.writerow({key: json.dumps(value) if isinstance(value, (list, dict)) else value
+                         for key, value in result.items()})
+    else:
+        stream.write(f"execution time: {result['execution_time']}\n")
+        stream.write(f"Best conformation found: {[tuple(p) for p in result['conformation']]}\n")
+        stream.write(f"Associated energy: {result['energy']}\n")
+
+
+
+def main(argv=None):
+    options = parse_options(argv)
+
+    # Progress prints of the search go to stderr (or nowhere), the result to stdout or --output
+    with contextlib.ExitStack() as stack:
+        progress = stack.enter_context(open(os.devnull, "w")) if options.get("quiet") else sys.stderr
+        with contextlib.redirect_stdout(progress):
+            result = run(options)
+        output = stack.enter_context(open(options["output"], "w", newline="")) if options.get("output") else sys.stdout
+        write_result(result, options["format"], output)
+
+    conformation = get_lattice(result["lattice"]).to_cartesian([tuple(p) for p in result["conformation"]])
+    if options.get("plot_out"):
+        from Grid import render_molecule
+        render_molecule(conformation, result["hp"], options["plot_out"])
+    elif options.get("plot"):
+        from Grid import plot_molecule
+        plot_molecule(conformation, result["hp"])
+
 
-    if plot :
-        plot_molecule(best_conformation, hp)
 
+if __name__ == "__main__":
+    main()